@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import Sequence
+
+
+@admin.register(Sequence)
+class SequenceAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'year', 'last_value', 'updated_at']
+    list_filter = ['prefix', 'year']
+    readonly_fields = ['updated_at']
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'core'
+
+    def ready(self):
+        from . import changes, events, search, stats
+        changes.connect_signals()
+        events.connect_signals()
+        search.connect_signals()
+        stats.connect_signals()
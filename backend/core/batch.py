@@ -0,0 +1,159 @@
+"""
+Run several API calls from one ``POST /api/batch/`` request.
+
+Each sub-request is resolved against the project URLconf and handed straight
+to its view, bypassing the middleware stack. Sub-requests inherit the
+batch's headers and its authentication result, so the Firebase token is
+verified once for the whole batch. With ``"concurrent": true`` consecutive
+``GET`` sub-requests run on a small thread pool; any other method runs on
+its own, in order, so reads placed after a write see it.
+"""
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+
+READ_METHODS = ('GET', 'HEAD')
+ALLOWED_METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+# Parent headers not carried over to sub-requests
+SKIPPED_META = ('CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'PATH_INFO', 'REQUEST_METHOD',
+                'HTTP_IDEMPOTENCY_KEY', 'HTTP_CONTENT_ENCODING', 'HTTP_ACCEPT_ENCODING')
+
+
+class BatchError(Exception):
+    """Raised when the batch payload itself is invalid"""
+
+
+def max_requests():
+    return getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+
+
+def max_workers():
+    return getattr(settings, 'BATCH_MAX_WORKERS', 4)
+
+
+def parse_batch(data):
+    """Validate the payload and return the list of sub-request dicts"""
+    requests = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(requests, list) or not requests:
+        raise BatchError('requests must be a non-empty list')
+    if len(requests) > max_requests():
+        raise BatchError(f'At most {max_requests()} requests per batch')
+    parsed = []
+    for position, item in enumerate(requests):
+        if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+            raise BatchError(f'Request {position} needs a path')
+        method = str(item.get('method', 'GET')).upper()
+        if method not in ALLOWED_METHODS:
+            raise BatchError(f'Request {position} has unsupported method {method}')
+        path = urlsplit(item['path'])
+        if not path.path.startswith('/api/') or path.path.rstrip('/') == '/api/batch':
+            raise BatchError(f'Request {position} must target an API path other than /api/batch/')
+        query = path.query
+        if isinstance(item.get('query'), dict):
+            query = '&'.join(part for part in [query, urlencode(item['query'], doseq=True)] if part)
+        parsed.append({
+            'id': item.get('id', position),
+            'method': method,
+            'path': path.path,
+            'query': query,
+            'body': item.get('body'),
+        })
+    return parsed
+
+
+def _build_request(parent, item):
+    body = b'' if item['body'] is None else json.dumps(item['body']).encode('utf-8')
+    environ = {key: value for key, value in parent.META.items() if key not in SKIPPED_META}
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': item['path'],
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': item['query'],
+        'CONTENT_TYPE': 'application/json' if body else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.url_scheme': parent.scheme,
+    })
+    request = WSGIRequest(environ)
+    # Reuse the batch's authentication instead of verifying again
+    request.user = parent.user
+    if hasattr(parent, '_firebase_auth'):
+        request._firebase_auth = parent._firebase_auth
+    return request
+
+
+def _response_body(response):
+    if getattr(response, 'streaming', False):
+        return None
+    content = response.content.decode(response.charset or 'utf-8', errors='replace')
+    if response.get('Content-Type', '').startswith('application/json') and content:
+        return json.loads(content)
+    return content
+
+
+def execute(parent, item):
+    """Run one sub-request and return its ``{id, status, headers, body}`` result"""
+    try:
+        match = resolve(item['path'])
+    except Resolver404:
+        return {'id': item['id'], 'status': 404, 'headers': {}, 'body': {'error': 'Not found'}}
+    try:
+        response = match.func(_build_request(parent, item), *match.args, **match.kwargs)
+        if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+            response.render()
+    except Http404:
+        return {'id': item['id'], 'status': 404, 'headers': {}, 'body': {'error': 'Not found'}}
+    except Exception as e:
+        return {'id': item['id'], 'status': 500, 'headers': {}, 'body': {'error': str(e)}}
+    if getattr(response, 'streaming', False):
+        response.close()
+        return {
+            'id': item['id'],
+            'status': 400,
+            'headers': {},
+            'body': {'error': 'Streaming endpoints cannot be batched'},
+        }
+    headers = {name: value for name, value in response.items() if name.lower() != 'content-length'}
+    return {'id': item['id'], 'status': response.status_code, 'headers': headers, 'body': _response_body(response)}
+
+
+def _execute_in_thread(parent, item):
+    try:
+        return execute(parent, item)
+    finally:
+        # Worker threads open their own connections
+        connections.close_all()
+
+
+def _groups(items, concurrent):
+    """Split into runs executed together: consecutive reads, or a single write"""
+    group = []
+    for item in items:
+        if concurrent and item['method'] in READ_METHODS:
+            group.append(item)
+            continue
+        if group:
+            yield group
+            group = []
+        yield [item]
+    if group:
+        yield group
+
+
+def run_batch(parent, items, concurrent=False):
+    """Execute ``items`` for ``parent`` and return their results in order"""
+    results = []
+    for group in _groups(items, concurrent):
+        if len(group) == 1:
+            results.append(execute(parent, group[0]))
+            continue
+        with ThreadPoolExecutor(max_workers=min(max_workers(), len(group))) as pool:
+            results.extend(pool.map(lambda item: _execute_in_thread(parent, item), group))
+    return results
@@ -0,0 +1,231 @@
+"""
+Append-only change log behind the ``/api/changes/`` delta-sync feed.
+
+Every save or delete of a model in ``CHANGE_FEED`` appends a ``ChangeEntry``.
+Entries are buffered per thread and written with one ``bulk_create`` when
+the surrounding transaction commits (immediately in autocommit mode), so a
+request that touches many rows adds a single insert and a rolled-back
+transaction leaves nothing behind. Repeated changes to one object in the
+same batch are folded into one entry. Code that writes without signals
+(``bulk_create``, queryset ``update``) calls ``record``/``record_queryset``.
+
+``changes_since`` reads the log after a cursor and compacts it to the final
+state of each object: the current serialized row for creates and updates,
+and a bare id tombstone for deletes.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import ChangeEntry
+
+# Model label -> resource name in the feed, serializer and relations it reads
+CHANGE_FEED = {
+    'units.Unit': {
+        'resource': 'units',
+        'serializer': 'units.serializers.UnitSerializer',
+        'select_related': [],
+    },
+    'tenants.Tenant': {
+        'resource': 'tenants',
+        'serializer': 'tenants.serializers.TenantSerializer',
+        'select_related': ['current_unit'],
+    },
+    'payments.Payment': {
+        'resource': 'payments',
+        'serializer': 'payments.serializers.PaymentSerializer',
+        'select_related': ['tenant', 'unit'],
+    },
+    'units.DamageReport': {
+        'resource': 'damage_reports',
+        'serializer': 'units.serializers.DamageReportSerializer',
+        'select_related': ['unit'],
+    },
+}
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+WRITE_BATCH_SIZE = 500
+
+_local = threading.local()
+
+
+def page_size():
+    return getattr(settings, 'CHANGES_PAGE_SIZE', 500)
+
+
+def retention_days():
+    return getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 30)
+
+
+def _fold(previous, action):
+    """Combine two actions on one object; ``None`` means nothing to record"""
+    if previous == CREATED:
+        return None if action == DELETED else CREATED
+    if previous == DELETED and action == CREATED:
+        return UPDATED
+    return action
+
+
+class _Batch:
+    """Entries waiting for the current transaction to commit"""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+
+    def add(self, label, object_id, action, owner_id):
+        key = (label, object_id)
+        if key in self.entries:
+            previous, _ = self.entries.pop(key)
+            action = _fold(previous, action)
+            if action is None:
+                return
+        self.entries[key] = (action, owner_id)
+
+    def flush(self):
+        # Entries recorded from here on start a new batch
+        if getattr(_local, 'batch', None) is self:
+            _local.batch = None
+        entries = [
+            ChangeEntry(model=label, object_id=object_id, action=action, owner_id=owner_id)
+            for (label, object_id), (action, owner_id) in self.entries.items()
+        ]
+        self.entries.clear()
+        if entries:
+            ChangeEntry.objects.bulk_create(entries, batch_size=WRITE_BATCH_SIZE)
+
+
+def _current_batch():
+    batch = getattr(_local, 'batch', None)
+    # A batch whose on_commit callback was discarded by a rollback is dropped with it
+    if batch is not None and any(callback == batch.flush for _, callback, _ in connection.run_on_commit):
+        return batch
+    batch = _Batch()
+    _local.batch = batch
+    if connection.in_atomic_block:
+        transaction.on_commit(batch.flush)
+    return batch
+
+
+def record(instances, action):
+    """Log ``action`` for ``instances`` (all of one model) written without signals"""
+    instances = [instance for instance in instances if instance.pk is not None]
+    if not instances:
+        return
+    label = instances[0]._meta.label
+    batch = _current_batch()
+    for instance in instances:
+        batch.add(label, instance.pk, action, getattr(instance, 'owner_id', None))
+    if not connection.in_atomic_block:
+        batch.flush()
+
+
+def record_queryset(queryset, action=UPDATED):
+    """Log ``action`` for every row of ``queryset``, e.g. after ``queryset.update()``
+
+    Rows are written straight away in the caller's transaction rather than
+    buffered, so arbitrarily large updates stay in bounded memory.
+    """
+    label = queryset.model._meta.label
+    rows = queryset.order_by().values_list('pk', 'owner_id').iterator(chunk_size=2000)
+    entries = []
+    for object_id, owner_id in rows:
+        entries.append(ChangeEntry(model=label, object_id=object_id, action=action, owner_id=owner_id))
+        if len(entries) >= WRITE_BATCH_SIZE:
+            ChangeEntry.objects.bulk_create(entries)
+            entries = []
+    if entries:
+        ChangeEntry.objects.bulk_create(entries)
+
+
+def _record_on_save(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        record([instance], CREATED if created else UPDATED)
+
+
+def _record_on_delete(sender, instance, **kwargs):
+    record([instance], DELETED)
+
+
+def latest_cursor():
+    return ChangeEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def is_expired(since):
+    """Whether entries after ``since`` have already been pruned"""
+    oldest = ChangeEntry.objects.order_by('id').values_list('id', flat=True).first()
+    return oldest is not None and since < oldest - 1
+
+
+def prune(days=None):
+    """Delete entries older than ``days``; clients behind them must resync"""
+    days = retention_days() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = ChangeEntry.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
+
+
+def changes_since(since, user=None, limit=None):
+    """Compacted changes after cursor ``since`` visible to ``user``
+
+    Returns ``{'cursor', 'has_more', 'changes'}`` where ``changes`` maps each
+    resource to ``created``/``updated`` serialized rows and ``deleted`` ids.
+    """
+    limit = limit or page_size()
+    entries = list(
+        ChangeEntry.objects.for_owner(user).filter(id__gt=since)
+        .order_by('id').values_list('id', 'model', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    final = {}
+    for _, label, object_id, action in entries:
+        per_model = final.setdefault(label, OrderedDict())
+        if object_id in per_model:
+            action = _fold(per_model.pop(object_id), action)
+            if action is None:
+                continue
+        per_model[object_id] = action
+
+    changes = {}
+    for label, per_model in final.items():
+        feed = CHANGE_FEED.get(label)
+        if feed is None:
+            continue
+        model = apps.get_model(label)
+        live_ids = [object_id for object_id, action in per_model.items() if action != DELETED]
+        rows = model.objects.for_owner(user).filter(pk__in=live_ids)
+        if feed['select_related']:
+            rows = rows.select_related(*feed['select_related'])
+        rows = rows.in_bulk()
+        serializer_class = import_string(feed['serializer'])
+        result = {CREATED: [], UPDATED: [], DELETED: []}
+        for object_id, action in per_model.items():
+            if action == DELETED:
+                result[DELETED].append(object_id)
+            elif object_id in rows:
+                result[action].append(serializer_class(rows[object_id]).data)
+            # Otherwise deleted in a later, not yet read entry
+        changes[feed['resource']] = result
+
+    return {
+        'cursor': entries[-1][0] if entries else since,
+        'has_more': has_more,
+        'changes': changes,
+    }
+
+
+def connect_signals():
+    """Append to the change log for every model in ``CHANGE_FEED``"""
+    for label in CHANGE_FEED:
+        model = apps.get_model(label)
+        post_save.connect(_record_on_save, sender=model, dispatch_uid=f'changes_save_{label}')
+        post_delete.connect(_record_on_delete, sender=model, dispatch_uid=f'changes_delete_{label}')
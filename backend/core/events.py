@@ -0,0 +1,253 @@
+"""
+Live dashboard stats pushed over server-sent events.
+
+``/api/events/stats/`` (served through ``rental_backend.asgi``) keeps a
+connection open per dashboard tab. When a payment, tenant, unit or damage
+report changes, the broker notifies the subscribers of the row's owner once
+the transaction commits. Each stream waits ``EVENTS_COALESCE_SECONDS`` to
+gather a burst of changes, recomputes only the affected stat sets through
+``core.stats`` and sends the values that differ from what the client has
+already seen.
+
+``EVENTS_BROKER`` picks how changes reach the streams:
+
+* ``local``: one in-process broker fed by the save/delete signals. Only
+  streams served by the process that made the change hear about it.
+* ``change_log``: each process tails the shared ``change_log`` table written
+  by ``core.changes``, so streams hear about changes made by any worker or
+  management command. A stand-in for an external pub/sub service.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from .models import ChangeEntry
+from . import stats
+
+# Stat sets streamed to dashboards; each must aggregate an owner-scoped model
+STREAMED_STATS = ['units', 'tenants', 'payments', 'unit_damage_reports']
+
+ALL_OWNERS = stats.ALL_OWNERS
+
+
+def coalesce_seconds():
+    return getattr(settings, 'EVENTS_COALESCE_SECONDS', 1.0)
+
+
+def heartbeat_seconds():
+    return getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+
+
+def max_stream_seconds():
+    return getattr(settings, 'EVENTS_MAX_STREAM_SECONDS', 300)
+
+
+def poll_seconds():
+    return getattr(settings, 'EVENTS_POLL_SECONDS', 2.0)
+
+
+def _stats_by_label():
+    """Model label -> streamed stat sets its writes affect"""
+    affected = defaultdict(set)
+    for name in STREAMED_STATS:
+        for label in stats.STAT_SETS[name]['invalidated_by']:
+            affected[label].add(name)
+    return affected
+
+
+STATS_BY_LABEL = _stats_by_label()
+
+
+class Subscription:
+    """One open stream: stat set names queued for it on its event loop"""
+
+    def __init__(self, owner, loop):
+        self.owner = owner
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def notify(self, names):
+        # Called from request threads; hand over to the stream's loop
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, names)
+        except RuntimeError:
+            # Loop already closed
+            pass
+
+
+class LocalBroker:
+    """In-process fan-out of stat changes to the subscribed streams"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, owner):
+        subscription = Subscription(owner, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[owner].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.owner]
+
+    def publish(self, owner_id, names):
+        """Notify the owner's streams, and the unscoped ones, that ``names`` changed"""
+        with self._lock:
+            targets = list(self._subscribers.get(owner_id, ())) + list(self._subscribers.get(ALL_OWNERS, ()))
+        for subscription in targets:
+            subscription.notify(set(names))
+
+    def changed(self, label, owner_id):
+        """A row of model ``label`` owned by ``owner_id`` was committed"""
+        names = STATS_BY_LABEL.get(label)
+        if names:
+            self.publish(owner_id, names)
+
+
+class ChangeLogBroker(LocalBroker):
+    """Broker fed by polling the shared change log instead of local signals"""
+
+    def __init__(self):
+        super().__init__()
+        self._poller = None
+        self._cursor = None
+
+    def subscribe(self, owner):
+        subscription = super().subscribe(owner)
+        if self._poller is None or self._poller.done():
+            self._poller = subscription.loop.create_task(self._poll())
+        return subscription
+
+    def changed(self, label, owner_id):
+        # Every change, local or not, arrives through the change log
+        pass
+
+    def _read(self):
+        if self._cursor is None:
+            self._cursor = ChangeEntry.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            return []
+        rows = list(
+            ChangeEntry.objects.filter(id__gt=self._cursor, model__in=list(STATS_BY_LABEL))
+            .order_by('id').values_list('id', 'model', 'owner_id')[:1000]
+        )
+        if rows:
+            self._cursor = rows[-1][0]
+        return rows
+
+    async def _poll(self):
+        read = sync_to_async(self._read, thread_sensitive=True)
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            changed = defaultdict(set)
+            for _, label, owner_id in await read():
+                changed[owner_id] |= STATS_BY_LABEL[label]
+            for owner_id, names in changed.items():
+                self.publish(owner_id, names)
+            await asyncio.sleep(poll_seconds())
+
+
+BROKERS = {
+    'local': LocalBroker,
+    'change_log': ChangeLogBroker,
+}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = BROKERS[getattr(settings, 'EVENTS_BROKER', 'local')]()
+    return _broker
+
+
+def _compute(names, user):
+    return {
+        name: stats.get_stats(name, apps.get_model(stats.STAT_SETS[name]['model']).objects.for_owner(user), user)
+        for name in names
+    }
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _delta(previous, current):
+    """Stat values in ``current`` that differ from ``previous``, per stat set"""
+    delta = {}
+    for name, values in current.items():
+        seen = previous.get(name, {})
+        changed = {key: value for key, value in values.items() if seen.get(key) != value}
+        if changed:
+            delta[name] = changed
+    return delta
+
+
+async def stats_stream(user):
+    """Yield the full stats once, then coalesced deltas until the stream times out"""
+    loop = asyncio.get_running_loop()
+    broker = get_broker()
+    subscription = broker.subscribe(stats.owner_key(user))
+    compute = sync_to_async(_compute, thread_sensitive=True)
+    try:
+        snapshot = await compute(STREAMED_STATS, user)
+        yield format_event('stats', snapshot)
+        deadline = loop.time() + max_stream_seconds()
+        while loop.time() < deadline:
+            timeout = min(heartbeat_seconds(), max(deadline - loop.time(), 0))
+            try:
+                names = await asyncio.wait_for(subscription.queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            # Gather the rest of the burst before recomputing
+            await asyncio.sleep(coalesce_seconds())
+            while not subscription.queue.empty():
+                names |= subscription.queue.get_nowait()
+            current = await compute(sorted(names), user)
+            delta = _delta(snapshot, current)
+            snapshot.update(current)
+            if delta:
+                yield format_event('stats', delta)
+        # EventSource reconnects on its own; bounding the stream frees
+        # connections whose client went away without us noticing
+        yield 'retry: 1000\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+def notify(label, owner_ids):
+    """Publish changes written without signals once the transaction commits"""
+    owner_ids = set(owner_ids)
+    transaction.on_commit(lambda: [get_broker().changed(label, owner_id) for owner_id in owner_ids])
+
+
+def _publish_on_change(sender, instance, **kwargs):
+    label = sender._meta.label
+    owner_id = getattr(instance, 'owner_id', None)
+    transaction.on_commit(lambda: get_broker().changed(label, owner_id))
+
+
+def connect_signals():
+    """Notify the broker after commits that touch a streamed stat set"""
+    for label in STATS_BY_LABEL:
+        model = apps.get_model(label)
+        post_save.connect(_publish_on_change, sender=model, dispatch_uid=f'events_save_{label}')
+        post_delete.connect(_publish_on_change, sender=model, dispatch_uid=f'events_delete_{label}')
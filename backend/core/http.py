@@ -0,0 +1,62 @@
+"""
+HTTP helpers shared by the API views.
+"""
+import re
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    candidates = [value.strip() for value in header.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def serve_artifact(request, path, digest, content_type):
+    """Serve an immutable file with a strong ETag, conditional GET and single byte ranges.
+
+    ``digest`` must identify the content (e.g. its SHA-256) so it can be used as the ETag.
+    """
+    etag = f'"{digest}"'
+    if _etag_matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    size = path.stat().st_size
+    range_header = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    match = RANGE_RE.match(range_header.strip()) if range_header else None
+    if match and (not if_range or if_range == etag):
+        start, end = match.groups()
+        if start == '' and end == '':
+            match = None
+        elif start == '':
+            # Suffix range: the last N bytes
+            length = min(int(end), size)
+            start, end = size - length, size - 1
+        else:
+            start = int(start)
+            end = min(int(end), size - 1) if end else size - 1
+        if match is not None:
+            if start >= size or start > end:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+            with open(path, 'rb') as artifact:
+                artifact.seek(start)
+                content = artifact.read(end - start + 1)
+            response = HttpResponse(content, status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Accept-Ranges'] = 'bytes'
+            response['ETag'] = etag
+            return response
+
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Content-Length'] = str(size)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
@@ -0,0 +1,149 @@
+"""
+Idempotency-Key support for mutating API requests.
+
+A client sends ``Idempotency-Key: <unique value>`` with a POST, PUT, PATCH or
+DELETE. The first request claims the key by inserting an ``in_progress``
+row; when it finishes, the response is stored (zlib-compressed) on that row
+until ``IDEMPOTENCY_TTL`` seconds have passed. A retry with the same key:
+
+* gets the stored response back, with ``Idempotent-Replayed: true``
+* waits (up to ``IDEMPOTENCY_WAIT_SECONDS``) while the first request is still
+  running, then replays its response
+* is rejected with 422 if the request differs from the one that used the key
+
+Server errors (5xx) and streaming responses are not stored; the key is
+released so the request can be retried. Expired rows are evicted as new
+keys are claimed and by ``manage.py purge_idempotency_keys``.
+"""
+import hashlib
+import itertools
+import time
+import zlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import IdempotencyKey
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+# Bodies larger than this are fingerprinted by length and type only, so
+# streaming uploads are not read into memory
+MAX_FINGERPRINT_BODY = 1024 * 1024
+# Evict expired keys once every this many claims
+PURGE_EVERY = 100
+POLL_INTERVAL = 0.1
+
+CLAIMED = 'claimed'
+REPLAY = 'replay'
+MISMATCH = 'mismatch'
+BUSY = 'busy'
+
+_claims = itertools.count(1)
+
+
+def ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_TTL', 24 * 60 * 60))
+
+
+def wait_seconds():
+    return getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+
+
+def lock_timeout():
+    """How long an in-progress claim is honoured before it is treated as abandoned"""
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+
+def scoped_key(client_key, user, method, path):
+    """Digest identifying ``client_key`` for this caller and endpoint"""
+    owner = user.pk if user is not None and getattr(user, 'is_authenticated', False) else 'anonymous'
+    raw = '\n'.join([str(owner), method, path, client_key])
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def fingerprint(request):
+    """Digest of the request payload, used to detect a key reused for a different request"""
+    digest = hashlib.sha256()
+    digest.update(request.get_full_path().encode('utf-8'))
+    digest.update(b'\n')
+    digest.update((request.content_type or '').encode('utf-8'))
+    digest.update(b'\n')
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length <= MAX_FINGERPRINT_BODY:
+        digest.update(request.body)
+    else:
+        digest.update(str(length).encode('ascii'))
+    return digest.hexdigest()
+
+
+def purge_expired(now=None):
+    """Delete expired keys; returns the number removed"""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lt=now or timezone.now()).delete()
+    return deleted
+
+
+def _insert(key, request_fingerprint, now):
+    try:
+        with transaction.atomic():
+            IdempotencyKey.objects.create(
+                key=key,
+                fingerprint=request_fingerprint,
+                expires_at=now + ttl(),
+            )
+        return True
+    except IntegrityError:
+        return False
+
+
+def claim(key, request_fingerprint):
+    """Claim ``key`` for a new request.
+
+    Returns ``(CLAIMED, None)`` when the caller should run the request,
+    ``(REPLAY, row)`` when a stored response should be returned, or
+    ``(MISMATCH, row)`` / ``(BUSY, row)`` when the request must be refused.
+    """
+    deadline = time.monotonic() + wait_seconds()
+    while True:
+        now = timezone.now()
+        if _insert(key, request_fingerprint, now):
+            if next(_claims) % PURGE_EVERY == 0:
+                purge_expired(now)
+            return CLAIMED, None
+
+        row = IdempotencyKey.objects.filter(key=key).first()
+        if row is None:
+            continue
+        if row.expires_at < now or (row.in_progress and row.created_at < now - lock_timeout()):
+            # Expired, or the first request died without finishing
+            IdempotencyKey.objects.filter(key=key, created_at=row.created_at).delete()
+            continue
+        if row.fingerprint != request_fingerprint:
+            return MISMATCH, row
+        if not row.in_progress:
+            return REPLAY, row
+        if time.monotonic() >= deadline:
+            return BUSY, row
+        time.sleep(POLL_INTERVAL)
+
+
+def store(key, status_code, content_type, content):
+    """Record the response for a claimed key"""
+    IdempotencyKey.objects.filter(key=key).update(
+        in_progress=False,
+        status_code=status_code,
+        content_type=content_type or '',
+        body=zlib.compress(content),
+    )
+
+
+def release(key):
+    """Forget a claimed key so the request can be retried"""
+    IdempotencyKey.objects.filter(key=key).delete()
+
+
+def stored_content(row):
+    return zlib.decompress(bytes(row.body)) if row.body else b''
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core import changes
+
+
+class Command(BaseCommand):
+    help = 'Delete change log entries older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Keep entries newer than this many days (default: CHANGE_LOG_RETENTION_DAYS)',
+        )
+
+    def handle(self, *args, **options):
+        deleted = changes.prune(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} change log entries'))
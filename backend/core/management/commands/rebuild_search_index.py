@@ -0,0 +1,26 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from core import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search entries for payments, tenants, units and damage reports'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models',
+            nargs='*',
+            help='Model labels to rebuild (e.g. payments.Payment); defaults to all indexed models',
+        )
+
+    def handle(self, *args, **options):
+        labels = options['models'] or list(search.SEARCH_FIELDS)
+        unknown = [label for label in labels if label not in search.SEARCH_FIELDS]
+        if unknown:
+            raise CommandError(f"Not indexed: {', '.join(unknown)}")
+
+        if search.ensure_fulltext_index():
+            self.stdout.write('Created the full-text index')
+        for label in labels:
+            count = search.rebuild(apps.get_model(label))
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} {label} row(s)'))
@@ -0,0 +1,23 @@
+"""
+Managers shared by the owner-scoped models.
+"""
+from django.db import models
+
+
+class OwnedQuerySet(models.QuerySet):
+    """QuerySet for models with an ``owner`` foreign key"""
+
+    def for_owner(self, user):
+        """Rows belonging to ``user``.
+
+        Unauthenticated callers are not narrowed, matching the API's current
+        ``AllowAny`` access; authenticated requests only ever touch their own
+        portfolio and hit the owner-leading indexes.
+        """
+        if user is None or not getattr(user, 'is_authenticated', False):
+            return self
+        return self.filter(owner=user)
+
+
+class OwnedManager(models.Manager.from_queryset(OwnedQuerySet)):
+    pass
@@ -0,0 +1,59 @@
+from django.http import HttpResponse, JsonResponse
+from . import idempotency
+
+
+class IdempotencyMiddleware:
+    """
+    Honour the ``Idempotency-Key`` header on mutating API requests.
+
+    Must run after the authentication middleware so keys are scoped per user.
+    See ``core.idempotency`` for the storage and replay rules.
+    """
+    methods = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        client_key = request.META.get(idempotency.HEADER, '').strip()
+        if not client_key or request.method not in self.methods or not request.path.startswith('/api/'):
+            return self.get_response(request)
+        if len(client_key) > idempotency.MAX_KEY_LENGTH:
+            return JsonResponse(
+                {'error': f'Idempotency-Key must be at most {idempotency.MAX_KEY_LENGTH} characters'},
+                status=400
+            )
+
+        key = idempotency.scoped_key(client_key, getattr(request, 'user', None), request.method, request.path)
+        outcome, row = idempotency.claim(key, idempotency.fingerprint(request))
+        if outcome == idempotency.MISMATCH:
+            return JsonResponse(
+                {'error': 'Idempotency-Key was already used for a different request'},
+                status=422
+            )
+        if outcome == idempotency.BUSY:
+            response = JsonResponse(
+                {'error': 'A request with this Idempotency-Key is still being processed'},
+                status=409
+            )
+            response['Retry-After'] = '1'
+            return response
+        if outcome == idempotency.REPLAY:
+            response = HttpResponse(
+                idempotency.stored_content(row),
+                status=row.status_code,
+                content_type=row.content_type or None,
+            )
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            idempotency.release(key)
+            raise
+        if response.streaming or response.status_code >= 500:
+            idempotency.release(key)
+        else:
+            idempotency.store(key, response.status_code, response.get('Content-Type'), response.content)
+        return response
@@ -0,0 +1,33 @@
+# Generated migration for core app
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '__first__'),
+        ('core', '0003_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=100)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.customuser')),
+            ],
+            options={
+                'db_table': 'change_log',
+                'indexes': [
+                    models.Index(fields=['owner', 'id'], name='change_log_owner_idx'),
+                    models.Index(fields=['created_at'], name='change_log_created_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated migration for core app
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '__first__'),
+        ('core', '0004_changeentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchentry',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='users.customuser'),
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['owner', 'doc_type'], name='search_entries_owner_idx'),
+        ),
+    ]
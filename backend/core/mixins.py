@@ -0,0 +1,71 @@
+"""
+Mixins shared by the API viewsets.
+"""
+from datetime import date
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from . import exports
+
+
+class RelatedFieldsMixin:
+    """Apply a viewset's declared related-object needs to its querysets.
+
+    Serializers that read through foreign keys (``tenant.full_name``,
+    ``unit.unit_id``, ...) otherwise issue one query per row. Declare the
+    relations the serializer touches and wrap the base queryset with
+    ``with_related`` in ``get_queryset`` so list, search and detail all get them.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def with_related(self, queryset):
+        if self.select_related_fields:
+            queryset = queryset.select_related(*self.select_related_fields)
+        if self.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*self.prefetch_related_fields)
+        return queryset
+
+
+class OwnerScopedMixin:
+    """Narrow a viewset's querysets to the requesting owner.
+
+    Wrap the base queryset with ``for_request_owner`` in ``get_queryset``; the
+    model's manager must be a ``core.managers.OwnedManager``.
+    """
+
+    def for_request_owner(self, queryset):
+        return queryset.for_owner(getattr(self.request, 'user', None))
+
+
+class ExportMixin:
+    """Add a streaming ``export`` action to a viewset.
+
+    Declare ``export_fields`` as ``(column header, lookup)`` pairs and
+    ``export_filename``. ``GET .../export/?type=csv|ndjson&gzip=1`` streams
+    every row of ``get_queryset()``; ``status`` narrows it to one status.
+    """
+    export_fields = ()
+    export_filename = 'export'
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the queryset as CSV or NDJSON"""
+        export_format = request.GET.get('type', 'csv').lower()
+        if export_format not in exports.FORMATS:
+            return Response(
+                {'error': f"type must be one of: {', '.join(exports.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.get_queryset()
+        status_filter = request.GET.get('status', '')
+        if status_filter and status_filter != 'All':
+            queryset = queryset.filter(status__iexact=status_filter)
+        compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+        return exports.stream_export(
+            queryset.order_by('pk'),
+            self.export_fields,
+            f'{self.export_filename}-{date.today().isoformat()}',
+            export_format=export_format,
+            compress=compress,
+        )
@@ -0,0 +1,116 @@
+from django.db import models
+from .managers import OwnedManager
+
+
+class Sequence(models.Model):
+    """Counter backing human-readable IDs such as PAY-2025-0001.
+
+    One row per (prefix, year); ``last_value`` is the highest number handed out.
+    Allocation goes through ``core.sequences`` rather than this model directly.
+    """
+    prefix = models.CharField(max_length=20)
+    year = models.IntegerField()
+    last_value = models.BigIntegerField(default=0)
+
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'sequences'
+        constraints = [
+            models.UniqueConstraint(fields=['prefix', 'year'], name='unique_sequence_per_prefix_year'),
+        ]
+
+    def __str__(self):
+        return f"{self.prefix}-{self.year}: {self.last_value}"
+
+
+class SearchEntry(models.Model):
+    """Searchable text for one indexed object (a payment, tenant, unit, ...).
+
+    Rows are kept in sync by the signals wired up in ``core.search``. The
+    full-text index over ``content`` is vendor specific and created after
+    ``migrate`` by ``core.search.ensure_fulltext_index``: an FTS5 table on
+    SQLite, a GIN ``tsvector`` index on PostgreSQL.
+    """
+    doc_type = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    content = models.TextField(blank=True)
+    # Copied from the indexed object so matches are narrowed before ranking
+    owner = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+
+    # Timestamps
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'search_entries'
+        indexes = [
+            models.Index(fields=['owner', 'doc_type'], name='search_entries_owner_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['doc_type', 'object_id'], name='unique_search_entry_per_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.doc_type}:{self.object_id}"
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a request sent with an ``Idempotency-Key`` header.
+
+    ``key`` is a SHA-256 of the client key scoped to the caller, method and
+    path. A row is ``in_progress`` while the first request runs and holds the
+    compressed response once it completes; rows are evicted after
+    ``expires_at`` (see ``core.idempotency``).
+    """
+    key = models.CharField(max_length=64, primary_key=True)
+    fingerprint = models.CharField(max_length=64)
+    in_progress = models.BooleanField(default=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    body = models.BinaryField(blank=True, default=b'')
+    expires_at = models.DateTimeField(db_index=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'idempotency_keys'
+
+    def __str__(self):
+        return self.key
+
+
+class ChangeEntry(models.Model):
+    """One create, update or delete of a synced object, in commit order.
+
+    The auto-increment ``id`` is the cursor clients pass to
+    ``/api/changes/?since=``. Rows are appended in batches by the signals
+    wired up in ``core.changes`` and pruned by ``prune_change_log``.
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    owner = models.ForeignKey('users.CustomUser', on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OwnedManager()
+
+    class Meta:
+        db_table = 'change_log'
+        indexes = [
+            models.Index(fields=['owner', 'id'], name='change_log_owner_idx'),
+            models.Index(fields=['created_at'], name='change_log_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.action} {self.model}:{self.object_id}"
@@ -0,0 +1,146 @@
+"""
+Pagination classes shared by the API viewsets.
+
+``PageNumberOrKeysetPagination`` keeps the default page-number behaviour and
+switches to keyset (cursor) pagination when the request carries a ``cursor``
+query parameter (``?cursor=`` for the first page). Keyset pages are fetched
+with a ``WHERE (ordering columns) < (last row)`` filter over the model's
+``Meta.ordering`` plus ``id`` as a tie-breaker, so the cost of a page does not
+depend on how deep it is and no ``COUNT(*)`` is run.
+"""
+import base64
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only keyset pagination over a composite ordering"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        # Explicit ordering for querysets that are not the view's own
+        self.ordering = ordering
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 20
+        if self.page_size_query_param in request.query_params:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+            except (TypeError, ValueError):
+                pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, queryset, view):
+        """Explicit, view (``keyset_ordering``) or ``Meta.ordering``, plus the primary key"""
+        ordering = list(
+            self.ordering or getattr(view, 'keyset_ordering', None) or queryset.model._meta.ordering or []
+        )
+        names = [field.lstrip('-') for field in ordering]
+        pk = queryset.model._meta.pk
+        if not {pk.name, pk.attname, 'pk'} & set(names):
+            # Break ties in the same direction as the last ordering column
+            descending = bool(ordering) and ordering[-1].startswith('-')
+            ordering.append(f'-{pk.attname}' if descending else pk.attname)
+        return ordering
+
+    def encode_cursor(self, values):
+        data = json.dumps(values, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    def decode_cursor(self, cursor, queryset, ordering):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            model = queryset.model
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def position_of(self, obj, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(obj, obj._meta.get_field(field.lstrip('-')).attname)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif value is not None and not isinstance(value, (int, str)):
+                value = str(value)
+            values.append(value)
+        return values
+
+    def after_filter(self, ordering, values):
+        """``Q`` selecting rows strictly after ``values`` in ``ordering``"""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset, view)
+        queryset = queryset.order_by(*ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after_filter(ordering, self.decode_cursor(cursor, queryset, ordering)))
+
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_position = self.position_of(page[-1], ordering) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """Page-number pagination by default; keyset pagination when ``cursor`` is in the query string"""
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,362 @@
+"""
+Full-text search over payments, tenants, units and damage reports.
+
+Each indexed object has one ``SearchEntry`` row holding the concatenated text
+of its searchable fields and the object's owner, refreshed by
+``post_save``/``post_delete`` signals. Matches are narrowed to the requesting
+owner, and to the rows of the queryset being searched, inside the full-text
+query, before ranking and the result limit.
+Queries run against a vendor-specific index:
+
+* SQLite: an FTS5 external-content table ranked with ``bm25()``
+* PostgreSQL: a GIN index on ``to_tsvector('simple', content)`` ranked with ``ts_rank``
+
+Other backends fall back to ``LIKE`` over the search entries table.
+
+The index is created by ``ensure_fulltext_index`` after every ``migrate``
+(and by ``rebuild_search_index``) rather than by a migration, since deploys
+regenerate the migration files. Until it exists, ``search`` filters the
+queryset with ``icontains`` over the searchable fields instead.
+"""
+import logging
+import re
+from django.apps import apps
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Case, IntegerField, OuterRef, Q, Subquery, When
+from django.db.models.signals import post_save, post_delete, post_migrate
+from .models import SearchEntry
+
+# Model label -> fields concatenated into the indexed text
+SEARCH_FIELDS = {
+    'payments.Payment': ['payment_id', 'reference_number', 'receipt_number', 'description'],
+    'tenants.Tenant': ['tenant_id', 'first_name', 'last_name', 'email', 'phone'],
+    'units.Unit': ['unit_id', 'name', 'location', 'tenant_name'],
+    'units.DamageReport': ['damage_id', 'damage_type', 'description', 'reported_by'],
+}
+
+# Upper bound on ranked matches fetched per query; keeps latency flat as tables grow
+MAX_RESULTS = 1000
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+FTS_TABLE = 'search_entries_fts'
+
+# Statements creating the full-text index; each is safe to run again
+FULLTEXT_SQL = {
+    'sqlite': [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_entries_fts USING fts5(
+            content, doc_type UNINDEXED,
+            content='search_entries', content_rowid='id'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_entries_ai AFTER INSERT ON search_entries BEGIN
+            INSERT INTO search_entries_fts(rowid, content, doc_type)
+            VALUES (new.id, new.content, new.doc_type);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_entries_ad AFTER DELETE ON search_entries BEGIN
+            INSERT INTO search_entries_fts(search_entries_fts, rowid, content, doc_type)
+            VALUES ('delete', old.id, old.content, old.doc_type);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS search_entries_au AFTER UPDATE ON search_entries BEGIN
+            INSERT INTO search_entries_fts(search_entries_fts, rowid, content, doc_type)
+            VALUES ('delete', old.id, old.content, old.doc_type);
+            INSERT INTO search_entries_fts(rowid, content, doc_type)
+            VALUES (new.id, new.content, new.doc_type);
+        END
+        """,
+    ],
+    'postgresql': [
+        "CREATE INDEX IF NOT EXISTS search_entries_tsv_idx ON search_entries USING GIN (to_tsvector('simple', content))",
+    ],
+}
+
+logger = logging.getLogger(__name__)
+
+# Connection alias -> whether the tables ``matching_ids`` queries exist
+_fulltext_ready = {}
+
+
+def doc_type_for(model):
+    return model._meta.label_lower
+
+
+def owner_id_for(user):
+    """Owner to narrow matches to; None (no narrowing) for anonymous callers"""
+    if user is not None and getattr(user, 'is_authenticated', False):
+        return user.pk
+    return None
+
+
+def has_owner(model):
+    return any(field.name == 'owner' for field in model._meta.fields)
+
+
+def document_text(instance):
+    """Concatenate the searchable field values of ``instance``"""
+    fields = SEARCH_FIELDS[instance._meta.label]
+    values = [getattr(instance, field, '') for field in fields]
+    return ' '.join(str(value) for value in values if value)
+
+
+def index_objects(instances):
+    """Create or refresh the search entries for ``instances`` (all of one model)"""
+    instances = [instance for instance in instances if instance.pk is not None]
+    if not instances:
+        return
+    doc_type = doc_type_for(type(instances[0]))
+    existing = dict(
+        SearchEntry.objects.filter(
+            doc_type=doc_type,
+            object_id__in=[instance.pk for instance in instances],
+        ).values_list('object_id', 'id')
+    )
+    to_create = []
+    to_update = []
+    for instance in instances:
+        entry = SearchEntry(
+            doc_type=doc_type,
+            object_id=instance.pk,
+            content=document_text(instance),
+            owner_id=getattr(instance, 'owner_id', None),
+        )
+        if instance.pk in existing:
+            entry.id = existing[instance.pk]
+            to_update.append(entry)
+        else:
+            to_create.append(entry)
+    if to_create:
+        SearchEntry.objects.bulk_create(to_create, batch_size=500, ignore_conflicts=True)
+    if to_update:
+        SearchEntry.objects.bulk_update(to_update, ['content', 'owner'], batch_size=500)
+
+
+def unindex_object(instance):
+    SearchEntry.objects.filter(doc_type=doc_type_for(type(instance)), object_id=instance.pk).delete()
+
+
+def rebuild(model):
+    """Re-index every row of ``model``; returns the number of rows indexed"""
+    SearchEntry.objects.filter(doc_type=doc_type_for(model)).delete()
+    fields = list(SEARCH_FIELDS[model._meta.label])
+    if has_owner(model):
+        fields.append('owner')
+    count = 0
+    batch = []
+    for instance in model._default_manager.only('pk', *fields).iterator(chunk_size=1000):
+        batch.append(instance)
+        if len(batch) >= 1000:
+            index_objects(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        index_objects(batch)
+        count += len(batch)
+    return count
+
+
+def _table_names(using):
+    with connections[using].cursor() as cursor:
+        return set(connections[using].introspection.table_names(cursor))
+
+
+def ensure_fulltext_index(using='default'):
+    """Create the full-text index over the search entries if it is missing
+
+    Returns True when it had to be created. A new FTS5 table is filled from
+    the existing entries.
+    """
+    connection = connections[using]
+    statements = FULLTEXT_SQL.get(connection.vendor)
+    tables = _table_names(using)
+    _fulltext_ready.pop(using, None)
+    if not statements or SearchEntry._meta.db_table not in tables:
+        return False
+    created = connection.vendor == 'sqlite' and FTS_TABLE not in tables
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+        if created:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return created
+
+
+def fulltext_available(using='default'):
+    """Whether the full-text tables exist; introspected once per process"""
+    if using not in _fulltext_ready:
+        tables = _table_names(using)
+        required = {SearchEntry._meta.db_table}
+        if connections[using].vendor == 'sqlite':
+            required.add(FTS_TABLE)
+        missing = required - tables
+        if missing:
+            logger.warning(f"Search index missing, run migrations: {', '.join(sorted(missing))}")
+        _fulltext_ready[using] = not missing
+    return _fulltext_ready[using]
+
+
+def _icontains(queryset, query):
+    """Rows with any searchable field containing ``query``; used without the index"""
+    condition = Q()
+    for field in SEARCH_FIELDS[queryset.model._meta.label]:
+        condition |= Q(**{f'{field}__icontains': query})
+    return queryset.filter(condition)
+
+
+def _tokens(query):
+    return TOKEN_RE.findall(query.lower())
+
+
+def _owner_clause(column, owner_id):
+    """SQL condition and params restricting ``column`` to ``owner_id``, if any"""
+    if owner_id is None:
+        return '', []
+    return f'AND {column} = %s', [owner_id]
+
+
+def _within_clause(column, within):
+    """SQL condition and params restricting ``column`` to the rows of ``within``, if any"""
+    if within is None:
+        return '', []
+    pks = within.order_by().values('pk')
+    sql, params = pks.query.get_compiler(using=pks.db).as_sql()
+    return f'AND {column} IN ({sql})', list(params)
+
+
+def _sqlite_ids(doc_type, tokens, limit, owner_id=None, within=None, using=DEFAULT_DB_ALIAS):
+    # Every token must match, each as a prefix: "pay"* AND "2025"*
+    match = ' AND '.join('"{}"*'.format(token.replace('"', '""')) for token in tokens)
+    owner_sql, owner_params = _owner_clause('e.owner_id', owner_id)
+    within_sql, within_params = _within_clause('e.object_id', within)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT e.object_id
+            FROM search_entries_fts
+            JOIN search_entries e ON e.id = search_entries_fts.rowid
+            WHERE search_entries_fts MATCH %s AND e.doc_type = %s {owner_sql} {within_sql}
+            ORDER BY bm25(search_entries_fts)
+            LIMIT %s
+            """,
+            [match, doc_type, *owner_params, *within_params, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgresql_ids(doc_type, tokens, limit, owner_id=None, within=None, using=DEFAULT_DB_ALIAS):
+    query = ' & '.join(f'{token}:*' for token in tokens)
+    owner_sql, owner_params = _owner_clause('owner_id', owner_id)
+    within_sql, within_params = _within_clause('object_id', within)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT object_id
+            FROM search_entries
+            WHERE doc_type = %s {owner_sql} {within_sql}
+              AND to_tsvector('simple', content) @@ to_tsquery('simple', %s)
+            ORDER BY ts_rank(to_tsvector('simple', content), to_tsquery('simple', %s)) DESC
+            LIMIT %s
+            """,
+            [doc_type, *owner_params, *within_params, query, query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(doc_type, tokens, limit, owner_id=None, within=None, using=DEFAULT_DB_ALIAS):
+    entries = SearchEntry.objects.using(using).filter(doc_type=doc_type)
+    if owner_id is not None:
+        entries = entries.filter(owner_id=owner_id)
+    if within is not None:
+        entries = entries.filter(object_id__in=within.order_by().values('pk'))
+    for token in tokens:
+        entries = entries.filter(content__icontains=token)
+    return list(entries.values_list('object_id', flat=True)[:limit])
+
+
+def matching_ids(model, query, limit=MAX_RESULTS, owner_id=None, within=None, using=DEFAULT_DB_ALIAS):
+    """IDs of ``model`` rows matching ``query``, best match first
+
+    With ``owner_id`` only that owner's rows are matched, and with ``within``
+    (a queryset of ``model``, which also decides the database) only its rows,
+    so ``limit`` applies to those matches alone.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return []
+    if within is not None:
+        using = within.db
+    doc_type = doc_type_for(model)
+    vendor = connections[using].vendor
+    if vendor == 'sqlite':
+        return _sqlite_ids(doc_type, tokens, limit, owner_id, within, using)
+    if vendor == 'postgresql':
+        return _postgresql_ids(doc_type, tokens, limit, owner_id, within, using)
+    return _fallback_ids(doc_type, tokens, limit, owner_id, within, using)
+
+
+def search(queryset, query, limit=MAX_RESULTS, user=None):
+    """Narrow ``queryset`` to rows matching ``query``, ordered by relevance
+
+    Pass the requesting ``user`` to match only their rows (see ``owner_id_for``).
+    """
+    if not fulltext_available(queryset.db):
+        return _icontains(queryset, query.strip())
+    # Filters already on the queryset (status, owner, ...) apply before the limit
+    within = queryset if queryset.query.where else None
+    ids = matching_ids(queryset.model, query, limit, owner_id_for(user), within, queryset.db)
+    if not ids:
+        return queryset.none()
+    rank = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by('search_rank')
+
+
+def _index_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    index_objects([instance])
+
+
+def _unindex_on_delete(sender, instance, **kwargs):
+    unindex_object(instance)
+
+
+def copy_missing_owners(using='default'):
+    """Fill in the owner of entries indexed before entries carried one"""
+    introspection = connections[using].introspection
+    with connections[using].cursor() as cursor:
+        tables = set(introspection.table_names(cursor))
+        if SearchEntry._meta.db_table not in tables:
+            return
+        columns = {column.name for column in introspection.get_table_description(cursor, SearchEntry._meta.db_table)}
+    if 'owner_id' not in columns:
+        return
+    for label in SEARCH_FIELDS:
+        model = apps.get_model(label)
+        if not has_owner(model) or model._meta.db_table not in tables:
+            continue
+        owners = model._default_manager.using(using).filter(pk=OuterRef('object_id')).values('owner_id')[:1]
+        SearchEntry.objects.using(using).filter(
+            doc_type=doc_type_for(model), owner__isnull=True,
+        ).update(owner_id=Subquery(owners))
+
+
+def _after_migrate(sender, using='default', **kwargs):
+    ensure_fulltext_index(using)
+    copy_missing_owners(using)
+
+
+def connect_signals():
+    """Keep search entries in sync for every model in ``SEARCH_FIELDS``"""
+    for label in SEARCH_FIELDS:
+        model = apps.get_model(label)
+        post_save.connect(_index_on_save, sender=model, dispatch_uid=f'search_index_{label}')
+        post_delete.connect(_unindex_on_delete, sender=model, dispatch_uid=f'search_unindex_{label}')
+    post_migrate.connect(_after_migrate, sender=apps.get_app_config('core'), dispatch_uid='search_after_migrate')
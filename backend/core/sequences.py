@@ -0,0 +1,153 @@
+"""
+Sequence allocation for human-readable IDs (PAY-2025-0001, TNT-2025-001, ...).
+
+Each (prefix, year) pair has a counter row in ``core.Sequence``. Values are
+reserved with a single ``UPDATE ... SET last_value = last_value + n`` which
+takes the row lock, so concurrent writers queue behind each other instead of
+colliding on the unique constraint and retrying.
+
+Set ``SEQUENCE_BLOCK_SIZE`` in settings to reserve numbers in blocks per
+worker process. IDs are then no longer strictly ordered across workers, and
+numbers left in a block when a process exits are skipped. A block reserved
+inside a transaction serves the rest of that transaction and is shared with
+the process once it commits.
+"""
+import threading
+from datetime import datetime
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from .models import Sequence
+
+
+def _reserve(prefix, year, count, seed=None):
+    """Reserve ``count`` consecutive values and return the first one"""
+    with transaction.atomic():
+        updated = Sequence.objects.filter(prefix=prefix, year=year).update(
+            last_value=F('last_value') + count
+        )
+        if not updated:
+            start_at = seed() if seed else 0
+            try:
+                with transaction.atomic():
+                    Sequence.objects.create(prefix=prefix, year=year, last_value=start_at + count)
+                return start_at + 1
+            except IntegrityError:
+                # Another writer created the counter first
+                Sequence.objects.filter(prefix=prefix, year=year).update(
+                    last_value=F('last_value') + count
+                )
+        last_value = Sequence.objects.filter(prefix=prefix, year=year).values_list(
+            'last_value', flat=True
+        ).get()
+    return last_value - count + 1
+
+
+class SequenceAllocator:
+    """Hands out sequence values, optionally from per-process pre-allocated blocks"""
+
+    def __init__(self, block_size=1):
+        self.block_size = max(int(block_size), 1)
+        self._blocks = {}
+        self._lock = threading.Lock()
+        # Blocks reserved inside a transaction that has not committed yet
+        self._local = threading.local()
+
+    def allocate(self, prefix, year, count=1, seed=None):
+        """Return a list of ``count`` unused values for ``prefix``/``year``"""
+        if count > 1 or self.block_size == 1:
+            first = _reserve(prefix, year, count, seed)
+            return list(range(first, first + count))
+
+        key = (prefix, year)
+        with self._lock:
+            block = self._blocks.get(key)
+            if block and block[0] <= block[1]:
+                value = block[0]
+                self._blocks[key] = (value + 1, block[1])
+                return [value]
+
+        if connection.in_atomic_block:
+            return [self._allocate_pending(key, prefix, year, seed)]
+
+        first = _reserve(prefix, year, self.block_size, seed)
+        with self._lock:
+            self._blocks[key] = (first + 1, first + self.block_size - 1)
+        return [first]
+
+    def _allocate_pending(self, key, prefix, year, seed):
+        """Hand out a value from the block this transaction reserved
+
+        The rest of the block only joins the shared pool once the reservation
+        is durable; if the transaction rolls back the counter does too, and
+        the block is dropped along with its commit callback.
+        """
+        pending = getattr(self._local, 'pending', None)
+        if pending is None:
+            pending = self._local.pending = {}
+        block = pending.get(key)
+        if block is not None and block['next'] <= block['last'] and self._registered(block['share']):
+            value = block['next']
+            block['next'] += 1
+            return value
+
+        first = _reserve(prefix, year, self.block_size, seed)
+        block = {'next': first + 1, 'last': first + self.block_size - 1}
+
+        def share():
+            if pending.get(key) is block:
+                del pending[key]
+            if block['next'] <= block['last']:
+                with self._lock:
+                    self._blocks[key] = (block['next'], block['last'])
+
+        block['share'] = share
+        pending[key] = block
+        transaction.on_commit(share)
+        return first
+
+    @staticmethod
+    def _registered(callback):
+        """Whether ``callback`` is still due to run when the transaction commits"""
+        return any(entry[1] is callback for entry in connection.run_on_commit)
+
+    def reset(self):
+        """Forget any pre-allocated blocks held by this process"""
+        with self._lock:
+            self._blocks.clear()
+
+
+allocator = SequenceAllocator(block_size=getattr(settings, 'SEQUENCE_BLOCK_SIZE', 1))
+
+
+def highest_existing(model, field, prefix):
+    """Largest numeric suffix already used for ``prefix`` in ``model.field``
+
+    Only runs the first time a counter is created, so IDs issued before the
+    sequence table existed are never handed out again.
+    """
+    highest = 0
+    values = model._default_manager.filter(**{f'{field}__startswith': prefix}).values_list(field, flat=True)
+    for value in values.iterator():
+        suffix = value[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def next_identifiers(prefix, model, field, count, width=4, year=None):
+    """Allocate ``count`` IDs of the form ``PREFIX-YYYY-NNNN``"""
+    year = year or datetime.now().year
+    id_prefix = f'{prefix}-{year}-'
+    values = allocator.allocate(
+        prefix,
+        year,
+        count=count,
+        seed=lambda: highest_existing(model, field, id_prefix),
+    )
+    return [f'{id_prefix}{value:0{width}d}' for value in values]
+
+
+def next_identifier(prefix, model, field, width=4, year=None):
+    """Allocate a single ID of the form ``PREFIX-YYYY-NNNN``"""
+    return next_identifiers(prefix, model, field, 1, width=width, year=year)[0]
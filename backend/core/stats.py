@@ -0,0 +1,205 @@
+"""
+Dashboard statistics shared by the ``stats`` endpoints.
+
+Each entry in ``STAT_SETS`` names the model it aggregates and a function
+returning named aggregate expressions. ``get_stats`` evaluates them all in a
+single ``aggregate()`` call using conditional ``Count``/``Sum`` filters and
+caches the result per owner for ``STATS_CACHE_TIMEOUT`` seconds. Saving or
+deleting a row of any model in ``invalidated_by`` drops the cached stats for
+that row's owner (and the unscoped view); code that writes in bulk calls
+``invalidate`` itself.
+
+Whether each model's table exists is checked once per process through the
+database introspection API instead of a ``sqlite_master`` probe per request.
+"""
+import logging
+from datetime import date
+from decimal import Decimal
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.db.models.signals import post_save, post_delete, post_migrate
+
+logger = logging.getLogger(__name__)
+
+ALL_OWNERS = 'all'
+
+
+def _unit_metrics():
+    return {
+        'total_units': Count('id'),
+        'occupied_units': Count('id', filter=Q(status='Occupied')),
+        'vacant_units': Count('id', filter=Q(status='Vacant')),
+        'maintenance_units': Count('id', filter=Q(status='Under Maintenance')),
+    }
+
+
+def _tenant_metrics():
+    return {
+        'total_tenants': Count('id'),
+        'active_tenants': Count('id', filter=Q(status='Active')),
+        'inactive_tenants': Count('id', filter=Q(status='Inactive')),
+        'moved_out_tenants': Count('id', filter=Q(status='Moved Out')),
+    }
+
+
+def _payment_metrics():
+    # Reads the pre-aggregated rollup buckets rather than the payments table
+    overdue = Q(status='pending', due_date__lt=date.today())
+    return {
+        'total_payments': Sum('payment_count'),
+        'completed_payments': Sum('payment_count', filter=Q(status='completed')),
+        'pending_payments': Sum('payment_count', filter=Q(status='pending')),
+        'failed_payments': Sum('payment_count', filter=Q(status='failed')),
+        'overdue_payments': Sum('payment_count', filter=overdue),
+        'completed_amount': Sum('total_amount', filter=Q(status='completed')),
+        'pending_amount': Sum('total_amount', filter=Q(status='pending')),
+        'overdue_amount': Sum('total_amount', filter=overdue),
+    }
+
+
+def _payment_result(values):
+    total_amount = values.pop('completed_amount')
+    values['total_amount'] = total_amount
+    values['this_month_amount'] = total_amount  # Simplified
+    return values
+
+
+def _unit_damage_metrics():
+    return {
+        'total_reports': Count('id'),
+        'pending_reports': Count('id', filter=Q(status='Pending')),
+        'in_progress_reports': Count('id', filter=Q(status='In Progress')),
+        'repaired_reports': Count('id', filter=Q(status='Repaired')),
+        'unrepaired_reports': Count('id', filter=~Q(status='Repaired')),
+    }
+
+
+# Stat set name -> model aggregated, metric builder, models whose writes invalidate it
+STAT_SETS = {
+    'units': {
+        'model': 'units.Unit',
+        'metrics': _unit_metrics,
+        'invalidated_by': ['units.Unit'],
+    },
+    'tenants': {
+        'model': 'tenants.Tenant',
+        'metrics': _tenant_metrics,
+        'invalidated_by': ['tenants.Tenant'],
+    },
+    'payments': {
+        'model': 'payments.PaymentRollup',
+        'metrics': _payment_metrics,
+        'result': _payment_result,
+        'invalidated_by': ['payments.Payment'],
+        # "Overdue" depends on today's date
+        'daily': True,
+    },
+    'unit_damage_reports': {
+        'model': 'units.DamageReport',
+        'metrics': _unit_damage_metrics,
+        'invalidated_by': ['units.DamageReport'],
+    },
+}
+
+_existing_tables = None
+
+
+def table_exists(model):
+    """Whether ``model``'s table exists; introspected once per process"""
+    global _existing_tables
+    if _existing_tables is None:
+        _existing_tables = set(connection.introspection.table_names())
+        missing = [
+            stat_set['model'] for stat_set in STAT_SETS.values()
+            if apps.get_model(stat_set['model'])._meta.db_table not in _existing_tables
+        ]
+        if missing:
+            logger.warning(f"Stats tables missing, run migrations: {', '.join(missing)}")
+    return model._meta.db_table in _existing_tables
+
+
+def _reset_schema_cache(**kwargs):
+    global _existing_tables
+    _existing_tables = None
+
+
+def cache_timeout():
+    return getattr(settings, 'STATS_CACHE_TIMEOUT', 60)
+
+
+def owner_key(user):
+    if user is not None and getattr(user, 'is_authenticated', False):
+        return user.pk
+    return ALL_OWNERS
+
+
+def _generation(name):
+    return cache.get_or_set(f'stats:{name}:generation', 1, None)
+
+
+def _cache_key(name, owner):
+    parts = ['stats', name, str(_generation(name)), str(owner)]
+    if STAT_SETS[name].get('daily'):
+        parts.append(date.today().isoformat())
+    return ':'.join(parts)
+
+
+def empty_stats(name):
+    """The stat set with every value zero"""
+    values = {metric: 0 for metric in STAT_SETS[name]['metrics']()}
+    result = STAT_SETS[name].get('result')
+    return result(values) if result else values
+
+
+def compute_stats(name, queryset):
+    """Evaluate the stat set over ``queryset`` in one aggregate query"""
+    stat_set = STAT_SETS[name]
+    values = queryset.aggregate(**stat_set['metrics']())
+    values = {
+        metric: float(value) if isinstance(value, Decimal) else (value or 0)
+        for metric, value in values.items()
+    }
+    result = stat_set.get('result')
+    return result(values) if result else values
+
+
+def get_stats(name, queryset, user=None):
+    """Cached stats for ``queryset``, which must already be scoped to ``user``"""
+    if not table_exists(queryset.model):
+        return empty_stats(name)
+    key = _cache_key(name, owner_key(user))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats(name, queryset)
+        cache.set(key, stats, cache_timeout())
+    return stats
+
+
+def invalidate(name, owner_id=None):
+    """Drop cached stats for one owner, or for everyone when ``owner_id`` is None"""
+    if owner_id is None:
+        try:
+            cache.incr(f'stats:{name}:generation')
+        except ValueError:
+            cache.set(f'stats:{name}:generation', 1, None)
+        return
+    cache.delete_many([_cache_key(name, owner_id), _cache_key(name, ALL_OWNERS)])
+
+
+def _invalidate_on_change(sender, instance, **kwargs):
+    for name, stat_set in STAT_SETS.items():
+        if sender._meta.label in stat_set['invalidated_by']:
+            invalidate(name, getattr(instance, 'owner_id', None))
+
+
+def connect_signals():
+    """Drop cached stats whenever a row they depend on changes"""
+    labels = {label for stat_set in STAT_SETS.values() for label in stat_set['invalidated_by']}
+    for label in labels:
+        model = apps.get_model(label)
+        post_save.connect(_invalidate_on_change, sender=model, dispatch_uid=f'stats_save_{label}')
+        post_delete.connect(_invalidate_on_change, sender=model, dispatch_uid=f'stats_delete_{label}')
+    post_migrate.connect(_reset_schema_cache, dispatch_uid='stats_reset_schema_cache')
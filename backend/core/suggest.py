@@ -0,0 +1,79 @@
+"""
+Typeahead lookups for the ``suggest`` endpoints.
+
+Matching is a case-insensitive prefix test written as a range over
+``UPPER(column)``: ``UPPER(name) >= 'AB' AND UPPER(name) < 'AB\\U0010ffff'``.
+Unlike ``istartswith`` (``LIKE``), the range can be answered from the
+``(owner, PrefixKey(column))`` expression indexes on SQLite and PostgreSQL
+alike, so a lookup reads only the first few matching index entries however
+large the portfolio is. Results are the top ``limit`` rows as ``values()``
+dicts, never model instances.
+
+The range is only a prefix test when strings compare code point by code
+point, so ``PrefixKey`` uses the ``C`` collation on PostgreSQL (a locale
+collation skips spaces and punctuation, letting ``'A BC'`` fall between
+``'AB'`` and ``'AB\\U0010ffff'``); SQLite's default BINARY collation already
+compares that way. Under those collations ``UPPER`` only folds ASCII
+letters, and the search term is folded the same way: ``'é'`` matches
+``'élan'`` but not ``'Élan'``, and ``'ß'`` is never expanded to ``'SS'``.
+"""
+import string
+
+from django.conf import settings
+from django.db.models import CharField, Func, Q
+
+# Sorts after every other character, closing the prefix range
+PREFIX_END = '\U0010ffff'
+
+ASCII_UPPER = str.maketrans(string.ascii_lowercase, string.ascii_uppercase)
+
+
+class PrefixKey(Func):
+    """``UPPER(column)`` under a code point collation; indexed and compared alike"""
+    function = 'UPPER'
+    output_field = CharField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template='%(function)s(%(expressions)s COLLATE "C")',
+                           **extra_context)
+
+
+def default_limit():
+    return getattr(settings, 'SUGGEST_LIMIT', 10)
+
+
+def max_limit():
+    return getattr(settings, 'SUGGEST_MAX_LIMIT', 50)
+
+
+def upper_alias(field):
+    return f'{field}_upper'
+
+
+def prefix_q(field, term):
+    """``Q`` matching rows whose ``field`` starts with ``term``, ignoring case"""
+    term = term.translate(ASCII_UPPER)
+    alias = upper_alias(field)
+    return Q(**{f'{alias}__gte': term, f'{alias}__lt': term + PREFIX_END})
+
+
+def top_matches(queryset, conditions, fields, projection, order_by, limit, **expressions):
+    """Top ``limit`` rows of ``queryset`` matching any of ``conditions``
+
+    ``fields`` are the columns the conditions test (annotated with their
+    upper-cased value); ``projection`` and ``expressions`` the values returned.
+    """
+    queryset = queryset.annotate(**{upper_alias(field): PrefixKey(field) for field in fields})
+    match = Q()
+    for condition in conditions:
+        match |= condition
+    return list(queryset.filter(match).order_by(*order_by).values(*projection, **expressions)[:limit])
+
+
+def parse_limit(value):
+    """The requested result count, clamped to ``SUGGEST_MAX_LIMIT``"""
+    try:
+        limit = int(value) if value not in (None, '') else default_limit()
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, max_limit()))
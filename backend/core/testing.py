@@ -0,0 +1,100 @@
+"""
+Fixtures shared by the app test modules.
+
+``make_*`` create rows with just enough fields filled in; pass any field to
+override the default. ``api_client`` returns a DRF client authenticated as
+an owner without going through Firebase; ``firebase_login`` patches token
+verification instead, for tests that need the real authentication path
+(middleware, token cache, idempotency keys).
+"""
+import itertools
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+_sequence = itertools.count(1)
+
+
+def make_owner(**fields):
+    number = next(_sequence)
+    fields.setdefault('firebase_uid', f'owner-{number}')
+    fields.setdefault('email', f'owner{number}@example.com')
+    return CustomUser.objects.create(**fields)
+
+
+def make_unit(owner, **fields):
+    from units.models import Unit
+    number = next(_sequence)
+    fields.setdefault('unit_id', f'U-{number:04d}')
+    fields.setdefault('name', f'Unit {number}')
+    fields.setdefault('unit_type', 'studio')
+    fields.setdefault('rent', Decimal('1000.00'))
+    return Unit.objects.create(owner=owner, **fields)
+
+
+def make_tenant(owner, **fields):
+    from tenants.models import Tenant
+    number = next(_sequence)
+    fields.setdefault('first_name', f'First{number}')
+    fields.setdefault('last_name', f'Last{number}')
+    fields.setdefault('email', f'tenant{number}@example.com')
+    fields.setdefault('phone', f'0700{number:06d}')
+    return Tenant.objects.create(owner=owner, **fields)
+
+
+def make_damage_report(unit, **fields):
+    from units.models import DamageReport
+    fields.setdefault('damage_type', 'plumbing')
+    fields.setdefault('description', 'Leaking pipe')
+    fields.setdefault('priority', 'medium')
+    fields.setdefault('reported_by', 'Caretaker')
+    fields.setdefault('report_date', date.today())
+    return DamageReport.objects.create(unit=unit, owner=unit.owner, **fields)
+
+
+def make_payment(owner, **fields):
+    from payments.models import Payment
+    fields.setdefault('amount', Decimal('100.00'))
+    fields.setdefault('payment_method', 'cash')
+    fields.setdefault('payment_date', date.today())
+    fields.setdefault('due_date', date.today())
+    return Payment.objects.create(owner=owner, **fields)
+
+
+def api_client(owner=None):
+    client = APIClient()
+    if owner is not None:
+        client.force_authenticate(user=owner)
+    return client
+
+
+@contextmanager
+def firebase_login(*owners):
+    """Accept ``Bearer token-<firebase_uid>`` for each of ``owners``
+
+    Yields a function returning the request headers for an owner.
+    """
+    decoded = {
+        f'token-{owner.firebase_uid}': {'uid': owner.firebase_uid, 'email': owner.email, 'exp': time.time() + 3600}
+        for owner in owners
+    }
+
+    def verify(token):
+        if token not in decoded:
+            raise ValueError('Invalid token')
+        return decoded[token]
+
+    def headers(owner):
+        return {'HTTP_AUTHORIZATION': f'Bearer token-{owner.firebase_uid}'}
+
+    from users import token_cache
+    token_cache.tokens.clear()
+    cache.clear()
+    with mock.patch('firebase_admin.auth.verify_id_token', side_effect=verify):
+        yield headers
+    token_cache.tokens.clear()
@@ -0,0 +1,640 @@
+import asyncio
+import csv
+import gzip
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from core.testing import (
+    api_client, firebase_login, make_damage_report, make_owner, make_payment, make_tenant, make_unit,
+)
+from payments.models import Payment
+from units.models import Unit
+from tenants.models import Tenant, TenantHistory
+from . import batch, changes, events, exports, idempotency, search, stats, views
+from .models import ChangeEntry, IdempotencyKey, SearchEntry, Sequence
+from .sequences import SequenceAllocator, next_identifier, next_identifiers
+
+class SequenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_identifiers_are_consecutive(self):
+        first = next_identifier('TST', Payment, 'payment_id', year=2025)
+        batch = next_identifiers('TST', Payment, 'payment_id', 3, year=2025)
+        self.assertEqual(first, 'TST-2025-0001')
+        self.assertEqual(batch, ['TST-2025-0002', 'TST-2025-0003', 'TST-2025-0004'])
+        self.assertEqual(Sequence.objects.get(prefix='TST', year=2025).last_value, 4)
+
+    def test_counters_are_per_prefix_and_year(self):
+        self.assertEqual(next_identifier('TST', Payment, 'payment_id', year=2025), 'TST-2025-0001')
+        self.assertEqual(next_identifier('TST', Payment, 'payment_id', year=2026), 'TST-2026-0001')
+        self.assertEqual(next_identifier('OTH', Payment, 'payment_id', year=2025, width=3), 'OTH-2025-001')
+
+    def test_new_counter_starts_after_existing_ids(self):
+        owner = make_owner()
+        make_payment(owner, payment_id='TST-2025-0041')
+        make_payment(owner, payment_id='TST-2025-legacy')
+        Sequence.objects.filter(prefix='TST').delete()
+        self.assertEqual(next_identifier('TST', Payment, 'payment_id', year=2025), 'TST-2025-0042')
+
+    def test_reservation_is_one_update_once_counter_exists(self):
+        next_identifier('TST', Payment, 'payment_id', year=2025)
+        with CaptureQueriesContext(connection) as queries:
+            next_identifiers('TST', Payment, 'payment_id', 10, year=2025)
+        statements = [q['sql'].split()[0] for q in queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['UPDATE', 'SELECT'])
+
+    def test_saved_models_get_unique_ids(self):
+        owner = make_owner()
+        ids = {make_payment(owner).payment_id for _ in range(5)}
+        self.assertEqual(len(ids), 5)
+
+
+class SequenceBlockTests(TransactionTestCase):
+    def test_block_is_handed_out_locally(self):
+        allocator = SequenceAllocator(block_size=5)
+        values = [allocator.allocate('BLK', 2025)[0] for _ in range(7)]
+        self.assertEqual(values, [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(Sequence.objects.get(prefix='BLK').last_value, 10)
+
+    def test_rolled_back_block_is_not_reused(self):
+        allocator = SequenceAllocator(block_size=5)
+        try:
+            with transaction.atomic():
+                self.assertEqual(allocator.allocate('BLK', 2025), [1])
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(allocator.allocate('BLK', 2025), [1])
+        self.assertEqual(allocator.allocate('BLK', 2025), [2])
+
+    def test_transaction_reuses_its_pending_block(self):
+        allocator = SequenceAllocator(block_size=5)
+        with transaction.atomic():
+            values = [allocator.allocate('BLK', 2025)[0] for _ in range(3)]
+            self.assertEqual(Sequence.objects.get(prefix='BLK').last_value, 5)
+        self.assertEqual(values, [1, 2, 3])
+        self.assertEqual(allocator.allocate('BLK', 2025), [4])
+        self.assertEqual(Sequence.objects.get(prefix='BLK').last_value, 5)
+
+    def test_block_of_rolled_back_savepoint_is_not_reused(self):
+        allocator = SequenceAllocator(block_size=5)
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    self.assertEqual(allocator.allocate('BLK', 2025), [1])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.assertEqual(allocator.allocate('BLK', 2025), [1])
+            self.assertEqual(allocator.allocate('BLK', 2025), [2])
+        self.assertEqual(allocator.allocate('BLK', 2025), [3])
+
+    def test_reset_drops_held_blocks(self):
+        allocator = SequenceAllocator(block_size=5)
+        allocator.allocate('BLK', 2025)
+        allocator.reset()
+        self.assertEqual(allocator.allocate('BLK', 2025), [6])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        # Ties on every ordering column but the primary key
+        for day in [1, 1, 1, 2, 2, 3, 3]:
+            make_payment(self.owner, payment_date=date(2025, 1, day))
+        Payment.objects.update(created_at=timezone.now())
+        make_payment(make_owner())
+
+    def walk(self, **params):
+        pages = []
+        cursor = ''
+        while cursor is not None:
+            response = self.client.get('/api/payments/', {'cursor': cursor, **params})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            pages.append([row['id'] for row in response.data['results']])
+            next_link = response.data['next']
+            cursor = parse_qs(urlparse(next_link).query)['cursor'][0] if next_link else None
+        return pages
+
+    def test_pages_follow_ordering_without_gaps(self):
+        pages = self.walk(page_size=2)
+        expected = list(
+            Payment.objects.filter(owner=self.owner)
+            .order_by('-payment_date', '-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_page_is_one_query_without_count(self):
+        first = self.client.get('/api/payments/', {'cursor': '', 'page_size': 3})
+        cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/payments/', {'cursor': cursor, 'page_size': 3})
+        selects = [query['sql'] for query in queries if 'FROM "payments"' in query['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('COUNT(', selects[0])
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ['garbage', 'WzFd', 'WyJ4IiwieCIsIngiXQ==']:
+            response = self.client.get('/api/payments/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+    def test_page_numbers_without_cursor(self):
+        response = self.client.get('/api/payments/')
+        self.assertEqual(response.data['count'], 7)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+
+    def entry(self, instance):
+        return SearchEntry.objects.get(doc_type=search.doc_type_for(type(instance)), object_id=instance.pk)
+
+    def test_index_follows_saves_and_deletes(self):
+        tenant = make_tenant(self.owner, first_name='Wanjiru')
+        self.assertIn('Wanjiru', self.entry(tenant).content)
+        self.assertEqual(self.entry(tenant).owner_id, self.owner.pk)
+
+        tenant.first_name = 'Achieng'
+        tenant.save()
+        self.assertNotIn('Wanjiru', self.entry(tenant).content)
+        self.assertEqual(search.matching_ids(Tenant, 'achieng'), [tenant.pk])
+
+        tenant.delete()
+        self.assertFalse(SearchEntry.objects.filter(doc_type=search.doc_type_for(Tenant), object_id=tenant.pk).exists())
+
+    def test_tokens_match_as_prefixes_and_all_must_match(self):
+        both = make_tenant(self.owner, first_name='Grace', last_name='Otieno')
+        make_tenant(self.owner, first_name='Grace', last_name='Mwangi')
+        self.assertEqual(search.matching_ids(Tenant, 'gra otie'), [both.pk])
+        self.assertEqual(search.matching_ids(Tenant, '  '), [])
+
+    def test_matches_are_narrowed_to_owner_before_limit(self):
+        other = make_owner()
+        for _ in range(5):
+            make_tenant(other, last_name='Kamau')
+        mine = make_tenant(self.owner, last_name='Kamau')
+        self.assertEqual(search.matching_ids(Tenant, 'kamau', limit=2, owner_id=self.owner.pk), [mine.pk])
+
+        response = self.client.get('/api/tenants/search/', {'q': 'kamau'})
+        self.assertEqual([row['id'] for row in response.data['results']], [mine.pk])
+
+    def test_queryset_filters_apply_before_limit(self):
+        for _ in range(3):
+            make_payment(self.owner, description='Rent')
+        completed = make_payment(self.owner, status='completed', description='Rent for March, paid late')
+        queryset = Payment.objects.filter(status='completed')
+        self.assertEqual(list(search.search(queryset, 'rent', limit=1)), [completed])
+
+        response = self.client.get('/api/payments/search/', {'q': 'rent', 'status': 'completed'})
+        self.assertEqual([row['id'] for row in response.data['results']], [completed.pk])
+
+    def test_icontains_fallback_without_fulltext_index(self):
+        mine = make_payment(self.owner, reference_number='MPESA-QX81')
+        make_payment(make_owner(), reference_number='MPESA-QX81')
+        with mock.patch.dict(search._fulltext_ready, {'default': False}):
+            response = self.client.get('/api/payments/search/', {'q': 'qx81'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.data['results']], [mine.pk])
+
+    def test_fulltext_index_is_created_after_migrate(self):
+        self.assertTrue(search.fulltext_available())
+        self.assertFalse(search.ensure_fulltext_index())
+
+    def test_rebuild_command(self):
+        tenant = make_tenant(self.owner, first_name='Njeri')
+        SearchEntry.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search.matching_ids(Tenant, 'njeri', owner_id=self.owner.pk), [tenant.pk])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+
+    def content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv_and_ndjson(self):
+        make_payment(self.owner, payment_id='PAY-1', amount=Decimal('10.50'))
+        fields = [('id', 'payment_id'), ('owner', 'owner__email'), ('amount', 'amount')]
+        csv_response = exports.stream_export(Payment.objects.all(), fields, 'out')
+        rows = list(csv.reader(self.content(csv_response).decode().splitlines()))
+        self.assertEqual(rows, [['id', 'owner', 'amount'], ['PAY-1', self.owner.email, '10.50']])
+        self.assertIn('out.csv', csv_response['Content-Disposition'])
+
+        ndjson = exports.stream_export(Payment.objects.all(), fields, 'out', export_format='ndjson')
+        self.assertEqual(
+            [json.loads(line) for line in self.content(ndjson).decode().splitlines()],
+            [{'id': 'PAY-1', 'owner': self.owner.email, 'amount': '10.50'}],
+        )
+
+    def test_gzip(self):
+        make_payment(self.owner, payment_id='PAY-1')
+        response = exports.stream_export(Payment.objects.all(), [('id', 'payment_id')], 'out', compress=True)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(self.content(response)).decode().splitlines(), ['id', 'PAY-1'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            exports.stream_export(Payment.objects.all(), [], 'out', export_format='xlsx')
+
+    def test_endpoint_is_owner_scoped_and_filtered(self):
+        completed = make_payment(self.owner, status='completed')
+        make_payment(self.owner)
+        make_payment(make_owner(), status='completed')
+        response = self.client.get('/api/payments/export/', {'type': 'ndjson', 'status': 'Completed'})
+        lines = self.content(response).decode().splitlines()
+        self.assertEqual([json.loads(line)['payment_id'] for line in lines], [completed.payment_id])
+        self.assertEqual(self.client.get('/api/payments/export/', {'type': 'pdf'}).status_code, 400)
+
+    def test_export_is_one_query(self):
+        for _ in range(5):
+            make_payment(self.owner, tenant=make_tenant(self.owner))
+        response = self.client.get('/api/tenants/export/')
+        with self.assertNumQueries(1):
+            self.content(response)
+        with self.assertNumQueries(1):
+            self.content(self.client.get('/api/payments/export/'))
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+
+    def create_unit(self, headers, owner, key, unit_id='U-IDEM'):
+        body = {'unit_id': unit_id, 'name': 'Idempotent', 'unit_type': 'studio', 'rent': '1000.00', 'owner': owner.pk}
+        return self.client.post('/api/units/', body, content_type='application/json',
+                                HTTP_IDEMPOTENCY_KEY=key, **headers(owner))
+
+    def test_retry_replays_stored_response(self):
+        with firebase_login(self.owner) as headers:
+            first = self.create_unit(headers, self.owner, 'key-1')
+            retry = self.create_unit(headers, self.owner, 'key-1')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Unit.objects.count(), 1)
+
+    def test_key_reused_for_different_request(self):
+        with firebase_login(self.owner) as headers:
+            self.create_unit(headers, self.owner, 'key-1')
+            response = self.create_unit(headers, self.owner, 'key-1', unit_id='U-OTHER')
+        self.assertEqual(response.status_code, 422)
+
+    def test_keys_are_scoped_per_owner(self):
+        other = make_owner()
+        with firebase_login(self.owner, other) as headers:
+            self.create_unit(headers, self.owner, 'key-1')
+            response = self.create_unit(headers, other, 'key-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Unit.objects.count(), 2)
+
+    def test_key_length_is_limited(self):
+        with firebase_login(self.owner) as headers:
+            response = self.create_unit(headers, self.owner, 'k' * 256)
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_claim_lifecycle(self):
+        key = idempotency.scoped_key('key-1', self.owner, 'POST', '/api/units/')
+        self.assertEqual(idempotency.claim(key, 'a'), (idempotency.CLAIMED, None))
+        self.assertEqual(idempotency.claim(key, 'a')[0], idempotency.BUSY)
+
+        idempotency.store(key, 201, 'application/json', b'{"id": 1}')
+        outcome, row = idempotency.claim(key, 'a')
+        self.assertEqual((outcome, idempotency.stored_content(row)), (idempotency.REPLAY, b'{"id": 1}'))
+        self.assertEqual(idempotency.claim(key, 'b')[0], idempotency.MISMATCH)
+
+        idempotency.release(key)
+        self.assertEqual(idempotency.claim(key, 'b')[0], idempotency.CLAIMED)
+
+    def test_expired_and_abandoned_claims_are_taken_over(self):
+        expired = idempotency.scoped_key('expired', self.owner, 'POST', '/api/units/')
+        abandoned = idempotency.scoped_key('abandoned', self.owner, 'POST', '/api/units/')
+        idempotency.claim(expired, 'a')
+        idempotency.store(expired, 201, '', b'')
+        idempotency.claim(abandoned, 'a')
+        IdempotencyKey.objects.filter(key=expired).update(expires_at=timezone.now() - timedelta(seconds=1))
+        IdempotencyKey.objects.filter(key=abandoned).update(created_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(idempotency.claim(expired, 'b')[0], idempotency.CLAIMED)
+        self.assertEqual(idempotency.claim(abandoned, 'b')[0], idempotency.CLAIMED)
+
+    def test_purge_command(self):
+        key = idempotency.scoped_key('key-1', self.owner, 'POST', '/api/units/')
+        idempotency.claim(key, 'a')
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class OwnerScopingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner, self.other = make_owner(), make_owner()
+        self.rows = {owner: self.portfolio(owner) for owner in [self.owner, self.other]}
+
+    def portfolio(self, owner):
+        unit = make_unit(owner, status='Vacant')
+        tenant = make_tenant(owner)
+        return {
+            'units': unit,
+            'tenants': tenant,
+            'tenant-history': TenantHistory.objects.create(
+                tenant=tenant, unit=unit, owner=owner, move_in_date=date(2025, 1, 1), monthly_rent=unit.rent,
+            ),
+            'payments': make_payment(owner, tenant=tenant),
+            'damage-reports': make_damage_report(unit),
+        }
+
+    def test_for_owner(self):
+        self.assertEqual(list(Payment.objects.for_owner(self.owner)), [self.rows[self.owner]['payments']])
+        self.assertEqual(Payment.objects.for_owner(None).count(), 2)
+
+    def test_owner_only_sees_own_rows(self):
+        client = api_client(self.owner)
+        for resource, mine in self.rows[self.owner].items():
+            response = client.get(f'/api/{resource}/')
+            self.assertEqual([row['id'] for row in response.data['results']], [mine.pk], resource)
+            theirs = self.rows[self.other][resource]
+            self.assertEqual(client.get(f'/api/{resource}/{theirs.pk}/').status_code, 404, resource)
+
+    def test_dropdowns_are_scoped(self):
+        client = api_client(self.owner)
+        unit = self.rows[self.owner]['units']
+        self.assertEqual([row['id'] for row in client.get('/api/damage-reports/user_units/').data], [unit.pk])
+        self.assertEqual([row['id'] for row in client.get('/api/tenants/available_units/').data], [unit.pk])
+
+    def test_anonymous_requests_are_not_narrowed(self):
+        response = api_client().get('/api/payments/')
+        self.assertEqual(response.data['count'], 2)
+
+
+class StatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        make_unit(self.owner, status='Occupied')
+        make_unit(self.owner, status='Vacant')
+        make_unit(make_owner(), status='Vacant')
+        stats.table_exists(Unit)
+
+    def unit_stats(self):
+        return self.client.get('/api/units/stats/').data
+
+    def test_one_aggregate_then_cached(self):
+        with self.assertNumQueries(1):
+            values = self.unit_stats()
+        self.assertEqual((values['total_units'], values['occupied_units'], values['vacant_units']), (2, 1, 1))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unit_stats(), values)
+
+    def test_writes_invalidate_only_their_owner(self):
+        self.unit_stats()
+        make_unit(make_owner())
+        with self.assertNumQueries(0):
+            self.unit_stats()
+
+        make_unit(self.owner, status='Under Maintenance')
+        self.assertEqual(self.unit_stats()['maintenance_units'], 1)
+
+    def test_bulk_invalidation_drops_every_owner(self):
+        self.unit_stats()
+        Unit.objects.filter(owner=self.owner).update(status='Vacant')
+        stats.invalidate('units')
+        self.assertEqual(self.unit_stats()['vacant_units'], 2)
+
+    def test_empty_stats(self):
+        self.assertEqual(stats.empty_stats('payments')['total_amount'], 0)
+        self.assertTrue(all(value == 0 for value in stats.empty_stats('units').values()))
+
+
+class ChangeLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        self.cursor = changes.latest_cursor()
+
+    def logged(self):
+        return list(ChangeEntry.objects.filter(id__gt=self.cursor).values_list('model', 'action'))
+
+    def test_transaction_writes_one_folded_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                unit = make_unit(self.owner)
+                unit.name = 'Renamed'
+                unit.save()
+                make_unit(self.owner).delete()
+                make_tenant(self.owner)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "change_log"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(self.logged(), [('units.Unit', 'created'), ('tenants.Tenant', 'created')])
+
+    def test_rolled_back_changes_are_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    make_unit(self.owner)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(self.logged(), [])
+
+    def test_feed_compacts_to_final_state(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            known = make_unit(self.owner)
+            gone = make_unit(self.owner)
+        cursor = changes.latest_cursor()
+        with self.captureOnCommitCallbacks(execute=True):
+            unit = make_unit(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            unit.name = 'Renamed'
+            unit.save()
+            known.name = 'Updated'
+            known.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            gone_pk = gone.pk
+            gone.delete()
+            make_unit(self.owner).delete()
+            make_unit(make_owner())
+
+        feed = changes.changes_since(cursor, self.owner)
+        units = feed['changes']['units']
+        self.assertEqual([row['name'] for row in units['created']], ['Renamed'])
+        self.assertEqual([row['name'] for row in units['updated']], ['Updated'])
+        self.assertEqual(units['deleted'], [gone_pk])
+        self.assertFalse(feed['has_more'])
+
+    def test_feed_pages_by_cursor(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                make_unit(self.owner)
+        first = self.client.get('/api/changes/', {'since': self.cursor, 'limit': 2}).data
+        self.assertTrue(first['has_more'])
+        self.assertEqual(len(first['changes']['units']['created']), 2)
+        rest = self.client.get('/api/changes/', {'since': first['cursor']}).data
+        self.assertEqual((rest['has_more'], len(rest['changes']['units']['created'])), (False, 1))
+
+    def test_endpoint_errors(self):
+        self.assertEqual(self.client.get('/api/changes/').data['changes'], {})
+        self.assertEqual(self.client.get('/api/changes/', {'since': '-1'}).status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_unit(self.owner)
+            make_unit(self.owner)
+        ChangeEntry.objects.update(created_at=timezone.now() - timedelta(days=60))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_unit(self.owner)
+        call_command('prune_change_log', stdout=StringIO())
+        self.assertEqual(ChangeEntry.objects.count(), 1)
+        self.assertEqual(self.client.get('/api/changes/', {'since': self.cursor}).status_code, 410)
+
+
+class RecordingBroker(events.LocalBroker):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def changed(self, label, owner_id):
+        self.calls.append((label, owner_id))
+        super().changed(label, owner_id)
+
+
+@override_settings(EVENTS_COALESCE_SECONDS=0, EVENTS_HEARTBEAT_SECONDS=0.05, EVENTS_MAX_STREAM_SECONDS=5)
+class EventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.broker = RecordingBroker()
+        patcher = mock.patch.object(events, '_broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_broker_routes_to_owner_and_unscoped_streams(self):
+        async def run():
+            mine = self.broker.subscribe(self.owner.pk)
+            unscoped = self.broker.subscribe(events.ALL_OWNERS)
+            theirs = self.broker.subscribe('someone-else')
+            self.broker.changed('payments.Payment', self.owner.pk)
+            self.broker.changed('auth.User', self.owner.pk)
+            await asyncio.sleep(0)
+            queued = [subscription.queue.qsize() for subscription in [mine, unscoped, theirs]]
+            for subscription in [mine, unscoped, theirs]:
+                self.broker.unsubscribe(subscription)
+            return queued, await mine.queue.get()
+
+        queued, names = asyncio.run(run())
+        self.assertEqual(queued, [1, 1, 0])
+        self.assertEqual(names, {'payments'})
+        self.assertEqual(dict(self.broker._subscribers), {})
+
+    def test_commits_notify_the_broker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_unit(self.owner)
+            self.assertEqual(self.broker.calls, [])
+        self.assertEqual(self.broker.calls, [('units.Unit', self.owner.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            events.notify('payments.Payment', [self.owner.pk, self.owner.pk])
+        self.assertEqual(self.broker.calls[-1], ('payments.Payment', self.owner.pk))
+
+    def test_stream_sends_snapshot_then_changed_values(self):
+        make_unit(self.owner)
+
+        async def run():
+            stream = events.stats_stream(self.owner)
+            received = [await stream.__anext__()]
+            await sync_to_async(make_unit)(self.owner, status='Occupied')
+            self.broker.changed('units.Unit', self.owner.pk)
+            received.append(await stream.__anext__())
+            await stream.aclose()
+            return received
+
+        snapshot, delta = async_to_sync(run)()
+        self.assertEqual(snapshot.split('\n')[0], 'event: stats')
+        self.assertEqual(json.loads(snapshot.split('data: ')[1])['units']['total_units'], 1)
+        self.assertEqual(json.loads(delta.split('data: ')[1]), {'units': {'total_units': 2, 'occupied_units': 1}})
+
+    def test_stream_sends_keep_alives(self):
+        async def run():
+            stream = events.stats_stream(self.owner)
+            await stream.__anext__()
+            keep_alive = await stream.__anext__()
+            await stream.aclose()
+            return keep_alive
+
+        self.assertEqual(async_to_sync(run)(), ': keep-alive\n\n')
+        self.assertEqual(dict(self.broker._subscribers), {})
+
+    def test_endpoint_streams_only_under_asgi(self):
+        self.assertEqual(self.client.get('/api/events/stats/').status_code, 501)
+
+        response = async_to_sync(views.stats_events)(AsyncRequestFactory().get('/api/events/stats/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        make_unit(make_owner())
+
+    def post(self, payload):
+        with firebase_login(self.owner) as headers:
+            return self.client.post('/api/batch/', payload, content_type='application/json', **headers(self.owner))
+
+    def test_sub_requests_run_in_order_as_the_caller(self):
+        unit = {'unit_id': 'U-BATCH', 'name': 'Batch', 'unit_type': 'studio', 'rent': '900.00', 'owner': self.owner.pk}
+        response = self.post({'requests': [
+            {'id': 'create', 'method': 'POST', 'path': '/api/units/', 'body': unit},
+            {'id': 'list', 'path': '/api/units/', 'query': {'page_size': 5}},
+            {'id': 'missing', 'path': '/api/nowhere/'},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['responses']
+        self.assertEqual([result['id'] for result in results], ['create', 'list', 'missing'])
+        self.assertEqual([result['status'] for result in results], [201, 200, 404])
+        self.assertEqual([row['unit_id'] for row in results[1]['body']['results']], ['U-BATCH'])
+
+    def test_streaming_endpoints_are_refused(self):
+        result = self.post({'requests': [{'path': '/api/units/export/'}]}).json()['responses'][0]
+        self.assertEqual(result['status'], 400)
+
+    def test_invalid_payloads(self):
+        too_many = [{'path': '/api/units/'}] * (batch.max_requests() + 1)
+        for payload in [{'requests': []}, {'requests': too_many}, {'requests': [{'method': 'GET'}]},
+                        {'requests': [{'path': '/api/units/', 'method': 'TRACE'}]},
+                        {'requests': [{'path': '/api/batch/', 'method': 'POST'}]},
+                        {'requests': [{'path': '/admin/'}]}]:
+            self.assertEqual(self.post(payload).status_code, 400, payload)
+
+    def test_concurrent_groups_split_at_writes(self):
+        items = [{'method': method} for method in ['GET', 'GET', 'POST', 'GET', 'HEAD']]
+        groups = [[item['method'] for item in group] for group in batch._groups(items, concurrent=True)]
+        self.assertEqual(groups, [['GET', 'GET'], ['POST'], ['GET', 'HEAD']])
+        self.assertEqual(len(list(batch._groups(items, concurrent=False))), 5)
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('batch/', views.batch, name='batch'),
+    path('changes/', views.changes, name='changes'),
+    path('events/stats/', views.stats_events, name='stats_events'),
+]
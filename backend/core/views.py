@@ -0,0 +1,96 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from users.authentication import FirebaseAuthentication
+from . import changes as change_log
+from . import batch as batching
+from . import events
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def changes(request):
+    """Created, updated and deleted records since the ``since`` cursor
+
+    Without ``since`` only the current cursor is returned: fetch it before
+    loading the full lists, then poll with it to receive deltas.
+    """
+    since = request.GET.get('since')
+    if since in (None, ''):
+        return Response({'cursor': change_log.latest_cursor(), 'has_more': False, 'changes': {}})
+    try:
+        since = int(since)
+        limit = int(request.GET.get('limit') or change_log.page_size())
+        if since < 0 or limit < 1:
+            raise ValueError
+    except ValueError:
+        return Response(
+            {'error': 'since and limit must be non-negative integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if change_log.is_expired(since):
+        return Response(
+            {'error': 'Cursor has expired; reload the full lists and start again without since'},
+            status=status.HTTP_410_GONE
+        )
+    try:
+        return Response(change_log.changes_since(since, request.user, min(limit, change_log.page_size())))
+    except Exception as e:
+        logger.error(f"Error reading changes: {e}")
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.AllowAny])
+def batch(request):
+    """Run a list of API sub-requests and return all their responses
+
+    Body: ``{"requests": [{"id", "method", "path", "query", "body"}, ...],
+    "concurrent": false}``. Results come back in request order.
+    """
+    try:
+        items = batching.parse_batch(request.data)
+    except batching.BatchError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    concurrent = isinstance(request.data, dict) and bool(request.data.get('concurrent'))
+    # request.user triggers authentication now, once for every sub-request
+    request._request.user = request.user
+    return Response({'responses': batching.run_batch(request._request, items, concurrent)})
+
+def _stream_user(request):
+    # EventSource cannot send an Authorization header, so the ID token may
+    # come as ?token= instead
+    token = request.GET.get('token')
+    if token:
+        result = FirebaseAuthentication().authenticate_token(token)
+        return result[0] if result else None
+    user = getattr(request, 'user', None)
+    return user if getattr(user, 'is_authenticated', False) else None
+
+
+async def stats_events(request):
+    """Server-sent stream of the dashboard stats, pushed as they change
+
+    Needs an ASGI server (``uvicorn rental_backend.asgi:application``, as
+    deployed). Under WSGI, e.g. ``runserver``, Django buffers an async
+    streaming response until it ends, so clients would see nothing until
+    ``EVENTS_MAX_STREAM_SECONDS`` ran out; the endpoint answers 501 there.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Event streams need the ASGI server'}, status=501)
+    user = await sync_to_async(_stream_user)(request)
+    if request.GET.get('token') and user is None:
+        return JsonResponse({'error': 'Invalid or expired token'}, status=401)
+    response = StreamingHttpResponse(events.stats_stream(user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment, PaymentReminder, Receipt
+from .models import Payment, PaymentReminder, Receipt, PaymentRollup, LateFeeRun, LedgerEntry, TenantBalance
 
 
 @admin.register(Payment)
@@ -59,3 +59,33 @@ class ReceiptAdmin(admin.ModelAdmin):
     list_filter = ['generated_at']
     search_fields = ['payment__payment_id', 'payment__tenant__first_name', 'payment__tenant__last_name']
     readonly_fields = ['generated_at']
+
+
+@admin.register(PaymentRollup)
+class PaymentRollupAdmin(admin.ModelAdmin):
+    list_display = ['owner', 'due_date', 'status', 'payment_type', 'payment_count', 'total_amount']
+    list_filter = ['status', 'payment_type', 'owner']
+    readonly_fields = ['owner', 'due_date', 'status', 'payment_type', 'payment_count', 'total_amount']
+
+
+@admin.register(LateFeeRun)
+class LateFeeRunAdmin(admin.ModelAdmin):
+    list_display = ['as_of', 'overdue_payments', 'fees_assessed', 'total_late_fees', 'cleared_payments', 'dry_run', 'duration_ms', 'started_at']
+    list_filter = ['dry_run', 'as_of']
+    readonly_fields = [field.name for field in LateFeeRun._meta.fields]
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'entry_date', 'entry_type', 'category', 'amount', 'payment', 'owner']
+    list_filter = ['entry_type', 'category', 'owner']
+    search_fields = ['tenant__tenant_id', 'tenant__first_name', 'tenant__last_name', 'payment__payment_id']
+    readonly_fields = [field.name for field in LedgerEntry._meta.fields]
+
+
+@admin.register(TenantBalance)
+class TenantBalanceAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'balance', 'total_charged', 'total_paid', 'owner', 'updated_at']
+    list_filter = ['owner']
+    search_fields = ['tenant__tenant_id', 'tenant__first_name', 'tenant__last_name']
+    readonly_fields = ['tenant', 'owner', 'balance', 'total_charged', 'total_paid', 'updated_at']
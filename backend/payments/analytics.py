@@ -0,0 +1,122 @@
+"""
+Time-bucketed payment analytics used by ``PaymentViewSet.monthly_stats``.
+
+All grouping happens in a single SQL aggregation using Django's ``Trunc*``
+functions, which translate to ``date_trunc`` on PostgreSQL and to Django's
+registered date functions on SQLite.
+"""
+from datetime import date
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth, TruncYear
+
+GRANULARITIES = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+DATE_FIELDS = ['payment_date', 'due_date']
+
+# Public dimension name -> values() lookups it expands to
+DIMENSIONS = {
+    'payment_type': ['payment_type'],
+    'payment_method': ['payment_method'],
+    'unit': ['unit', 'unit__unit_id', 'unit__name'],
+}
+
+CACHE_TIMEOUT = 300
+CACHE_VERSION_KEY = 'payments:analytics:version'
+
+
+def cache_version():
+    """Current analytics cache generation; bumped whenever a payment changes"""
+    return cache.get_or_set(CACHE_VERSION_KEY, 1, None)
+
+
+def invalidate_cache():
+    """Drop every cached analytics result by moving to a new generation"""
+    try:
+        cache.incr(CACHE_VERSION_KEY)
+    except ValueError:
+        cache.set(CACHE_VERSION_KEY, 1, None)
+
+
+def payment_time_series(queryset, start, end, granularity='month', date_field='payment_date', group_by=None):
+    """
+    Return collected, pending and overdue totals per period.
+
+    ``queryset`` is narrowed to ``start <= date_field <= end``, bucketed by the
+    truncated ``date_field`` and optionally by the ``group_by`` dimensions.
+    """
+    group_by = group_by or []
+    today = date.today()
+    trunc = GRANULARITIES[granularity]
+
+    lookups = []
+    for dimension in group_by:
+        lookups.extend(DIMENSIONS[dimension])
+
+    pending = Q(status='pending')
+    overdue = Q(status='pending', due_date__lt=today)
+    completed = Q(status='completed')
+
+    rows = (
+        queryset
+        .filter(**{f'{date_field}__gte': start, f'{date_field}__lte': end})
+        .annotate(period=trunc(date_field))
+        .values('period', *lookups)
+        .annotate(
+            collected=Sum('amount', filter=completed),
+            collected_count=Count('id', filter=completed),
+            pending=Sum('amount', filter=pending),
+            pending_count=Count('id', filter=pending),
+            overdue=Sum('amount', filter=overdue),
+            overdue_count=Count('id', filter=overdue),
+        )
+        .order_by('period', *lookups)
+    )
+
+    results = []
+    for row in rows:
+        period = row['period']
+        item = {'period': period.isoformat() if period else None}
+        for dimension in group_by:
+            if dimension == 'unit':
+                item['unit'] = row['unit']
+                item['unit_id'] = row['unit__unit_id']
+                item['unit_name'] = row['unit__name']
+            else:
+                item[dimension] = row[dimension]
+        item.update({
+            'collected': float(row['collected'] or 0),
+            'collected_count': row['collected_count'],
+            'pending': float(row['pending'] or 0),
+            'pending_count': row['pending_count'],
+            'overdue': float(row['overdue'] or 0),
+            'overdue_count': row['overdue_count'],
+        })
+        results.append(item)
+    return results
+
+
+def cached_payment_time_series(owner_key, queryset, start, end, granularity='month', date_field='payment_date', group_by=None):
+    """``payment_time_series`` cached per owner, range and grouping"""
+    group_by = group_by or []
+    key = ':'.join([
+        'payments:analytics',
+        str(cache_version()),
+        str(owner_key),
+        date.today().isoformat(),
+        start.isoformat(),
+        end.isoformat(),
+        granularity,
+        date_field,
+        ','.join(group_by),
+    ])
+    results = cache.get(key)
+    if results is None:
+        results = payment_time_series(queryset, start, end, granularity, date_field, group_by)
+        cache.set(key, results, CACHE_TIMEOUT)
+    return results
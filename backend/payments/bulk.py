@@ -0,0 +1,38 @@
+"""
+Upkeep after payments are written without ``save()``.
+
+``bulk_create``, ``bulk_update`` and queryset updates skip the post_save
+handlers in ``payments.signals`` and the search, change log, stats and
+event signals in ``core``. Code that writes payments in bulk (imports, the
+rent roll, statement reconciliation) calls ``after_bulk_write`` inside its
+transaction instead, so every path keeps the same derived data up to date.
+"""
+from django.db import transaction
+from core import changes, events, search, stats
+from .models import PaymentRollup
+from . import analytics, ledger, receipts
+
+
+def payments_changed(owner_ids):
+    """Drop cached payment figures and tell live dashboards once the transaction commits"""
+    transaction.on_commit(analytics.invalidate_cache)
+    transaction.on_commit(lambda: stats.invalidate('payments'))
+    events.notify('payments.Payment', owner_ids)
+
+
+def after_bulk_write(payments, action):
+    """Bring everything derived from ``payments`` up to date after a bulk write
+
+    ``action`` is ``changes.CREATED`` or ``changes.UPDATED``. The payments are
+    added to their rollup buckets; callers updating rows take them out of
+    their previous bucket before changing them. Completed payments get their
+    receipt queued.
+    """
+    if not payments:
+        return
+    PaymentRollup.apply_payments(payments)
+    search.index_objects(payments)
+    changes.record(payments, action)
+    ledger.sync_payments(payments)
+    receipts.enqueue(payment.pk for payment in payments if payment.status == 'completed')
+    payments_changed(payment.owner_id for payment in payments)
@@ -0,0 +1,178 @@
+"""
+Bulk payment import used by ``PaymentViewSet.bulk``.
+
+Rows are parsed one at a time from the request stream (CSV or NDJSON) and
+processed in chunks: each chunk resolves its tenants and units with one
+``in_bulk`` query apiece, reserves its payment and receipt numbers in one
+sequence update, and is written with a single ``bulk_create``.
+"""
+import csv
+import json
+from django.db import transaction
+from rest_framework import serializers
+from tenants.models import Tenant
+from units.models import Unit
+from core.sequences import next_identifiers
+from core import changes
+from .bulk import after_bulk_write
+from .models import Payment
+from .serializers import PaymentImportSerializer
+
+CHUNK_SIZE = 500
+
+CSV_CONTENT_TYPES = ['text/csv', 'application/csv']
+NDJSON_CONTENT_TYPES = ['application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/json-lines']
+
+
+class ImportFormatError(Exception):
+    """Raised when the upload cannot be parsed at all"""
+
+
+def _iter_lines(stream):
+    """Decode a byte stream line by line without reading it all into memory"""
+    first = True
+    for line in stream:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if first:
+            line = line.lstrip('\ufeff')
+            first = False
+        yield line
+
+
+def parse_rows(stream, content_type):
+    """Yield ``(row_number, data)`` pairs from a CSV or NDJSON byte stream.
+
+    ``data`` is a dict, or an error message string for lines that cannot be parsed.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    text = _iter_lines(stream)
+
+    if content_type in CSV_CONTENT_TYPES:
+        reader = csv.DictReader(text)
+        for row_number, row in enumerate(reader, start=1):
+            # Blank cells fall back to the model defaults
+            yield row_number, {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and value is not None and value.strip() != ''
+            }
+    elif content_type in NDJSON_CONTENT_TYPES:
+        row_number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                data = json.loads(line)
+            except ValueError as e:
+                yield row_number, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(data, dict):
+                yield row_number, 'Each line must be a JSON object.'
+                continue
+            yield row_number, data
+    else:
+        raise ImportFormatError(
+            f"Unsupported content type '{content_type}'. Send text/csv or application/x-ndjson."
+        )
+
+
+def _owner_id_for(user):
+    """Firebase uid of an authenticated owner, or None for anonymous requests"""
+    if user is not None and getattr(user, 'is_authenticated', False):
+        return user.pk
+    return None
+
+
+def _import_chunk(chunk, owner_id, report):
+    """Validate and write one chunk of ``(row_number, data)`` pairs"""
+    # One serializer instance for the whole chunk: building the field set is
+    # far more expensive than validating a row with it.
+    validator = PaymentImportSerializer()
+    validated = []
+    for row_number, data in chunk:
+        if isinstance(data, str):
+            report['errors'].append({'row': row_number, 'errors': {'non_field_errors': [data]}})
+            continue
+        try:
+            validated.append((row_number, validator.run_validation(data)))
+        except serializers.ValidationError as e:
+            report['errors'].append({'row': row_number, 'errors': e.detail})
+
+    tenant_ids = {values['tenant'] for _, values in validated if values.get('tenant')}
+    unit_ids = {values['unit'] for _, values in validated if values.get('unit')}
+    tenants = Tenant.objects.only('id', 'owner_id', 'current_unit_id').in_bulk(tenant_ids)
+    units = Unit.objects.only('id', 'owner_id').in_bulk(unit_ids)
+
+    payments = []
+    for row_number, values in validated:
+        errors = {}
+        tenant = tenants.get(values.get('tenant')) if values.get('tenant') else None
+        unit = units.get(values.get('unit')) if values.get('unit') else None
+
+        if values.get('tenant') and tenant is None:
+            errors['tenant'] = [f"Tenant {values['tenant']} does not exist."]
+        if values.get('unit') and unit is None:
+            errors['unit'] = [f"Unit {values['unit']} does not exist."]
+
+        row_owner_id = owner_id or (unit.owner_id if unit else None) or (tenant.owner_id if tenant else None)
+        if tenant and tenant.owner_id != row_owner_id:
+            errors['tenant'] = ["You can only create payments for your own tenants."]
+        if unit and unit.owner_id != row_owner_id:
+            errors['unit'] = ["You can only create payments for your own units."]
+        if tenant and unit and tenant.current_unit_id != unit.id:
+            errors.setdefault('non_field_errors', []).append(
+                "The selected tenant is not assigned to the selected unit."
+            )
+        if row_owner_id is None:
+            errors.setdefault('non_field_errors', []).append(
+                "A tenant or unit is required to determine the payment owner."
+            )
+
+        if errors:
+            report['errors'].append({'row': row_number, 'errors': errors})
+            continue
+
+        values = dict(values)
+        values.pop('tenant', None)
+        values.pop('unit', None)
+        payments.append(Payment(
+            tenant_id=tenant.id if tenant else None,
+            unit_id=unit.id if unit else None,
+            owner_id=row_owner_id,
+            **values
+        ))
+
+    if not payments:
+        return
+
+    with transaction.atomic():
+        payment_ids = next_identifiers('PAY', Payment, 'payment_id', len(payments))
+        receipt_numbers = next_identifiers('RCP', Payment, 'receipt_number', len(payments))
+        for payment, payment_id, receipt_number in zip(payments, payment_ids, receipt_numbers):
+            payment.payment_id = payment_id
+            payment.receipt_number = receipt_number
+        Payment.objects.bulk_create(payments)
+        after_bulk_write(payments, changes.CREATED)
+    report['created'] += len(payments)
+
+
+def import_payments(stream, content_type, user=None, chunk_size=CHUNK_SIZE):
+    """Import payments from ``stream`` and return a per-row report"""
+    owner_id = _owner_id_for(user)
+    report = {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+
+    chunk = []
+    for row_number, data in parse_rows(stream, content_type):
+        report['rows'] = row_number
+        chunk.append((row_number, data))
+        if len(chunk) >= chunk_size:
+            _import_chunk(chunk, owner_id, report)
+            chunk = []
+    if chunk:
+        _import_chunk(chunk, owner_id, report)
+
+    report['errors'].sort(key=lambda error: error['row'])
+    report['failed'] = len(report['errors'])
+    return report
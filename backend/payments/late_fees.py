@@ -0,0 +1,111 @@
+"""
+Overdue detection and late fees for pending payments.
+
+``assess_late_fees`` is run nightly (``manage.py assess_late_fees``) and
+writes ``days_late`` and ``late_fee_amount`` for every pending payment with a
+handful of set-based ``UPDATE`` statements driven by the partial index on
+pending ``due_date``:
+
+* ``days_late`` is set per distinct due date with one ``CASE`` expression
+* rows past the grace period are charged ``LATE_FEE_PERCENT`` of ``amount``
+* rows within the grace period, or no longer past due, are cleared
+
+The tenant ledger charges of the affected rows are then re-synced, the
+rows are added to the change log, and the cached payment stats of their
+owners are dropped and streamed to live dashboards once the run commits.
+
+Payments that are no longer pending keep the values from their last run.
+``days_late`` is only as fresh as the last run, so ``Payment.is_overdue``
+and the Overdue filter compare ``due_date`` with today instead.
+Each run is recorded as a ``LateFeeRun``.
+"""
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Round
+from core import changes
+from .bulk import payments_changed
+from .models import LateFeeRun, Payment
+from . import ledger
+
+# Distinct due dates folded into a single CASE expression per UPDATE
+DUE_DATES_PER_UPDATE = 500
+
+
+def late_fee_settings():
+    grace_days = int(getattr(settings, 'LATE_FEE_GRACE_DAYS', 5))
+    fee_percent = Decimal(str(getattr(settings, 'LATE_FEE_PERCENT', 5)))
+    return grace_days, fee_percent
+
+
+def _update_days_late(pending, as_of):
+    """Set ``days_late`` on every overdue pending row; returns the number of rows updated"""
+    overdue = pending.filter(due_date__lt=as_of)
+    due_dates = sorted(overdue.values_list('due_date', flat=True).distinct())
+    updated = 0
+    for start in range(0, len(due_dates), DUE_DATES_PER_UPDATE):
+        batch = due_dates[start:start + DUE_DATES_PER_UPDATE]
+        days_late = Case(
+            *[When(due_date=due_date, then=Value((as_of - due_date).days)) for due_date in batch],
+            output_field=IntegerField(),
+        )
+        updated += overdue.filter(due_date__in=batch).update(days_late=days_late)
+    return updated
+
+
+def assess_late_fees(as_of=None, grace_days=None, fee_percent=None, dry_run=False):
+    """Recompute overdue days and late fees as of ``as_of`` and return the ``LateFeeRun``"""
+    as_of = as_of or date.today()
+    default_grace, default_percent = late_fee_settings()
+    grace_days = default_grace if grace_days is None else grace_days
+    fee_percent = default_percent if fee_percent is None else Decimal(str(fee_percent))
+    fee_cutoff = as_of - timedelta(days=grace_days)
+    started = time.monotonic()
+
+    run = LateFeeRun(as_of=as_of, grace_days=grace_days, fee_percent=fee_percent, dry_run=dry_run)
+    with transaction.atomic():
+        pending = Payment.objects.filter(status='pending')
+
+        run.overdue_payments = _update_days_late(pending, as_of)
+
+        run.fees_assessed = pending.filter(due_date__lt=fee_cutoff).update(
+            late_fee_amount=Round(
+                F('amount') * Value(fee_percent / 100, output_field=DecimalField()),
+                2,
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            )
+        )
+
+        # Inside the grace period no fee is charged yet
+        pending.filter(
+            due_date__gte=fee_cutoff, due_date__lt=as_of, late_fee_amount__gt=0,
+        ).update(late_fee_amount=0)
+
+        # Rows whose due date moved forward, or that are not yet due
+        cleared = pending.filter(due_date__gte=as_of).filter(Q(days_late__gt=0) | Q(late_fee_amount__gt=0))
+        cleared_rows = list(cleared.values_list('pk', 'late_fee_amount'))
+        cleared_ids = [pk for pk, late_fee_amount in cleared_rows if late_fee_amount > 0]
+        run.cleared_payments = cleared.update(days_late=0, late_fee_amount=0)
+
+        # Late fees are part of the ledger charge. Every overdue or cleared
+        # row is checked; only ledger entries whose amount changed are written.
+        ledger.sync_queryset(
+            pending.filter(tenant__isnull=False).filter(Q(due_date__lt=as_of) | Q(pk__in=cleared_ids))
+        )
+        changed = pending.filter(Q(due_date__lt=as_of) | Q(pk__in=[pk for pk, _ in cleared_rows]))
+        changes.record_queryset(changed)
+        # Queryset updates skip the signals that drop cached stats and notify live dashboards
+        payments_changed(changed.order_by().values_list('owner_id', flat=True).distinct())
+
+        total = pending.filter(due_date__lt=fee_cutoff).aggregate(total=Sum('late_fee_amount'))['total']
+        run.total_late_fees = Decimal(total or 0).quantize(Decimal('0.01'))
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    run.duration_ms = int((time.monotonic() - started) * 1000)
+    run.save()
+    return run
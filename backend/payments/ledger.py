@@ -0,0 +1,216 @@
+"""
+Tenant ledger: signed entries per tenant and a denormalised balance row.
+
+Every payment with a tenant contributes up to two ``LedgerEntry`` rows:
+
+* a ``charge`` of ``amount + late_fee_amount`` dated ``due_date`` unless the
+  payment is cancelled
+* a ``payment`` of minus that total dated ``payment_date`` once it is completed
+
+``sync_payments`` diffs the stored entries against that and writes only the
+changes; the per-tenant deltas are applied to ``TenantBalance`` with
+``F()`` updates in the same transaction, so reading what a tenant owes is a
+primary-key lookup. Running balances for a statement are computed in SQL with
+a window function.
+
+Save and delete signals keep single payments in sync; code that writes
+payments in bulk (imports, rent roll, reconciliation, late fees) calls
+``sync_payments``/``sync_queryset`` itself.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum, Window
+from .models import LedgerEntry, Payment, TenantBalance
+
+ZERO = Decimal('0.00')
+
+SYNC_CHUNK_SIZE = 1000
+
+
+def expected_entries(payment):
+    """``{entry_type: (amount, entry_date)}`` the ledger should hold for ``payment``"""
+    if not payment.tenant_id or payment.status == 'cancelled':
+        return {}
+    total = Decimal(payment.amount) + Decimal(payment.late_fee_amount or 0)
+    entries = {'charge': (total, payment.due_date)}
+    if payment.status == 'completed':
+        entries['payment'] = (-total, payment.payment_date)
+    return entries
+
+
+def _entry_description(payment):
+    return f"{payment.get_payment_type_display()} {payment.payment_id}".strip()
+
+
+def apply_balance_delta(tenant_id, owner_id, charged, paid):
+    """Add ``charged`` and ``paid`` (a negative amount) to the tenant's balance row"""
+    if not charged and not paid:
+        return
+    changes = {
+        'balance': F('balance') + charged + paid,
+        'total_charged': F('total_charged') + charged,
+        'total_paid': F('total_paid') - paid,
+    }
+    with transaction.atomic():
+        if TenantBalance.objects.filter(tenant_id=tenant_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                TenantBalance.objects.create(
+                    tenant_id=tenant_id,
+                    owner_id=owner_id,
+                    balance=charged + paid,
+                    total_charged=charged,
+                    total_paid=-paid,
+                )
+        except IntegrityError:
+            # Another writer created the row first
+            TenantBalance.objects.filter(tenant_id=tenant_id).update(**changes)
+
+
+def _apply_deltas(deltas):
+    for (tenant_id, owner_id), (charged, paid) in deltas.items():
+        apply_balance_delta(tenant_id, owner_id, charged, paid)
+
+
+def sync_payments(payments):
+    """Bring the ledger entries and balances of ``payments`` up to date"""
+    payments = [payment for payment in payments if payment.pk is not None]
+    if not payments:
+        return
+    stored = defaultdict(dict)
+    for entry in LedgerEntry.objects.filter(payment_id__in=[payment.pk for payment in payments]):
+        stored[entry.payment_id][entry.entry_type] = entry
+
+    deltas = defaultdict(lambda: [ZERO, ZERO])
+    to_create = []
+    to_update = []
+    to_delete = []
+    for payment in payments:
+        current = stored.get(payment.pk, {})
+        for entry_type, (amount, entry_date) in expected_entries(payment).items():
+            entry = current.pop(entry_type, None)
+            column = 0 if entry_type == 'charge' else 1
+            if entry is None:
+                to_create.append(LedgerEntry(
+                    tenant_id=payment.tenant_id,
+                    owner_id=payment.owner_id,
+                    payment_id=payment.pk,
+                    entry_type=entry_type,
+                    category=payment.payment_type,
+                    amount=amount,
+                    entry_date=entry_date,
+                    description=_entry_description(payment),
+                ))
+                deltas[(payment.tenant_id, payment.owner_id)][column] += amount
+                continue
+            if (entry.amount, entry.entry_date, entry.tenant_id, entry.category) == (
+                amount, entry_date, payment.tenant_id, payment.payment_type
+            ):
+                continue
+            deltas[(entry.tenant_id, entry.owner_id)][column] -= entry.amount
+            deltas[(payment.tenant_id, payment.owner_id)][column] += amount
+            entry.amount = amount
+            entry.entry_date = entry_date
+            entry.tenant_id = payment.tenant_id
+            entry.owner_id = payment.owner_id
+            entry.category = payment.payment_type
+            to_update.append(entry)
+        for entry in current.values():
+            column = 0 if entry.entry_type == 'charge' else 1
+            deltas[(entry.tenant_id, entry.owner_id)][column] -= entry.amount
+            to_delete.append(entry.pk)
+
+    if not (to_create or to_update or to_delete):
+        return
+    with transaction.atomic():
+        if to_create:
+            LedgerEntry.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            LedgerEntry.objects.bulk_update(
+                to_update, ['amount', 'entry_date', 'tenant', 'owner', 'category'], batch_size=500
+            )
+        if to_delete:
+            LedgerEntry.objects.filter(pk__in=to_delete).delete()
+        _apply_deltas(deltas)
+
+
+def sync_queryset(queryset, chunk_size=SYNC_CHUNK_SIZE):
+    """``sync_payments`` over a payment queryset in chunks; returns the number of payments checked"""
+    fields = [
+        'id', 'payment_id', 'tenant_id', 'owner_id', 'payment_type', 'status',
+        'amount', 'late_fee_amount', 'due_date', 'payment_date',
+    ]
+    count = 0
+    batch = []
+    for payment in queryset.only(*fields).iterator(chunk_size=chunk_size):
+        batch.append(payment)
+        if len(batch) >= chunk_size:
+            sync_payments(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        sync_payments(batch)
+        count += len(batch)
+    return count
+
+
+def remove_payment(payment):
+    """Reverse the entries of a payment that is about to be deleted"""
+    deltas = defaultdict(lambda: [ZERO, ZERO])
+    for entry in LedgerEntry.objects.filter(payment_id=payment.pk):
+        column = 0 if entry.entry_type == 'charge' else 1
+        deltas[(entry.tenant_id, entry.owner_id)][column] -= entry.amount
+    _apply_deltas(deltas)
+
+
+def running_balance(queryset):
+    """Annotate ledger entries with ``running_balance`` in statement order"""
+    return queryset.annotate(
+        running_balance=Window(
+            expression=Sum('amount'),
+            partition_by=[F('tenant_id')],
+            order_by=[F('entry_date').asc(), F('id').asc()],
+        )
+    ).order_by('tenant_id', 'entry_date', 'id')
+
+
+def rebuild_balances(owner=None):
+    """Recompute every balance row from the ledger entries; returns the number written"""
+    entries = LedgerEntry.objects.all()
+    if owner is not None:
+        entries = entries.filter(owner=owner)
+    totals = entries.values('tenant_id', 'owner_id').annotate(
+        balance=Sum('amount'),
+        charged=Sum('amount', filter=~Q(entry_type='payment')),
+        paid=Sum('amount', filter=Q(entry_type='payment')),
+    ).order_by()
+    rows = [
+        TenantBalance(
+            tenant_id=row['tenant_id'],
+            owner_id=row['owner_id'],
+            balance=row['balance'] or ZERO,
+            total_charged=row['charged'] or ZERO,
+            total_paid=-(row['paid'] or ZERO),
+        )
+        for row in totals
+    ]
+    with transaction.atomic():
+        existing = TenantBalance.objects.all()
+        if owner is not None:
+            existing = existing.filter(owner=owner)
+        existing.delete()
+        TenantBalance.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def rebuild(owner=None):
+    """Re-sync every payment's entries, then recompute the balance rows"""
+    payments = Payment.objects.all()
+    if owner is not None:
+        payments = payments.filter(owner=owner)
+    with transaction.atomic():
+        sync_queryset(payments)
+        # Entries whose payment lost its tenant or was cancelled are removed by the sync
+        return rebuild_balances(owner)
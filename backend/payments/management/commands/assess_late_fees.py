@@ -0,0 +1,48 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from payments.late_fees import assess_late_fees
+
+
+class Command(BaseCommand):
+    help = 'Compute days late and late fees for all pending payments (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Assess as of this date (YYYY-MM-DD) instead of today',
+        )
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            help='Days after the due date before a fee is charged (defaults to LATE_FEE_GRACE_DAYS)',
+        )
+        parser.add_argument(
+            '--percent',
+            help='Late fee as a percentage of the payment amount (defaults to LATE_FEE_PERCENT)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would change without writing to the payments table',
+        )
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options.get('date'):
+            try:
+                as_of = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        run = assess_late_fees(
+            as_of=as_of,
+            grace_days=options.get('grace_days'),
+            fee_percent=options.get('percent'),
+            dry_run=options['dry_run'],
+        )
+        prefix = '[dry run] ' if run.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}As of {run.as_of}: {run.overdue_payments} overdue payment(s), '
+            f'{run.fees_assessed} charged late fees totalling {run.total_late_fees}, '
+            f'{run.cleared_payments} cleared ({run.duration_ms} ms)'
+        ))
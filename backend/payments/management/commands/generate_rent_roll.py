@@ -0,0 +1,57 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from payments.rent_roll import generate_rent_roll
+
+
+class Command(BaseCommand):
+    help = 'Create pending rent payments for every active tenant for one month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Billing month as YYYY-MM (defaults to the current month)',
+        )
+        parser.add_argument(
+            '--owner',
+            help='Only bill tenants of this owner (firebase uid)',
+        )
+        parser.add_argument(
+            '--due-day',
+            type=int,
+            default=1,
+            help='Day of the month the rent is due (default 1)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be created without writing anything',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('month'):
+            try:
+                year, month = [int(part) for part in options['month'].split('-')]
+                date(year, month, 1)
+            except ValueError:
+                raise CommandError('--month must be in YYYY-MM format')
+        else:
+            today = date.today()
+            year, month = today.year, today.month
+
+        summary = generate_rent_roll(
+            year,
+            month,
+            options.get('owner'),
+            due_day=options['due_day'],
+            dry_run=options['dry_run'],
+        )
+        if summary['dry_run']:
+            self.stdout.write(
+                f"[dry run] {summary['period_start']}: would create {summary['would_create']} rent payment(s) "
+                f"totalling {summary['total_amount']}, {summary['skipped']} tenant(s) already billed"
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['period_start']}: created {summary['created']} rent payment(s) "
+            f"totalling {summary['total_amount']}, {summary['skipped']} tenant(s) already billed"
+        ))
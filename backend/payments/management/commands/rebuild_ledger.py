@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from payments import ledger
+
+
+class Command(BaseCommand):
+    help = 'Re-sync ledger entries from the payments table and recompute tenant balances'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--owner',
+            help='Limit the rebuild to a single owner (firebase uid)',
+        )
+
+    def handle(self, *args, **options):
+        count = ledger.rebuild(owner=options.get('owner'))
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} tenant balance(s)'))
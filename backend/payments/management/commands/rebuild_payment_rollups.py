@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from payments.models import PaymentRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the payment rollup buckets from the payments table, or check them for drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report buckets that disagree with the payments table',
+        )
+        parser.add_argument(
+            '--owner',
+            help='Limit the rebuild or check to a single owner (firebase uid)',
+        )
+
+    def handle(self, *args, **options):
+        owner = options.get('owner')
+
+        if options['check']:
+            drift = PaymentRollup.find_drift(owner=owner)
+            if not drift:
+                self.stdout.write(self.style.SUCCESS('Payment rollups are in sync'))
+                return
+            for key, stored, expected in sorted(drift, key=lambda item: [str(part) for part in item[0]]):
+                owner_id, due_date, status, payment_type = key
+                self.stdout.write(
+                    f'{owner_id} {due_date} {status}/{payment_type}: '
+                    f'stored {stored[0]} / {stored[1]}, expected {expected[0]} / {expected[1]}'
+                )
+            raise CommandError(f'{len(drift)} payment rollup bucket(s) have drifted')
+
+        count = PaymentRollup.rebuild(owner=owner)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} payment rollup bucket(s)'))
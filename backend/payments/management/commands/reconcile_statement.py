@@ -0,0 +1,76 @@
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from payments.models import Payment
+from payments.reconciliation import (
+    DEFAULT_WINDOW_DAYS, StatementFormatError, reconcile_statement,
+)
+
+REPORT_FIELDS = ['line', 'date', 'amount', 'reference', 'description', 'reason']
+
+
+class Command(BaseCommand):
+    help = 'Match a bank or mobile-money statement (CSV or OFX) against pending payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='Path to the statement file (.csv, .ofx or .qfx)')
+        parser.add_argument(
+            '--owner',
+            help='Only match payments of this owner (firebase uid)',
+        )
+        parser.add_argument(
+            '--window',
+            type=int,
+            default=DEFAULT_WINDOW_DAYS,
+            help='Days either side of the due date for amount-only matches',
+        )
+        parser.add_argument(
+            '--report',
+            help='Write unmatched lines to this CSV file instead of the console',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report matches without updating any payments',
+        )
+
+    def handle(self, *args, **options):
+        queryset = Payment.objects.all()
+        if options.get('owner'):
+            queryset = queryset.filter(owner_id=options['owner'])
+
+        report_file = open(options['report'], 'w', newline='') if options.get('report') else None
+        try:
+            if report_file:
+                writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+                writer.writeheader()
+                on_unmatched = writer.writerow
+            else:
+                def on_unmatched(item):
+                    self.stdout.write(
+                        f"line {item['line']}: {item['date']} {item['amount']} "
+                        f"{item['reference'] or '-'} ({item['reason']})"
+                    )
+
+            try:
+                with open(options['statement'], 'rb') as stream:
+                    report = reconcile_statement(
+                        stream,
+                        queryset=queryset,
+                        filename=options['statement'],
+                        window_days=options['window'],
+                        dry_run=options['dry_run'],
+                        on_unmatched=on_unmatched,
+                    )
+            except (OSError, StatementFormatError) as e:
+                raise CommandError(str(e))
+        finally:
+            if report_file:
+                report_file.close()
+
+        for error in report['errors']:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        prefix = '[dry run] ' if report['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{report['lines']} line(s): {report['matched']} matched, "
+            f"{report['unmatched']} unmatched, {report['ignored']} ignored, {len(report['errors'])} unreadable"
+        ))
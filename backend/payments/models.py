@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, Sum
 from users.models import CustomUser
 from tenants.models import Tenant
 from units.models import Unit
+from core.managers import OwnedManager
+from core.sequences import next_identifier
 from decimal import Decimal
+from datetime import date
 
 
 class Payment(models.Model):
@@ -58,6 +62,14 @@ class Payment(models.Model):
     reference_number = models.CharField(max_length=100, blank=True)
     receipt_number = models.CharField(max_length=100, blank=True)
     
+    # Late Fee Information (maintained by payments.late_fees)
+    late_fee_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    days_late = models.IntegerField(default=0)
+    
+    # Period Information (billing period covered by rent charges)
+    period_start = models.DateField(null=True, blank=True)
+    period_end = models.DateField(null=True, blank=True)
+    
     # Owner/Manager
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='payments')
     
@@ -65,38 +77,52 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OwnedManager()
+    
     class Meta:
         db_table = 'payments'
         ordering = ['-payment_date', '-created_at']
+        indexes = [
+            # Keyset pagination over Meta.ordering (see core.pagination)
+            models.Index(fields=['-payment_date', '-created_at', '-id'], name='payments_keyset_idx'),
+            models.Index(fields=['owner', '-payment_date', '-created_at', '-id'], name='payments_owner_keyset_idx'),
+            models.Index(fields=['owner', 'status', 'due_date'], name='payments_owner_status_idx'),
+            models.Index(fields=['owner', 'due_date'], name='payments_owner_due_idx'),
+            # Overdue detection only ever looks at pending rows
+            models.Index(fields=['due_date'], condition=models.Q(status='pending'), name='payments_pending_due_idx'),
+        ]
+        constraints = [
+            # One rent charge per tenant and billing period (see payments.rent_roll)
+            models.UniqueConstraint(
+                fields=['tenant', 'period_start'],
+                condition=models.Q(payment_type='rent', period_start__isnull=False),
+                name='unique_rent_per_tenant_period',
+            ),
+        ]
         
     def __str__(self):
         return f"{self.payment_id} - ${self.amount}"
     
     def save(self, *args, **kwargs):
         if not self.payment_id:
-            # Generate payment ID: PAY-YYYY-XXX
-            from datetime import datetime
-            year = datetime.now().year
-            count = Payment.objects.filter(
-                payment_id__startswith=f'PAY-{year}-'
-            ).count() + 1
-            self.payment_id = f'PAY-{year}-{count:04d}'
+            # Generate payment ID: PAY-YYYY-XXXX
+            self.payment_id = next_identifier('PAY', Payment, 'payment_id')
         
         if not self.receipt_number:
-            # Generate receipt number: RCP-YYYY-XXX
-            from datetime import datetime
-            year = datetime.now().year
-            count = Payment.objects.filter(
-                receipt_number__startswith=f'RCP-{year}-'
-            ).count() + 1
-            self.receipt_number = f'RCP-{year}-{count:04d}'
+            # Generate receipt number: RCP-YYYY-XXXX
+            self.receipt_number = next_identifier('RCP', Payment, 'receipt_number')
             
         super().save(*args, **kwargs)
     
     @property
     def total_amount(self):
         """Total amount including late fees"""
-        return self.amount
+        return self.amount + (self.late_fee_amount or 0)
+    
+    @property
+    def is_overdue(self):
+        """Pending and past its due date (``days_late`` only drives the late fee)"""
+        return self.status == 'pending' and self.due_date is not None and self.due_date < date.today()
 
 
 class PaymentReminder(models.Model):
@@ -116,9 +142,14 @@ class PaymentReminder(models.Model):
     # Owner/Manager
     owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='payment_reminders')
     
+    objects = OwnedManager()
+    
     class Meta:
         db_table = 'payment_reminders'
         ordering = ['-sent_date']
+        indexes = [
+            models.Index(fields=['owner', '-sent_date'], name='reminders_owner_sent_idx'),
+        ]
         
     def __str__(self):
         return f"{self.tenant.full_name} - {self.get_reminder_type_display()}"
@@ -128,6 +159,9 @@ class Receipt(models.Model):
     """Model to store receipt information"""
     payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='receipt')
     receipt_data = models.JSONField()  # Store receipt details as JSON
+    # Rendered artifact, stored content-addressed by payments.receipts
+    artifact_sha256 = models.CharField(max_length=64, blank=True)
+    artifact_size = models.PositiveIntegerField(default=0)
     generated_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -135,3 +169,217 @@ class Receipt(models.Model):
         
     def __str__(self):
         return f"Receipt for {self.payment.payment_id}"
+
+
+class LateFeeRun(models.Model):
+    """Statistics recorded for each run of the late fee engine"""
+    as_of = models.DateField()
+    grace_days = models.IntegerField()
+    fee_percent = models.DecimalField(max_digits=5, decimal_places=2)
+    overdue_payments = models.IntegerField(default=0)
+    fees_assessed = models.IntegerField(default=0)
+    total_late_fees = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cleared_payments = models.IntegerField(default=0)
+    dry_run = models.BooleanField(default=False)
+    started_at = models.DateTimeField(auto_now_add=True)
+    duration_ms = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'late_fee_runs'
+        ordering = ['-started_at']
+        
+    def __str__(self):
+        return f"Late fee run {self.as_of}: {self.overdue_payments} overdue"
+
+
+class PaymentRollup(models.Model):
+    """Pre-aggregated payment counts and amounts per owner, due date, status and type.
+
+    Maintained incrementally by the signals in ``payments.signals`` so the
+    dashboard stats read a handful of bucket rows instead of scanning payments.
+    """
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='payment_rollups')
+    due_date = models.DateField()
+    status = models.CharField(max_length=20, choices=Payment.STATUS_CHOICES)
+    payment_type = models.CharField(max_length=20, choices=Payment.TYPE_CHOICES)
+    payment_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = OwnedManager()
+
+    class Meta:
+        db_table = 'payment_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'due_date', 'status', 'payment_type'],
+                name='unique_payment_rollup_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} {self.due_date} {self.status}/{self.payment_type}: {self.payment_count}"
+
+    @classmethod
+    def bucket_key(cls, payment):
+        """Return the bucket a payment contributes to"""
+        return (payment.owner_id, payment.due_date, payment.status, payment.payment_type)
+
+    @classmethod
+    def apply_delta(cls, key, count, amount):
+        """Add ``count`` payments and ``amount`` to the bucket identified by ``key``"""
+        if not count and not amount:
+            return
+        owner_id, due_date, status, payment_type = key
+        lookup = {
+            'owner_id': owner_id,
+            'due_date': due_date,
+            'status': status,
+            'payment_type': payment_type,
+        }
+        with transaction.atomic():
+            updated = cls.objects.filter(**lookup).update(
+                payment_count=F('payment_count') + count,
+                total_amount=F('total_amount') + amount,
+            )
+            if updated:
+                return
+            try:
+                with transaction.atomic():
+                    cls.objects.create(payment_count=count, total_amount=amount, **lookup)
+            except IntegrityError:
+                # Another writer created the bucket first
+                cls.objects.filter(**lookup).update(
+                    payment_count=F('payment_count') + count,
+                    total_amount=F('total_amount') + amount,
+                )
+
+    @classmethod
+    def apply_payments(cls, payments, sign=1):
+        """Add (or with ``sign=-1`` remove) payments written without signals, e.g. by ``bulk_create``"""
+        deltas = {}
+        for payment in payments:
+            key = cls.bucket_key(payment)
+            count, amount = deltas.get(key, (0, Decimal('0')))
+            deltas[key] = (count + sign, amount + sign * Decimal(payment.amount))
+        for key, (count, amount) in deltas.items():
+            cls.apply_delta(key, count, amount)
+
+    @classmethod
+    def expected_buckets(cls, owner=None):
+        """Aggregate the payments table into bucket rows"""
+        payments = Payment.objects.all()
+        if owner is not None:
+            payments = payments.filter(owner=owner)
+        return payments.values('owner_id', 'due_date', 'status', 'payment_type').annotate(
+            payment_count=Count('id'),
+            total_amount=Sum('amount'),
+        ).order_by()
+
+    @classmethod
+    def rebuild(cls, owner=None):
+        """Recompute every bucket from the payments table. Returns the number of buckets written."""
+        rows = [cls(**row) for row in cls.expected_buckets(owner)]
+        with transaction.atomic():
+            existing = cls.objects.all()
+            if owner is not None:
+                existing = existing.filter(owner=owner)
+            existing.delete()
+            cls.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+    @classmethod
+    def find_drift(cls, owner=None):
+        """Compare stored buckets with the payments table.
+
+        Returns a list of ``(key, stored, expected)`` tuples where ``stored`` and
+        ``expected`` are ``(payment_count, total_amount)`` pairs.
+        """
+        expected = {
+            (row['owner_id'], row['due_date'], row['status'], row['payment_type']):
+                (row['payment_count'], row['total_amount'])
+            for row in cls.expected_buckets(owner)
+        }
+        stored_rows = cls.objects.all()
+        if owner is not None:
+            stored_rows = stored_rows.filter(owner=owner)
+        stored = {
+            (row['owner_id'], row['due_date'], row['status'], row['payment_type']):
+                (row['payment_count'], row['total_amount'])
+            for row in stored_rows.values(
+                'owner_id', 'due_date', 'status', 'payment_type', 'payment_count', 'total_amount'
+            )
+        }
+        empty = (0, Decimal('0'))
+        drift = []
+        for key in expected.keys() | stored.keys():
+            stored_value = stored.get(key, empty)
+            expected_value = expected.get(key, empty)
+            if stored_value[0] != expected_value[0] or Decimal(stored_value[1]) != Decimal(expected_value[1]):
+                drift.append((key, stored_value, expected_value))
+        return drift
+
+
+class LedgerEntry(models.Model):
+    """Signed charge or payment on a tenant's account (see payments.ledger)
+
+    Charges are positive and payments negative, so the sum of a tenant's
+    entries is what they owe.
+    """
+    ENTRY_TYPES = [
+        ('charge', 'Charge'),
+        ('payment', 'Payment'),
+        ('adjustment', 'Adjustment'),
+    ]
+
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='ledger_entries')
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, null=True, blank=True, related_name='ledger_entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    category = models.CharField(max_length=20, choices=Payment.PAYMENT_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    entry_date = models.DateField()
+    description = models.CharField(max_length=255, blank=True)
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='ledger_entries')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OwnedManager()
+
+    class Meta:
+        db_table = 'ledger_entries'
+        ordering = ['entry_date', 'id']
+        indexes = [
+            # Running balance: one partition per tenant in statement order
+            models.Index(fields=['tenant', 'entry_date', 'id'], name='ledger_tenant_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['payment', 'entry_type'],
+                condition=models.Q(payment__isnull=False),
+                name='unique_ledger_entry_per_payment',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id} {self.entry_date} {self.entry_type}: {self.amount}"
+
+
+class TenantBalance(models.Model):
+    """Denormalised current balance per tenant, maintained with every ledger write"""
+    tenant = models.OneToOneField(Tenant, on_delete=models.CASCADE, primary_key=True, related_name='balance')
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='tenant_balances')
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_charged = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = OwnedManager()
+
+    class Meta:
+        db_table = 'tenant_balances'
+        indexes = [
+            # Arrears ranking, overall and per owner, in keyset page order
+            models.Index(fields=['-balance', 'tenant'], name='tenant_balance_rank_idx'),
+            models.Index(fields=['owner', '-balance', 'tenant'], name='tenant_balance_owner_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tenant_id}: {self.balance}"
@@ -0,0 +1,234 @@
+"""
+Receipt generation for completed payments.
+
+Receipts are produced off the request path: when a payment becomes
+``completed`` its ID is handed to a small thread pool (``RECEIPT_WORKERS``)
+once the transaction commits. The worker builds ``Receipt.receipt_data``,
+renders an HTML artifact and stores it content-addressed under
+``RECEIPTS_ROOT`` (``<root>/<sha[:2]>/<sha>.html``). Rendering is
+deterministic, so identical receipts share a file and the hash doubles as
+the HTTP ETag.
+
+``render_month`` re-renders a whole month in the calling process, in
+batches of ``RENDER_BATCH_SIZE`` payments with one bulk write per batch:
+rendering a receipt is a few kB of string formatting, far cheaper than
+starting worker processes for it.
+"""
+import hashlib
+import html
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, transaction
+from .models import Payment, Receipt
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_CONTENT_TYPE = 'text/html; charset=utf-8'
+
+RENDER_BATCH_SIZE = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def receipts_root():
+    return Path(getattr(settings, 'RECEIPTS_ROOT', Path(settings.BASE_DIR) / 'receipts'))
+
+
+def artifact_path(sha256):
+    return receipts_root() / sha256[:2] / f'{sha256}.html'
+
+
+def build_receipt_data(payment):
+    """JSON-serialisable receipt contents for ``payment``"""
+    return {
+        'receipt_number': payment.receipt_number,
+        'payment_id': payment.payment_id,
+        'tenant_id': payment.tenant.tenant_id if payment.tenant else '',
+        'tenant_name': payment.tenant.full_name if payment.tenant else '',
+        'unit_id': payment.unit.unit_id if payment.unit else '',
+        'unit_name': payment.unit.name if payment.unit else '',
+        'payment_type': payment.get_payment_type_display(),
+        'payment_method': payment.get_payment_method_display(),
+        'amount': str(payment.amount),
+        'payment_date': payment.payment_date.isoformat() if payment.payment_date else '',
+        'due_date': payment.due_date.isoformat() if payment.due_date else '',
+        'reference_number': payment.reference_number,
+        'description': payment.description,
+    }
+
+
+RECEIPT_ROWS = [
+    ('Receipt Number', 'receipt_number'),
+    ('Payment ID', 'payment_id'),
+    ('Tenant', 'tenant_name'),
+    ('Tenant ID', 'tenant_id'),
+    ('Unit', 'unit_name'),
+    ('Unit ID', 'unit_id'),
+    ('Payment Type', 'payment_type'),
+    ('Payment Method', 'payment_method'),
+    ('Amount', 'amount'),
+    ('Payment Date', 'payment_date'),
+    ('Due Date', 'due_date'),
+    ('Reference', 'reference_number'),
+    ('Description', 'description'),
+]
+
+
+def render_receipt(data):
+    """Render receipt data to HTML bytes"""
+    rows = '\n'.join(
+        f'<tr><th>{html.escape(label)}</th><td>{html.escape(str(data.get(key) or ""))}</td></tr>'
+        for label, key in RECEIPT_ROWS
+    )
+    document = (
+        '<!DOCTYPE html>\n'
+        '<html><head><meta charset="utf-8">'
+        f'<title>Receipt {html.escape(str(data.get("receipt_number") or ""))}</title>'
+        '<style>body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}'
+        'th,td{padding:4px 12px;text-align:left;border-bottom:1px solid #ddd}</style>'
+        '</head><body>\n'
+        '<h1>Payment Receipt</h1>\n'
+        f'<table>\n{rows}\n</table>\n'
+        '</body></html>\n'
+    )
+    return document.encode('utf-8')
+
+
+def store_artifact(content):
+    """Write ``content`` under its SHA-256 and return the hash"""
+    sha256 = hashlib.sha256(content).hexdigest()
+    path = artifact_path(sha256)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return sha256
+
+
+def save_receipt(payment, data, content):
+    sha256 = store_artifact(content)
+    receipt, _ = Receipt.objects.update_or_create(
+        payment=payment,
+        defaults={
+            'receipt_data': data,
+            'artifact_sha256': sha256,
+            'artifact_size': len(content),
+        },
+    )
+    return receipt
+
+
+def generate_receipt(payment_id):
+    """Build, render and store the receipt for one payment"""
+    payment = Payment.objects.select_related('tenant', 'unit').filter(pk=payment_id).first()
+    if payment is None or payment.status != 'completed':
+        return None
+    data = build_receipt_data(payment)
+    return save_receipt(payment, data, render_receipt(data))
+
+
+def _run_job(payment_id, attempts=3):
+    try:
+        for attempt in range(attempts):
+            try:
+                generate_receipt(payment_id)
+                return
+            except OperationalError as e:
+                # SQLite reports lock contention with the request thread this way
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(0.2 * (attempt + 1))
+    except Exception as e:
+        logger.error(f"Error generating receipt for payment {payment_id}: {e}")
+    finally:
+        # Worker threads hold their own connections
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'RECEIPT_WORKERS', 2),
+                thread_name_prefix='receipts',
+            )
+        return _executor
+
+
+def enqueue(payment_ids):
+    """Generate receipts for ``payment_ids`` in the background once the current transaction commits"""
+    payment_ids = list(payment_ids)
+    if not payment_ids:
+        return
+
+    def submit():
+        if getattr(settings, 'RECEIPT_WORKERS', 2) <= 0:
+            for payment_id in payment_ids:
+                _run_job(payment_id)
+            return
+        executor = _get_executor()
+        for payment_id in payment_ids:
+            executor.submit(_run_job, payment_id)
+
+    transaction.on_commit(submit)
+
+
+def render_month(year, month, queryset=None, batch_size=RENDER_BATCH_SIZE):
+    """Render every completed payment dated in ``year``/``month``; returns the number rendered"""
+    queryset = queryset if queryset is not None else Payment.objects.all()
+    payments = queryset.filter(
+        status='completed',
+        payment_date__year=year,
+        payment_date__month=month,
+    ).select_related('tenant', 'unit').order_by('pk')
+
+    rendered = 0
+    batch = []
+    for payment in payments.iterator(chunk_size=batch_size):
+        batch.append(payment)
+        if len(batch) >= batch_size:
+            _render_batch(batch)
+            rendered += len(batch)
+            batch = []
+    if batch:
+        _render_batch(batch)
+        rendered += len(batch)
+    return rendered
+
+
+def _render_batch(payments):
+    """Render and store receipts for ``payments``, writing the rows in bulk"""
+    existing = Receipt.objects.in_bulk([payment.pk for payment in payments], field_name='payment_id')
+    to_create = []
+    to_update = []
+    for payment in payments:
+        data = build_receipt_data(payment)
+        content = render_receipt(data)
+        sha256 = store_artifact(content)
+        receipt = existing.get(payment.pk)
+        if receipt is None:
+            to_create.append(Receipt(payment=payment, receipt_data=data, artifact_sha256=sha256, artifact_size=len(content)))
+        else:
+            receipt.receipt_data = data
+            receipt.artifact_sha256 = sha256
+            receipt.artifact_size = len(content)
+            to_update.append(receipt)
+    with transaction.atomic():
+        Receipt.objects.bulk_create(to_create)
+        Receipt.objects.bulk_update(to_update, ['receipt_data', 'artifact_sha256', 'artifact_size'])
@@ -0,0 +1,321 @@
+"""
+Bank and mobile-money statement reconciliation.
+
+Statements (CSV or OFX) are parsed one line at a time from the upload stream
+and matched against an in-memory index of the owner's pending payments, built
+with a single query:
+
+* by ``reference_number`` (the statement reference, or any token of its
+  description), when the amount agrees
+* otherwise by exact amount, picking the pending payment whose ``due_date``
+  is closest to the transaction date within ``window_days``
+
+Each pending payment is matched at most once. Matches are written in chunks
+with ``bulk_update`` (status ``completed``, the statement date as
+``payment_date`` and the statement reference if the payment had none), and
+the rollups, search index and receipts are brought up to date for each chunk.
+Memory use is bounded by the number of pending payments, not the statement.
+"""
+import csv
+import re
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from core import changes
+from .bulk import after_bulk_write
+from .imports import _iter_lines
+from .models import Payment, PaymentRollup
+
+CHUNK_SIZE = 500
+DEFAULT_WINDOW_DAYS = 7
+
+OFX_CONTENT_TYPES = ['application/x-ofx', 'application/ofx', 'application/vnd.intu.qfx']
+OFX_EXTENSIONS = ('.ofx', '.qfx')
+
+StatementLine = namedtuple('StatementLine', ['line', 'date', 'amount', 'reference', 'description'])
+StatementError = namedtuple('StatementError', ['line', 'error'])
+
+# Normalised CSV header -> statement field
+CSV_COLUMNS = {
+    'date': 'date',
+    'transaction date': 'date',
+    'value date': 'date',
+    'posted': 'date',
+    'completion time': 'date',
+    'amount': 'amount',
+    'credit': 'amount',
+    'paid in': 'amount',
+    'reference': 'reference',
+    'reference number': 'reference',
+    'reference_number': 'reference',
+    'ref': 'reference',
+    'receipt': 'reference',
+    'receipt no.': 'reference',
+    'transaction id': 'reference',
+    'description': 'description',
+    'details': 'description',
+    'narrative': 'description',
+    'memo': 'description',
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y', '%d %b %Y', '%Y%m%d']
+
+OFX_TAG_RE = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+TOKEN_RE = re.compile(r'[\w-]+')
+
+
+class StatementFormatError(Exception):
+    """Raised when the statement cannot be parsed at all"""
+
+
+def normalise_reference(value):
+    return (value or '').strip().upper()
+
+
+def parse_date(value):
+    value = (value or '').strip()
+    # Drop any time component: "2025-10-01 14:02:11", "20251001120000[0:GMT]"
+    candidates = [value, value.split(' ')[0].split('T')[0], value[:8]]
+    for candidate in candidates:
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt).date()
+            except ValueError:
+                continue
+    raise ValueError(f"Unrecognised date '{value}'")
+
+
+def parse_amount(value):
+    cleaned = re.sub(r'[^\d.\-]', '', (value or '').replace(',', ''))
+    try:
+        return Decimal(cleaned).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"Unrecognised amount '{value}'")
+
+
+def _statement_line(line_number, fields):
+    """Build a ``StatementLine``, or a ``StatementError`` if a field does not parse"""
+    try:
+        return StatementLine(
+            line=line_number,
+            date=parse_date(fields.get('date')),
+            amount=parse_amount(fields.get('amount')),
+            reference=(fields.get('reference') or '').strip(),
+            description=(fields.get('description') or '').strip(),
+        )
+    except ValueError as e:
+        return StatementError(line=line_number, error=str(e))
+
+
+def _parse_csv(lines):
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        return
+    columns = [CSV_COLUMNS.get(name.strip().lower()) for name in header]
+    if 'date' not in columns or 'amount' not in columns:
+        raise StatementFormatError('CSV statements need a date and an amount column.')
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        # Physical line in the file, counting the header and blank lines
+        line_number = reader.line_num
+        fields = {}
+        for column, value in zip(columns, row):
+            # First matching column wins, e.g. "Paid In" over a later "Amount"
+            if column and value.strip() and column not in fields:
+                fields[column] = value
+        yield _statement_line(line_number, fields)
+
+
+def _parse_ofx(lines):
+    """Parse ``<STMTTRN>`` blocks from SGML (OFX 1.x) or XML (OFX 2.x) statements
+
+    Each transaction is numbered with the file line its ``<STMTTRN>`` opens on.
+    """
+    transaction_fields = None
+    opened_on = None
+    for line_number, text in enumerate(lines, start=1):
+        for closing, tag, value in OFX_TAG_RE.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing:
+                    if transaction_fields is not None:
+                        yield _statement_line(opened_on, transaction_fields)
+                    transaction_fields = None
+                else:
+                    transaction_fields = {}
+                    opened_on = line_number
+                continue
+            if transaction_fields is None or closing:
+                continue
+            value = value.strip()
+            if tag == 'DTPOSTED':
+                transaction_fields['date'] = value
+            elif tag == 'TRNAMT':
+                transaction_fields['amount'] = value
+            elif tag in ('REFNUM', 'CHECKNUM') or (tag == 'FITID' and 'reference' not in transaction_fields):
+                transaction_fields['reference'] = value
+            elif tag in ('NAME', 'MEMO'):
+                transaction_fields['description'] = ' '.join(
+                    part for part in [transaction_fields.get('description'), value] if part
+                )
+
+
+def parse_statement(stream, content_type='', filename=''):
+    """Yield ``StatementLine`` (or ``StatementError``) tuples from a CSV or OFX byte stream"""
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    lines = _iter_lines(stream)
+    if content_type in OFX_CONTENT_TYPES or (filename or '').lower().endswith(OFX_EXTENSIONS):
+        return _parse_ofx(lines)
+    return _parse_csv(lines)
+
+
+class PaymentIndex:
+    """Pending payments keyed by reference number and by amount"""
+
+    def __init__(self, queryset, window_days=DEFAULT_WINDOW_DAYS):
+        self.window_days = window_days
+        self.by_reference = defaultdict(list)
+        # amount -> due date -> entries, so amount matches only probe the window
+        self.by_amount = defaultdict(lambda: defaultdict(list))
+        self.used = set()
+        rows = queryset.filter(status='pending').values_list('pk', 'reference_number', 'amount', 'due_date')
+        for pk, reference, amount, due_date in rows.iterator(chunk_size=2000):
+            amount = Decimal(amount).quantize(Decimal('0.01'))
+            entry = (pk, amount, due_date)
+            reference = normalise_reference(reference)
+            if reference:
+                self.by_reference[reference].append(entry)
+            self.by_amount[amount][due_date].append(entry)
+
+    def _take(self, entry):
+        self.used.add(entry[0])
+        return entry[0]
+
+    def _available(self, entries):
+        """Entries not matched yet; matched ones are dropped so each is skipped only once"""
+        entries[:] = [entry for entry in entries if entry[0] not in self.used]
+        return entries
+
+    def match(self, line):
+        """Return ``(payment_pk, None)`` or ``(None, reason)`` for a statement line"""
+        references = [normalise_reference(line.reference)] if line.reference else []
+        references += [normalise_reference(token) for token in TOKEN_RE.findall(line.description)]
+        reference_hit = False
+        for reference in references:
+            for entry in self._available(self.by_reference.get(reference, [])):
+                reference_hit = True
+                if entry[1] == line.amount:
+                    return self._take(entry), None
+
+        by_date = self.by_amount.get(line.amount)
+        if by_date:
+            # Closest due date first: 0, -1, +1, -2, +2, ...
+            for distance in range(self.window_days + 1):
+                for offset in ((0,) if distance == 0 else (-distance, distance)):
+                    entries = by_date.get(line.date + timedelta(days=offset))
+                    if entries:
+                        while entries and entries[-1][0] in self.used:
+                            entries.pop()
+                        if entries:
+                            return self._take(entries.pop()), None
+
+        if reference_hit:
+            return None, 'Reference matches a pending payment with a different amount'
+        return None, 'No pending payment matches this reference or amount'
+
+
+def _apply_matches(matches, dry_run, report, on_unmatched):
+    """Complete the matched payments for one chunk of ``(payment_pk, line)`` pairs"""
+    if not matches:
+        return
+    if dry_run:
+        report['matched'] += len(matches)
+        return
+    with transaction.atomic():
+        payments = Payment.objects.select_for_update().filter(
+            pk__in=[pk for pk, _ in matches], status='pending'
+        ).in_bulk()
+        completed = []
+        for pk, line in matches:
+            payment = payments.get(pk)
+            if payment is None:
+                _unmatched(line, 'Payment was settled while the statement was processed', report, on_unmatched)
+                continue
+            completed.append((payment, line))
+        if not completed:
+            return
+        updated = [payment for payment, _ in completed]
+        # Out of the pending buckets; after_bulk_write adds them to the completed ones
+        PaymentRollup.apply_payments(updated, sign=-1)
+        now = timezone.now()
+        for payment, line in completed:
+            payment.status = 'completed'
+            payment.payment_date = line.date
+            payment.updated_at = now
+            if not payment.reference_number and line.reference:
+                payment.reference_number = line.reference[:100]
+        Payment.objects.bulk_update(updated, ['status', 'payment_date', 'reference_number', 'updated_at'])
+        after_bulk_write(updated, changes.UPDATED)
+    report['matched'] += len(completed)
+
+
+def _unmatched(line, reason, report, on_unmatched):
+    item = {
+        'line': line.line,
+        'date': line.date.isoformat(),
+        'amount': str(line.amount),
+        'reference': line.reference,
+        'description': line.description,
+        'reason': reason,
+    }
+    report['unmatched'] += 1
+    if on_unmatched is not None:
+        on_unmatched(item)
+    else:
+        report['unmatched_items'].append(item)
+
+
+def reconcile_statement(stream, queryset=None, content_type='', filename='',
+                        window_days=DEFAULT_WINDOW_DAYS, dry_run=False, on_unmatched=None):
+    """Match a statement against pending payments in ``queryset`` and return a report
+
+    Unmatched lines are collected in ``report['unmatched_items']`` unless an
+    ``on_unmatched`` callback is given, in which case each item is passed to it
+    as soon as it is found.
+    """
+    queryset = queryset if queryset is not None else Payment.objects.all()
+    index = PaymentIndex(queryset, window_days=window_days)
+    report = {
+        'lines': 0,
+        'matched': 0,
+        'unmatched': 0,
+        'ignored': 0,
+        'errors': [],
+        'unmatched_items': [],
+        'dry_run': dry_run,
+    }
+
+    matches = []
+    for line in parse_statement(stream, content_type, filename):
+        report['lines'] += 1
+        if isinstance(line, StatementError):
+            report['errors'].append({'line': line.line, 'error': line.error})
+            continue
+        if line.amount <= 0:
+            # Debits and zero-value lines are not incoming payments
+            report['ignored'] += 1
+            continue
+        payment_pk, reason = index.match(line)
+        if payment_pk is None:
+            _unmatched(line, reason, report, on_unmatched)
+            continue
+        matches.append((payment_pk, line))
+        if len(matches) >= CHUNK_SIZE:
+            _apply_matches(matches, dry_run, report, on_unmatched)
+            matches = []
+    _apply_matches(matches, dry_run, report, on_unmatched)
+    return report
@@ -0,0 +1,98 @@
+"""
+Monthly rent roll: one pending rent ``Payment`` per active tenant.
+
+``generate_rent_roll`` bills every active tenant with a ``current_unit`` and
+a non-zero ``monthly_rent`` for one calendar month. Tenants already billed
+for the period are found with a single query and skipped, so the roll can be
+re-run safely; the ``unique_rent_per_tenant_period`` constraint backs this up
+against concurrent runs. Payment IDs for the whole roll are reserved with one
+sequence update and the rows are written with ``bulk_create`` in a single
+transaction.
+"""
+import calendar
+from datetime import date
+from decimal import Decimal
+from django.db import transaction
+from core.sequences import next_identifiers
+from core import changes
+from tenants.models import Tenant
+from .bulk import after_bulk_write
+from .models import Payment
+
+BATCH_SIZE = 1000
+
+# How the tenant will pay is unknown when the rent is billed
+PAYMENT_METHOD = 'other'
+
+
+def billing_period(year, month, due_day=1):
+    """``(period_start, period_end, due_date)`` for a calendar month"""
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, 1), date(year, month, last_day), date(year, month, min(max(due_day, 1), last_day))
+
+
+def generate_rent_roll(year, month, owner, due_day=1, dry_run=False):
+    """Create pending rent payments for ``year``/``month`` and return a summary
+
+    ``owner`` limits the roll to one owner (user instance or firebase uid);
+    only the management command passes None, to bill every owner. With
+    ``dry_run`` nothing is written and the summary describes what would be created.
+    """
+    period_start, period_end, due_date = billing_period(year, month, due_day)
+
+    tenants = Tenant.objects.filter(
+        status='Active',
+        current_unit__isnull=False,
+        monthly_rent__gt=0,
+    ).only('id', 'tenant_id', 'first_name', 'last_name', 'current_unit_id', 'monthly_rent', 'owner_id')
+    billed = Payment.objects.filter(payment_type='rent', period_start=period_start)
+    if owner is not None:
+        tenants = tenants.filter(owner=owner)
+        billed = billed.filter(owner=owner)
+
+    with transaction.atomic():
+        already_billed = set(billed.filter(tenant__isnull=False).values_list('tenant_id', flat=True))
+        to_bill = [tenant for tenant in tenants.order_by('id') if tenant.id not in already_billed]
+
+        summary = {
+            'period_start': period_start.isoformat(),
+            'period_end': period_end.isoformat(),
+            'due_date': due_date.isoformat(),
+            'dry_run': dry_run,
+            'tenants': len(to_bill) + len(already_billed),
+            'created': 0,
+            'skipped': len(already_billed),
+            'total_amount': str(sum((tenant.monthly_rent for tenant in to_bill), Decimal('0'))),
+        }
+        if dry_run or not to_bill:
+            if dry_run:
+                summary['would_create'] = len(to_bill)
+            return summary
+
+        payment_ids = next_identifiers('PAY', Payment, 'payment_id', len(to_bill))
+        receipt_numbers = next_identifiers('RCP', Payment, 'receipt_number', len(to_bill))
+        description = f"Rent for {period_start.strftime('%B %Y')}"
+        payments = [
+            Payment(
+                payment_id=payment_id,
+                receipt_number=receipt_number,
+                tenant_id=tenant.id,
+                unit_id=tenant.current_unit_id,
+                owner_id=tenant.owner_id,
+                payment_type='rent',
+                payment_method=PAYMENT_METHOD,
+                amount=tenant.monthly_rent,
+                status='pending',
+                payment_date=due_date,
+                due_date=due_date,
+                period_start=period_start,
+                period_end=period_end,
+                description=description,
+            )
+            for tenant, payment_id, receipt_number in zip(to_bill, payment_ids, receipt_numbers)
+        ]
+        Payment.objects.bulk_create(payments, batch_size=BATCH_SIZE)
+        after_bulk_write(payments, changes.CREATED)
+
+    summary['created'] = len(payments)
+    return summary
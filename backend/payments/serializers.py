@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Payment, PaymentReminder, Receipt
+from .models import Payment, PaymentReminder, Receipt, LedgerEntry, TenantBalance
 from tenants.models import Tenant
 from units.models import Unit
 
@@ -84,6 +84,31 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         return value
 
 
+class PaymentImportSerializer(serializers.ModelSerializer):
+    """Field-level validation for one row of a bulk payment import.
+
+    ``tenant`` and ``unit`` are plain IDs here; the import resolves them for a
+    whole chunk at once instead of one query per row.
+    """
+    tenant = serializers.IntegerField(required=False, allow_null=True)
+    unit = serializers.IntegerField(required=False, allow_null=True)
+    
+    class Meta:
+        model = Payment
+        fields = [
+            'tenant',
+            'unit',
+            'payment_type',
+            'amount',
+            'payment_method',
+            'status',
+            'payment_date',
+            'due_date',
+            'description',
+            'reference_number',
+        ]
+
+
 class PaymentReminderSerializer(serializers.ModelSerializer):
     tenant_name = serializers.CharField(source='tenant.full_name', read_only=True)
     
@@ -111,6 +136,46 @@ class ReceiptSerializer(serializers.ModelSerializer):
             'payment',
             'payment_details',
             'receipt_data',
+            'artifact_sha256',
+            'artifact_size',
             'generated_at',
         ]
-        read_only_fields = ['id', 'generated_at']
+        read_only_fields = ['id', 'artifact_sha256', 'artifact_size', 'generated_at']
+
+
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    payment_id = serializers.CharField(source='payment.payment_id', read_only=True, default=None)
+    running_balance = serializers.DecimalField(max_digits=14, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = LedgerEntry
+        fields = [
+            'id',
+            'entry_type',
+            'category',
+            'amount',
+            'entry_date',
+            'description',
+            'payment',
+            'payment_id',
+            'running_balance',
+        ]
+        read_only_fields = fields
+
+
+class TenantBalanceSerializer(serializers.ModelSerializer):
+    tenant_id = serializers.CharField(source='tenant.tenant_id', read_only=True)
+    tenant_name = serializers.CharField(source='tenant.full_name', read_only=True)
+    
+    class Meta:
+        model = TenantBalance
+        fields = [
+            'tenant',
+            'tenant_id',
+            'tenant_name',
+            'balance',
+            'total_charged',
+            'total_paid',
+            'updated_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,75 @@
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from .models import Payment, PaymentRollup
+from . import analytics, ledger, receipts
+
+
+@receiver(pre_save, sender=Payment)
+def remember_rollup_bucket(sender, instance, **kwargs):
+    """Remember which bucket the stored row counted towards before it changes"""
+    instance._rollup_previous = None
+    if instance.pk:
+        previous = Payment.objects.filter(pk=instance.pk).values(
+            'owner_id', 'due_date', 'status', 'payment_type', 'amount'
+        ).first()
+        if previous:
+            instance._rollup_previous = (
+                (previous['owner_id'], previous['due_date'], previous['status'], previous['payment_type']),
+                previous['amount'],
+            )
+
+
+@receiver(post_save, sender=Payment)
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    """Move the payment's contribution between rollup buckets"""
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    key = PaymentRollup.bucket_key(instance)
+    if previous:
+        previous_key, previous_amount = previous
+        if previous_key == key:
+            PaymentRollup.apply_delta(key, 0, instance.amount - previous_amount)
+            return
+        PaymentRollup.apply_delta(previous_key, -1, -previous_amount)
+    PaymentRollup.apply_delta(key, 1, instance.amount)
+
+
+@receiver(post_delete, sender=Payment)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Remove the payment's contribution from its rollup bucket"""
+    PaymentRollup.apply_delta(PaymentRollup.bucket_key(instance), -1, -instance.amount)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_payment_analytics(sender, **kwargs):
+    """Cached time series are stale once any payment changes"""
+    analytics.invalidate_cache()
+
+
+@receiver(post_save, sender=Payment)
+def queue_receipt_on_save(sender, instance, raw=False, **kwargs):
+    """(Re)generate the receipt in the background whenever a completed payment is saved
+
+    Edits made after the receipt was generated replace it; an unchanged
+    receipt renders to the same artifact.
+    """
+    if raw:
+        return
+    if instance.status == 'completed':
+        receipts.enqueue([instance.pk])
+
+
+@receiver(post_save, sender=Payment)
+def sync_ledger_on_save(sender, instance, raw=False, **kwargs):
+    """Keep the tenant's ledger entries and balance in step with the payment"""
+    if raw:
+        return
+    ledger.sync_payments([instance])
+
+
+@receiver(pre_delete, sender=Payment)
+def reverse_ledger_on_delete(sender, instance, **kwargs):
+    """Take the payment out of the tenant's balance before its entries cascade away"""
+    ledger.remove_payment(instance)
@@ -0,0 +1,667 @@
+from datetime import date, timedelta
+from decimal import Decimal
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from core import search
+from core.models import ChangeEntry, SearchEntry
+from core.testing import api_client, make_owner, make_payment, make_tenant, make_unit
+from . import analytics, ledger, receipts
+from .late_fees import assess_late_fees
+from .reconciliation import StatementFormatError, reconcile_statement
+from .rent_roll import generate_rent_roll
+from .models import LateFeeRun, LedgerEntry, Payment, PaymentRollup, Receipt, TenantBalance
+
+
+class PaymentRollupTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.due = date(2025, 3, 10)
+
+    def bucket(self, status='pending', payment_type='rent', owner=None):
+        return PaymentRollup.objects.filter(
+            owner=owner or self.owner, due_date=self.due, status=status, payment_type=payment_type,
+        ).values_list('payment_count', 'total_amount').first()
+
+    def test_create_adds_to_bucket(self):
+        make_payment(self.owner, due_date=self.due, amount=Decimal('100.00'))
+        make_payment(self.owner, due_date=self.due, amount=Decimal('50.50'))
+        self.assertEqual(self.bucket(), (2, Decimal('150.50')))
+
+    def test_amount_change_stays_in_bucket(self):
+        payment = make_payment(self.owner, due_date=self.due, amount=Decimal('100.00'))
+        payment.amount = Decimal('80.00')
+        payment.save()
+        self.assertEqual(self.bucket(), (1, Decimal('80.00')))
+
+    def test_status_change_moves_between_buckets(self):
+        payment = make_payment(self.owner, due_date=self.due, amount=Decimal('100.00'))
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(self.bucket('pending'), (0, Decimal('0.00')))
+        self.assertEqual(self.bucket('completed'), (1, Decimal('100.00')))
+
+    def test_delete_removes_contribution(self):
+        keep = make_payment(self.owner, due_date=self.due, amount=Decimal('30.00'))
+        make_payment(self.owner, due_date=self.due, amount=Decimal('70.00')).delete()
+        self.assertEqual(self.bucket(), (1, keep.amount))
+
+    def test_buckets_are_per_owner(self):
+        other = make_owner()
+        make_payment(self.owner, due_date=self.due)
+        make_payment(other, due_date=self.due)
+        self.assertEqual(self.bucket()[0], 1)
+        self.assertEqual(self.bucket(owner=other)[0], 1)
+
+    def test_apply_payments_for_bulk_writes(self):
+        payment = make_payment(self.owner, due_date=self.due, amount=Decimal('40.00'))
+        PaymentRollup.apply_payments([payment, payment])
+        self.assertEqual(self.bucket(), (3, Decimal('120.00')))
+        PaymentRollup.apply_payments([payment, payment], sign=-1)
+        self.assertEqual(self.bucket(), (1, Decimal('40.00')))
+
+    def test_no_drift_after_signal_updates(self):
+        payment = make_payment(self.owner, due_date=self.due)
+        payment.status = 'completed'
+        payment.save()
+        make_payment(self.owner, due_date=self.due, payment_type='deposit').delete()
+        self.assertEqual(PaymentRollup.find_drift(), [])
+
+    def test_find_drift_and_rebuild(self):
+        make_payment(self.owner, due_date=self.due, amount=Decimal('100.00'))
+        PaymentRollup.objects.update(payment_count=5)
+        drift = PaymentRollup.find_drift()
+        self.assertEqual(len(drift), 1)
+        key, stored, expected = drift[0]
+        self.assertEqual(stored[0], 5)
+        self.assertEqual(expected[0], 1)
+
+        PaymentRollup.rebuild()
+        self.assertEqual(PaymentRollup.find_drift(), [])
+        self.assertEqual(self.bucket(), (1, Decimal('100.00')))
+
+    def test_rebuild_command_check_reports_drift(self):
+        make_payment(self.owner, due_date=self.due)
+        call_command('rebuild_payment_rollups', '--check', stdout=StringIO())
+        PaymentRollup.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_payment_rollups', '--check', stdout=StringIO())
+        call_command('rebuild_payment_rollups', stdout=StringIO())
+        self.assertEqual(PaymentRollup.find_drift(), [])
+
+    def test_stats_endpoint_reads_rollups(self):
+        past = date.today() - timedelta(days=5)
+        make_payment(self.owner, due_date=past, amount=Decimal('100.00'))
+        make_payment(self.owner, status='completed', amount=Decimal('250.00'))
+        make_payment(make_owner(), amount=Decimal('999.00'))
+
+        response = api_client(self.owner).get('/api/payments/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_payments'], 2)
+        self.assertEqual(response.data['pending_payments'], 1)
+        self.assertEqual(response.data['overdue_payments'], 1)
+        self.assertEqual(Decimal(str(response.data['total_amount'])), Decimal('250.00'))
+
+
+class PaymentAnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+
+    def test_monthly_buckets(self):
+        make_payment(self.owner, status='completed', payment_date=date(2025, 1, 5), amount=Decimal('100.00'))
+        make_payment(self.owner, status='completed', payment_date=date(2025, 1, 20), amount=Decimal('50.00'))
+        make_payment(self.owner, status='pending', payment_date=date(2025, 2, 3),
+                     due_date=date(2025, 2, 3), amount=Decimal('75.00'))
+
+        rows = analytics.payment_time_series(Payment.objects.all(), date(2025, 1, 1), date(2025, 2, 28))
+        self.assertEqual([row['period'][:7] for row in rows], ['2025-01', '2025-02'])
+        self.assertEqual(rows[0]['collected'], 150.0)
+        self.assertEqual(rows[0]['collected_count'], 2)
+        self.assertEqual(rows[1]['pending'], 75.0)
+        self.assertEqual(rows[1]['overdue'], 75.0)
+
+    def test_range_and_date_field(self):
+        make_payment(self.owner, payment_date=date(2025, 1, 5), due_date=date(2025, 3, 1))
+        by_payment = analytics.payment_time_series(Payment.objects.all(), date(2025, 3, 1), date(2025, 3, 31))
+        by_due = analytics.payment_time_series(
+            Payment.objects.all(), date(2025, 3, 1), date(2025, 3, 31), date_field='due_date',
+        )
+        self.assertEqual(by_payment, [])
+        self.assertEqual(len(by_due), 1)
+
+    def test_group_by_unit(self):
+        first, second = make_unit(self.owner), make_unit(self.owner)
+        make_payment(self.owner, unit=first, status='completed', payment_date=date(2025, 1, 5))
+        make_payment(self.owner, unit=second, status='completed', payment_date=date(2025, 1, 6))
+        rows = analytics.payment_time_series(
+            Payment.objects.all(), date(2025, 1, 1), date(2025, 1, 31), group_by=['unit'],
+        )
+        self.assertEqual({row['unit_id'] for row in rows}, {first.unit_id, second.unit_id})
+
+    def test_endpoint_validates_parameters(self):
+        for params in [{'granularity': 'hour'}, {'date_field': 'created_at'}, {'group_by': 'colour'},
+                       {'from': '2025-13-01'}, {'from': '2025-02-01', 'to': '2025-01-01'}]:
+            response = self.client.get('/api/payments/monthly_stats/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.data)
+
+    def test_endpoint_is_owner_scoped_and_refreshed_on_write(self):
+        params = {'from': '2025-01-01', 'to': '2025-12-31', 'granularity': 'year'}
+        make_payment(self.owner, status='completed', payment_date=date(2025, 6, 1), amount=Decimal('10.00'))
+        make_payment(make_owner(), status='completed', payment_date=date(2025, 6, 1), amount=Decimal('99.00'))
+        self.assertEqual(self.client.get('/api/payments/monthly_stats/', params).data[0]['collected'], 10.0)
+
+        make_payment(self.owner, status='completed', payment_date=date(2025, 7, 1), amount=Decimal('5.00'))
+        self.assertEqual(self.client.get('/api/payments/monthly_stats/', params).data[0]['collected'], 15.0)
+
+
+class ReceiptsDirMixin:
+    """Render receipts inline into a throwaway directory"""
+
+    def setUp(self):
+        super().setUp()
+        receipts_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(receipts_dir.cleanup)
+        settings = override_settings(RECEIPTS_ROOT=receipts_dir.name, RECEIPT_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class PaymentImportTests(ReceiptsDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Flush the change-log batch the fixtures open before the import runs
+        with self.captureOnCommitCallbacks(execute=True):
+            self.owner = make_owner()
+            self.unit = make_unit(self.owner)
+            self.tenant = make_tenant(self.owner, current_unit=self.unit)
+        self.client = api_client(self.owner)
+
+    def post(self, body, content_type='text/csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/payments/bulk/', body, content_type=content_type)
+
+    def test_csv_rows_are_created_with_identifiers(self):
+        body = (
+            'tenant,unit,amount,payment_method,payment_date,due_date,status\n'
+            f'{self.tenant.pk},{self.unit.pk},100.00,cash,2025-01-05,2025-01-01,completed\n'
+            f'{self.tenant.pk},{self.unit.pk},200.00,cash,2025-02-05,2025-02-01,pending\n'
+        )
+        response = self.post(body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['created'], response.data['failed']), (2, 2, 0))
+        payments = list(Payment.objects.order_by('payment_id'))
+        self.assertEqual(len({payment.payment_id for payment in payments}), 2)
+        self.assertTrue(all(payment.receipt_number and payment.owner_id == self.owner.pk for payment in payments))
+
+    def test_rejected_rows_are_reported(self):
+        other_tenant = make_tenant(make_owner())
+        body = '\n'.join([
+            f'{{"tenant": {self.tenant.pk}, "amount": "50.00", "payment_method": "cash", '
+            f'"payment_date": "2025-01-05", "due_date": "2025-01-01"}}',
+            'not json',
+            f'{{"tenant": {other_tenant.pk}, "amount": "50.00", "payment_method": "cash", '
+            f'"payment_date": "2025-01-05", "due_date": "2025-01-01"}}',
+            '{"tenant": 999999, "amount": "oops"}',
+        ])
+        response = self.post(body, 'application/x-ndjson')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4])
+        self.assertIn('tenant', response.data['errors'][1]['errors'])
+
+    def test_unsupported_content_type(self):
+        response = self.client.post('/api/payments/bulk/', 'x', content_type='application/xml')
+        self.assertEqual(response.status_code, 415)
+
+    def test_side_effects_match_single_saves(self):
+        body = (
+            'tenant,unit,amount,payment_method,payment_date,due_date,status\n'
+            f'{self.tenant.pk},{self.unit.pk},100.00,cash,2025-01-05,2025-01-01,completed\n'
+            f'{self.tenant.pk},{self.unit.pk},300.00,cash,2025-02-05,2025-02-01,pending\n'
+        )
+        self.post(body)
+        payments = Payment.objects.all()
+        ids = set(payments.values_list('pk', flat=True))
+
+        self.assertEqual(PaymentRollup.find_drift(), [])
+        self.assertEqual(TenantBalance.objects.get(tenant=self.tenant).balance, Decimal('300.00'))
+        self.assertEqual(
+            set(SearchEntry.objects.filter(doc_type=search.doc_type_for(Payment)).values_list('object_id', flat=True)),
+            ids,
+        )
+        self.assertEqual(
+            set(ChangeEntry.objects.filter(model='payments.Payment', action='created')
+                .values_list('object_id', flat=True)),
+            ids,
+        )
+        self.assertEqual(
+            list(Receipt.objects.values_list('payment__status', flat=True)),
+            ['completed'],
+        )
+
+
+class PaymentQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        for owner in [self.owner, make_owner()]:
+            for _ in range(5):
+                unit = make_unit(owner)
+                tenant = make_tenant(owner, current_unit=unit)
+                make_payment(owner, tenant=tenant, unit=unit, description='March rent')
+        # Whether the full-text index exists is looked up once per process
+        search.fulltext_available()
+
+    def test_list(self):
+        # COUNT(*) and the page, tenant and unit joined in
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/payments/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_detail(self):
+        payment = Payment.objects.filter(owner=self.owner).first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/payments/{payment.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search(self):
+        # Full-text match, COUNT(*) and the page
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/payments/search/', {'q': 'march'})
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class ReceiptTests(ReceiptsDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+
+    def complete(self, payment):
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.status = 'completed'
+            payment.save()
+        return Receipt.objects.get(payment=payment)
+
+    def test_completed_payment_gets_stored_artifact(self):
+        payment = make_payment(self.owner)
+        self.assertFalse(Receipt.objects.filter(payment=payment).exists())
+        receipt = self.complete(payment)
+
+        content = receipts.artifact_path(receipt.artifact_sha256).read_bytes()
+        self.assertEqual(len(content), receipt.artifact_size)
+        self.assertEqual(receipt.receipt_data['receipt_number'], payment.receipt_number)
+        self.assertIn(payment.receipt_number.encode(), content)
+
+    def test_edited_payment_gets_new_receipt(self):
+        payment = make_payment(self.owner)
+        first = self.complete(payment)
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.reference_number = 'QX81'
+            payment.save()
+        receipt = Receipt.objects.get(payment=payment)
+        self.assertEqual(receipt.receipt_data['reference_number'], 'QX81')
+        self.assertNotEqual(receipt.artifact_sha256, first.artifact_sha256)
+        self.assertIn(b'QX81', receipts.artifact_path(receipt.artifact_sha256).read_bytes())
+
+    def test_artifacts_are_content_addressed(self):
+        content = receipts.render_receipt({'receipt_number': 'RCP-1'})
+        self.assertEqual(content, receipts.render_receipt({'receipt_number': 'RCP-1'}))
+        self.assertEqual(receipts.store_artifact(content), receipts.store_artifact(content))
+
+    def test_endpoint_supports_etag_and_ranges(self):
+        payment = make_payment(self.owner)
+        receipt = self.complete(payment)
+        url = f'/api/payments/{payment.pk}/receipt/'
+        etag = f'"{receipt.artifact_sha256}"'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        partial = self.client.get(url, HTTP_RANGE='bytes=0-9')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial['Content-Range'], f'bytes 0-9/{receipt.artifact_size}')
+        self.assertEqual(len(partial.content), 10)
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={receipt.artifact_size}-').status_code, 416)
+
+    def test_endpoint_for_pending_and_missing_receipts(self):
+        pending = make_payment(self.owner)
+        self.assertEqual(self.client.get(f'/api/payments/{pending.pk}/receipt/').status_code, 404)
+
+        receipt = self.complete(pending)
+        receipts.artifact_path(receipt.artifact_sha256).unlink()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(f'/api/payments/{pending.pk}/receipt/')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(receipts.artifact_path(receipt.artifact_sha256).exists())
+
+    def test_render_month(self):
+        january = make_payment(self.owner, status='completed', payment_date=date(2025, 1, 10))
+        make_payment(self.owner, payment_date=date(2025, 1, 11))
+        make_payment(self.owner, status='completed', payment_date=date(2025, 2, 1))
+        make_payment(make_owner(), status='completed', payment_date=date(2025, 1, 12))
+        Receipt.objects.all().delete()
+
+        response = self.client.post('/api/payments/receipts/batch/', {'month': '2025-01'})
+        self.assertEqual(response.data['rendered'], 1)
+        self.assertEqual(list(Receipt.objects.values_list('payment', flat=True)), [january.pk])
+        self.assertEqual(receipts.render_month(2025, 1, batch_size=1), 2)
+        self.assertEqual(self.client.post('/api/payments/receipts/batch/', {'month': 'jan'}).status_code, 400)
+
+
+class LateFeeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.as_of = date(2025, 3, 20)
+
+    def due(self, days_ago, **fields):
+        return make_payment(self.owner, due_date=self.as_of - timedelta(days=days_ago), amount=Decimal('1000.00'), **fields)
+
+    def test_days_late_and_fees_after_grace_period(self):
+        late, in_grace, not_due = self.due(10), self.due(3), self.due(-2)
+        paid = self.due(10, status='completed')
+
+        run = assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5)
+        for payment in [late, in_grace, not_due, paid]:
+            payment.refresh_from_db()
+        self.assertEqual((late.days_late, late.late_fee_amount), (10, Decimal('50.00')))
+        self.assertEqual((in_grace.days_late, in_grace.late_fee_amount), (3, Decimal('0.00')))
+        self.assertEqual((not_due.days_late, not_due.late_fee_amount), (0, Decimal('0.00')))
+        self.assertEqual(paid.late_fee_amount, Decimal('0.00'))
+        self.assertEqual((run.overdue_payments, run.fees_assessed, run.total_late_fees), (2, 1, Decimal('50.00')))
+
+    def test_moved_due_date_is_cleared(self):
+        payment = self.due(10)
+        assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5)
+        Payment.objects.filter(pk=payment.pk).update(due_date=self.as_of + timedelta(days=5))
+        run = assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5)
+        payment.refresh_from_db()
+        self.assertEqual((payment.days_late, payment.late_fee_amount), (0, Decimal('0.00')))
+        self.assertEqual(run.cleared_payments, 1)
+
+    def test_fee_is_charged_on_the_tenant_ledger(self):
+        tenant = make_tenant(self.owner)
+        self.due(10, tenant=tenant)
+        assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5)
+        self.assertEqual(TenantBalance.objects.get(tenant=tenant).balance, Decimal('1050.00'))
+
+    def test_dry_run_writes_nothing_but_the_run(self):
+        payment = self.due(10)
+        run = assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5, dry_run=True)
+        payment.refresh_from_db()
+        self.assertEqual(payment.late_fee_amount, Decimal('0.00'))
+        self.assertEqual(run.fees_assessed, 1)
+        self.assertTrue(LateFeeRun.objects.get(pk=run.pk).dry_run)
+
+    def test_run_drops_cached_stats_and_notifies(self):
+        self.due(10)
+        version = analytics.cache_version()
+        with mock.patch('core.events.get_broker') as get_broker:
+            with self.captureOnCommitCallbacks(execute=True):
+                assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5, dry_run=True)
+            get_broker.return_value.changed.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                assess_late_fees(as_of=self.as_of, grace_days=5, fee_percent=5)
+        get_broker.return_value.changed.assert_called_once_with('payments.Payment', self.owner.pk)
+        self.assertNotEqual(analytics.cache_version(), version)
+
+    def test_command_validates_date(self):
+        with self.assertRaises(CommandError):
+            call_command('assess_late_fees', '--date', '20-03-2025', stdout=StringIO())
+
+    def test_overdue_is_date_based(self):
+        stale = make_payment(self.owner, due_date=date.today() - timedelta(days=1), days_late=0)
+        current = make_payment(self.owner, due_date=date.today(), days_late=4)
+        self.assertTrue(stale.is_overdue)
+        self.assertFalse(current.is_overdue)
+
+        response = api_client(self.owner).get('/api/payments/search/', {'status': 'Overdue'})
+        self.assertEqual([row['id'] for row in response.data['results']], [stale.pk])
+
+
+class RentRollTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+
+    def tenant(self, owner=None, **fields):
+        owner = owner or self.owner
+        fields.setdefault('current_unit', make_unit(owner))
+        fields.setdefault('monthly_rent', Decimal('1200.00'))
+        return make_tenant(owner, **fields)
+
+    def test_bills_active_tenants_once(self):
+        billed = self.tenant()
+        self.tenant(status='Inactive')
+        self.tenant(current_unit=None)
+        self.tenant(monthly_rent=Decimal('0'))
+
+        summary = generate_rent_roll(2025, 2, None, due_day=30)
+        self.assertEqual((summary['created'], summary['skipped']), (1, 0))
+        payment = Payment.objects.get()
+        self.assertEqual(payment.tenant, billed)
+        self.assertEqual(payment.unit_id, billed.current_unit_id)
+        self.assertEqual((payment.period_start, payment.period_end, payment.due_date),
+                         (date(2025, 2, 1), date(2025, 2, 28), date(2025, 2, 28)))
+        self.assertTrue(payment.payment_id and payment.receipt_number)
+        payment.full_clean()
+
+        again = generate_rent_roll(2025, 2, None)
+        self.assertEqual((again['created'], again['skipped']), (0, 1))
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_dry_run_and_owner_filter(self):
+        self.tenant()
+        self.tenant(owner=make_owner())
+        summary = generate_rent_roll(2025, 3, self.owner, dry_run=True)
+        self.assertEqual((summary['would_create'], summary['total_amount']), (1, '1200.00'))
+        self.assertFalse(Payment.objects.exists())
+
+        self.assertEqual(generate_rent_roll(2025, 3, self.owner)['created'], 1)
+        self.assertEqual(list(Payment.objects.values_list('owner', flat=True)), [self.owner.pk])
+
+    def test_side_effects_match_single_saves(self):
+        tenant = self.tenant()
+        generate_rent_roll(2025, 3, self.owner)
+        self.assertEqual(PaymentRollup.find_drift(), [])
+        self.assertEqual(TenantBalance.objects.get(tenant=tenant).balance, Decimal('1200.00'))
+        payment = Payment.objects.get()
+        self.assertTrue(SearchEntry.objects.filter(doc_type=search.doc_type_for(Payment), object_id=payment.pk).exists())
+
+    def test_endpoint(self):
+        self.tenant()
+        client = api_client(self.owner)
+        self.assertEqual(client.post('/api/payments/rent-roll/', {'month': '2025-3'}).status_code, 201)
+        self.assertEqual(client.post('/api/payments/rent-roll/', {'month': '2025-03', 'dry_run': 'true'}).status_code, 200)
+        self.assertEqual(client.post('/api/payments/rent-roll/', {'month': 'March'}).status_code, 400)
+        self.assertEqual(client.post('/api/payments/rent-roll/', {'month': '2025-03', 'due_day': 'x'}).status_code, 400)
+
+    def test_endpoint_requires_an_owner(self):
+        self.tenant()
+        response = api_client().post('/api/payments/rent-roll/', {'month': '2025-03'})
+        self.assertIn(response.status_code, (401, 403))
+        self.assertFalse(Payment.objects.exists())
+
+
+class ReconciliationTests(ReceiptsDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.owner = make_owner()
+
+    def reconcile(self, text, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return reconcile_statement(BytesIO(text.encode('utf-8')), **kwargs)
+
+    def test_matches_by_reference_then_amount(self):
+        by_reference = make_payment(self.owner, reference_number='QX81', amount=Decimal('500.00'),
+                                    due_date=date(2025, 3, 1))
+        near = make_payment(self.owner, amount=Decimal('750.00'), due_date=date(2025, 3, 4))
+        far = make_payment(self.owner, amount=Decimal('750.00'), due_date=date(2025, 3, 20))
+        report = self.reconcile(
+            'Date,Details,Paid In\n'
+            '2025-03-02,Payment ref qx81,500.00\n'
+            '03/03/2025,Transfer,"750.00"\n'
+            '2025-03-03,Withdrawal,-20.00\n'
+            '2025-03-03,Transfer,999.00\n'
+            'yesterday,Transfer,1.00\n'
+        )
+        self.assertEqual((report['lines'], report['matched'], report['unmatched'], report['ignored']), (5, 2, 1, 1))
+        self.assertEqual(report['errors'][0]['line'], 6)
+
+        for payment in [by_reference, near, far]:
+            payment.refresh_from_db()
+        self.assertEqual((by_reference.status, by_reference.payment_date), ('completed', date(2025, 3, 2)))
+        self.assertEqual((near.status, far.status), ('completed', 'pending'))
+
+    def test_reports_statement_line_numbers(self):
+        make_payment(self.owner, amount=Decimal('100.00'), due_date=date(2025, 3, 1))
+        report = self.reconcile('date,amount\n\n2025-03-01,100\n\nsoon,5\n2025-03-02,7\n')
+        self.assertEqual(report['errors'], [{'line': 5, 'error': "Unrecognised date 'soon'"}])
+        self.assertEqual([item['line'] for item in report['unmatched_items']], [6])
+
+    def test_matches_are_written_once_per_chunk(self):
+        for day in range(1, 4):
+            make_payment(self.owner, amount=Decimal('100.00'), due_date=date(2025, 3, day))
+        with CaptureQueriesContext(connection) as queries:
+            report = self.reconcile('date,amount\n2025-03-01,100\n2025-03-02,100\n2025-03-03,100\n')
+        self.assertEqual(report['matched'], 3)
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE "payments"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Payment.objects.filter(status='completed').count(), 3)
+
+    def test_each_payment_is_matched_once(self):
+        make_payment(self.owner, amount=Decimal('100.00'), due_date=date(2025, 3, 1))
+        report = self.reconcile('date,amount\n2025-03-01,100\n2025-03-01,100\n')
+        self.assertEqual((report['matched'], report['unmatched']), (1, 1))
+
+    def test_reference_with_wrong_amount_is_reported(self):
+        make_payment(self.owner, reference_number='QX81', amount=Decimal('500.00'))
+        report = self.reconcile('date,amount,reference\n2025-03-01,400,QX81\n')
+        self.assertIn('different amount', report['unmatched_items'][0]['reason'])
+
+    def test_ofx_statement(self):
+        payment = make_payment(self.owner, amount=Decimal('250.00'), due_date=date(2025, 3, 1))
+        report = self.reconcile(
+            '<OFX><STMTTRN><DTPOSTED>20250301120000<TRNAMT>250.00<FITID>ABC1<NAME>Rent</STMTTRN></OFX>',
+            filename='march.ofx',
+        )
+        self.assertEqual(report['matched'], 1)
+        payment.refresh_from_db()
+        self.assertEqual((payment.status, payment.reference_number), ('completed', 'ABC1'))
+        # The statement reference is searchable once the match is written
+        self.assertEqual(list(search.search(Payment.objects.all(), 'ABC1', user=self.owner)), [payment])
+
+    def test_dry_run_and_side_effects(self):
+        tenant = make_tenant(self.owner)
+        payment = make_payment(self.owner, tenant=tenant, amount=Decimal('300.00'), due_date=date(2025, 3, 1))
+        statement = 'date,amount\n2025-03-01,300\n'
+        client = api_client(self.owner)
+        self.assertEqual(client.get('/api/payments/stats/').data['pending_payments'], 1)
+        self.assertEqual(self.reconcile(statement, dry_run=True)['matched'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+        self.reconcile(statement)
+        self.assertEqual(client.get('/api/payments/stats/').data['completed_payments'], 1)
+        self.assertEqual(PaymentRollup.find_drift(), [])
+        self.assertEqual(TenantBalance.objects.get(tenant=tenant).balance, Decimal('0.00'))
+        self.assertTrue(Receipt.objects.filter(payment=payment).exists())
+
+    def test_missing_columns(self):
+        with self.assertRaises(StatementFormatError):
+            self.reconcile('when,what\n2025-03-01,1\n')
+
+    def test_endpoint_is_owner_scoped(self):
+        make_payment(make_owner(), amount=Decimal('300.00'), due_date=date(2025, 3, 1))
+        client = api_client(self.owner)
+        response = client.post('/api/payments/reconcile/', 'date,amount\n2025-03-01,300\n', content_type='text/csv')
+        self.assertEqual((response.data['matched'], response.data['unmatched']), (0, 1))
+        self.assertEqual(client.post('/api/payments/reconcile/?window=x', '', content_type='text/csv').status_code, 400)
+
+    def test_endpoint_requires_an_owner(self):
+        payment = make_payment(self.owner, amount=Decimal('300.00'), due_date=date(2025, 3, 1))
+        response = api_client().post('/api/payments/reconcile/', 'date,amount\n2025-03-01,300\n', content_type='text/csv')
+        self.assertIn(response.status_code, (401, 403))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.tenant = make_tenant(self.owner)
+
+    def balance(self, tenant=None):
+        row = TenantBalance.objects.get(tenant=tenant or self.tenant)
+        return row.balance, row.total_charged, row.total_paid
+
+    def pay(self, amount, **fields):
+        return make_payment(self.owner, tenant=self.tenant, amount=Decimal(amount), **fields)
+
+    def test_charge_then_payment(self):
+        payment = self.pay('1000.00')
+        self.assertEqual(self.balance(), (Decimal('1000.00'), Decimal('1000.00'), Decimal('0.00')))
+        payment.status = 'completed'
+        payment.save()
+        self.assertEqual(self.balance(), (Decimal('0.00'), Decimal('1000.00'), Decimal('1000.00')))
+        self.assertEqual(
+            sorted(LedgerEntry.objects.values_list('entry_type', 'amount')),
+            [('charge', Decimal('1000.00')), ('payment', Decimal('-1000.00'))],
+        )
+
+    def test_cancel_delete_and_reassign(self):
+        cancelled = self.pay('200.00')
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        self.assertFalse(LedgerEntry.objects.filter(payment=cancelled).exists())
+
+        deleted = self.pay('300.00')
+        deleted.delete()
+        self.assertEqual(self.balance()[0], Decimal('0.00'))
+
+        other = make_tenant(self.owner)
+        moved = self.pay('400.00')
+        moved.tenant = other
+        moved.save()
+        self.assertEqual(self.balance()[0], Decimal('0.00'))
+        self.assertEqual(self.balance(other)[0], Decimal('400.00'))
+
+    def test_running_balance_in_date_order(self):
+        self.pay('100.00', due_date=date(2025, 3, 1))
+        self.pay('50.00', due_date=date(2025, 1, 1), status='completed', payment_date=date(2025, 1, 5))
+        other = make_tenant(self.owner)
+        make_payment(self.owner, tenant=other, amount=Decimal('999.00'))
+
+        rows = ledger.running_balance(LedgerEntry.objects.filter(tenant=self.tenant))
+        self.assertEqual(
+            [(row.entry_date, row.running_balance) for row in rows],
+            [(date(2025, 1, 1), Decimal('50.00')), (date(2025, 1, 5), Decimal('0.00')),
+             (date(2025, 3, 1), Decimal('100.00'))],
+        )
+
+    def test_rebuild_repairs_balances(self):
+        self.pay('100.00')
+        self.pay('50.00', status='completed')
+        expected = self.balance()
+        TenantBalance.objects.update(balance=0, total_charged=0, total_paid=0)
+        LedgerEntry.objects.filter(entry_type='payment').delete()
+
+        call_command('rebuild_ledger', stdout=StringIO())
+        self.assertEqual(self.balance(), expected)
@@ -1,24 +1,56 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from django.db.models import Q, Sum
-from django.db import connection
 from datetime import date
-from .models import Payment
+from django.http import Http404
+from .models import Payment, PaymentRollup, Receipt
 from .serializers import PaymentSerializer
+from . import analytics, receipts
+from .imports import import_payments, ImportFormatError
+from .rent_roll import generate_rent_roll
+from .reconciliation import reconcile_statement, StatementFormatError, DEFAULT_WINDOW_DAYS
 from tenants.models import Tenant
+from core import search
+from core.stats import empty_stats, get_stats
+from core.mixins import ExportMixin, OwnerScopedMixin, RelatedFieldsMixin
+from core.http import serve_artifact
 import logging
 
 logger = logging.getLogger(__name__)
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(OwnerScopedMixin, RelatedFieldsMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [AllowAny]
+    # PaymentSerializer reads tenant.full_name/tenant_id and unit.name/unit_id
+    select_related_fields = ['tenant', 'unit']
+    export_filename = 'payments'
+    export_fields = [
+        ('payment_id', 'payment_id'),
+        ('tenant_id', 'tenant__tenant_id'),
+        ('tenant_first_name', 'tenant__first_name'),
+        ('tenant_last_name', 'tenant__last_name'),
+        ('unit_id', 'unit__unit_id'),
+        ('payment_type', 'payment_type'),
+        ('amount', 'amount'),
+        ('late_fee_amount', 'late_fee_amount'),
+        ('payment_method', 'payment_method'),
+        ('status', 'status'),
+        ('payment_date', 'payment_date'),
+        ('due_date', 'due_date'),
+        ('period_start', 'period_start'),
+        ('period_end', 'period_end'),
+        ('reference_number', 'reference_number'),
+        ('receipt_number', 'receipt_number'),
+        ('description', 'description'),
+        ('created_at', 'created_at'),
+    ]
 
     def get_queryset(self):
         try:
-            return Payment.objects.all()
+            return self.with_related(self.for_request_owner(Payment.objects.all()))
         except Exception as e:
             logger.error(f"Error getting payments queryset: {e}")
             return Payment.objects.none()
@@ -27,80 +59,229 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def stats(self, request):
         """Get payment statistics"""
         try:
-            # Check if table exists
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='payments_payment';
-                """)
-                if not cursor.fetchone():
-                    logger.warning("Payments table does not exist")
-                    return Response({
-                        'total_payments': 0,
-                        'completed_payments': 0,
-                        'pending_payments': 0,
-                        'failed_payments': 0,
-                        'overdue_payments': 0,
-                        'total_amount': 0,
-                        'pending_amount': 0,
-                        'overdue_amount': 0,
-                        'this_month_amount': 0,
-                    })
-
-            queryset = self.get_queryset()
-            
-            total_amount = queryset.filter(status='completed').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            pending_amount = queryset.filter(status='pending').aggregate(
-                total=Sum('amount')
-            )['total'] or 0
-            
-            overdue_amount = queryset.filter(
-                status='pending',
-                due_date__lt=date.today()
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
-            stats = {
-                'total_payments': queryset.count(),
-                'completed_payments': queryset.filter(status='completed').count(),
-                'pending_payments': queryset.filter(status='pending').count(),
-                'failed_payments': queryset.filter(status='failed').count(),
-                'overdue_payments': queryset.filter(
-                    status='pending',
-                    due_date__lt=date.today()
-                ).count(),
-                'total_amount': float(total_amount),
-                'pending_amount': float(pending_amount),
-                'overdue_amount': float(overdue_amount),
-                'this_month_amount': float(total_amount),  # Simplified
-            }
-            return Response(stats)
+            return Response(get_stats('payments', self.for_request_owner(PaymentRollup.objects.all()), request.user))
         except Exception as e:
             logger.error(f"Error in payment stats: {e}")
-            return Response({
-                'total_payments': 0,
-                'completed_payments': 0,
-                'pending_payments': 0,
-                'failed_payments': 0,
-                'overdue_payments': 0,
-                'total_amount': 0,
-                'pending_amount': 0,
-                'overdue_amount': 0,
-                'this_month_amount': 0,
-            })
+            return Response(empty_stats('payments'))
 
     @action(detail=False, methods=['get'])
     def monthly_stats(self, request):
-        """Get monthly payment statistics"""
+        """Get collected, pending and overdue totals per period
+
+        Query params: ``from``/``to`` (YYYY-MM-DD), ``granularity``
+        (day/week/month/year), ``date_field`` (payment_date/due_date) and
+        ``group_by`` (comma separated: payment_type, payment_method, unit).
+        """
         try:
-            # Return empty array for now
-            return Response([])
+            granularity = request.GET.get('granularity', 'month')
+            date_field = request.GET.get('date_field', 'payment_date')
+            group_by = [g for g in request.GET.get('group_by', '').split(',') if g]
+
+            if granularity not in analytics.GRANULARITIES:
+                return Response(
+                    {'error': f"granularity must be one of: {', '.join(analytics.GRANULARITIES)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if date_field not in analytics.DATE_FIELDS:
+                return Response(
+                    {'error': f"date_field must be one of: {', '.join(analytics.DATE_FIELDS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            unknown = [g for g in group_by if g not in analytics.DIMENSIONS]
+            if unknown:
+                return Response(
+                    {'error': f"Unknown group_by dimension(s): {', '.join(unknown)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else date.today()
+                if request.GET.get('from'):
+                    start = date.fromisoformat(request.GET['from'])
+                else:
+                    # Default to the trailing twelve months, including this one
+                    months = end.year * 12 + end.month - 1 - 11
+                    start = date(months // 12, months % 12 + 1, 1)
+            except ValueError:
+                return Response(
+                    {'error': 'from and to must be dates in YYYY-MM-DD format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if start > end:
+                return Response(
+                    {'error': 'from must not be after to'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            owner_key = getattr(request.user, 'pk', None) or 'anonymous'
+            results = analytics.cached_payment_time_series(
+                owner_key,
+                self.get_queryset(),
+                start,
+                end,
+                granularity=granularity,
+                date_field=date_field,
+                group_by=group_by,
+            )
+            return Response(results)
         except Exception as e:
             logger.error(f"Error in monthly stats: {e}")
             return Response([])
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Import payments from a CSV or NDJSON request body
+
+        Rows are validated and written in chunks; the response reports how many
+        rows were created and the validation errors for each rejected row.
+        """
+        try:
+            stream = request.stream
+            if stream is None:
+                return Response(
+                    {'error': 'Request body is empty'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            report = import_payments(stream, request.content_type, user=request.user)
+            return Response(report)
+        except ImportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        except Exception as e:
+            logger.error(f"Error in bulk payment import: {e}")
+            return Response(
+                {'error': 'Failed to import payments'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=True, methods=['get'])
+    def receipt(self, request, pk=None):
+        """Serve the rendered receipt artifact with ETag and Range support"""
+        try:
+            payment = self.get_object()
+            receipt_obj = Receipt.objects.filter(payment=payment).first()
+            path = receipts.artifact_path(receipt_obj.artifact_sha256) if receipt_obj and receipt_obj.artifact_sha256 else None
+            if path is None or not path.exists():
+                if payment.status != 'completed':
+                    return Response(
+                        {'error': 'Receipts are only issued for completed payments'},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+                receipts.enqueue([payment.pk])
+                return Response({'status': 'pending'}, status=status.HTTP_202_ACCEPTED)
+            return serve_artifact(request, path, receipt_obj.artifact_sha256, receipts.ARTIFACT_CONTENT_TYPE)
+        except Http404:
+            raise
+        except Exception as e:
+            logger.error(f"Error serving receipt: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='receipts/batch')
+    def render_receipts(self, request):
+        """Render receipts for every completed payment in a month (``month=YYYY-MM``)"""
+        try:
+            month = request.data.get('month') or request.GET.get('month', '')
+            try:
+                year, month_number = [int(part) for part in month.split('-')]
+                date(year, month_number, 1)
+            except ValueError:
+                return Response(
+                    {'error': 'month must be in YYYY-MM format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            rendered = receipts.render_month(year, month_number, queryset=self.get_queryset())
+            return Response({'month': month, 'rendered': rendered})
+        except Exception as e:
+            logger.error(f"Error rendering receipts: {e}")
+            return Response(
+                {'error': 'Failed to render receipts'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['post'], url_path='rent-roll', permission_classes=[IsAuthenticated])
+    def rent_roll(self, request):
+        """Bill the owner's active tenants for a month (``month=YYYY-MM``, ``due_day``, ``dry_run``)
+
+        Re-running for the same month only bills tenants that were not billed yet.
+        """
+        try:
+            month = request.data.get('month') or request.GET.get('month', '')
+            try:
+                year, month_number = [int(part) for part in month.split('-')]
+                date(year, month_number, 1)
+            except ValueError:
+                return Response(
+                    {'error': 'month must be in YYYY-MM format'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            try:
+                due_day = int(request.data.get('due_day', 1))
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'due_day must be a number'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+            summary = generate_rent_roll(year, month_number, request.user, due_day=due_day, dry_run=dry_run)
+            return Response(summary, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+        except Exception as e:
+            logger.error(f"Error generating rent roll: {e}")
+            return Response(
+                {'error': 'Failed to generate rent roll'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def reconcile(self, request):
+        """Match an uploaded statement (CSV or OFX) against pending payments
+
+        Send the file as multipart ``file`` or as the raw request body. Matched
+        payments are marked completed; the response lists the unmatched lines.
+        """
+        try:
+            try:
+                window_days = int(request.GET.get('window', DEFAULT_WINDOW_DAYS))
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': 'window must be a number of days'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            dry_run = request.GET.get('dry_run', '').lower() in ('1', 'true', 'yes')
+            queryset = self.get_queryset()
+
+            if request.content_type.startswith('multipart/'):
+                upload = request.FILES.get('file')
+                if upload is None:
+                    return Response(
+                        {'error': 'No statement file uploaded'},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                stream, content_type, filename = upload, upload.content_type, upload.name
+            else:
+                stream, content_type, filename = request.stream, request.content_type, ''
+            if stream is None:
+                return Response(
+                    {'error': 'Request body is empty'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            report = reconcile_statement(
+                stream,
+                queryset=queryset,
+                content_type=content_type,
+                filename=filename,
+                window_days=window_days,
+                dry_run=dry_run,
+            )
+            return Response(report)
+        except StatementFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error reconciling statement: {e}")
+            return Response(
+                {'error': 'Failed to reconcile statement'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
     @action(detail=False, methods=['get'])
     def search(self, request):
         """Search payments"""
@@ -110,13 +291,6 @@ class PaymentViewSet(viewsets.ModelViewSet):
             
             queryset = self.get_queryset()
             
-            if query:
-                queryset = queryset.filter(
-                    Q(payment_id__icontains=query) |
-                    Q(reference_number__icontains=query) |
-                    Q(description__icontains=query)
-                )
-            
             if status_filter and status_filter != 'All':
                 if status_filter == 'Overdue':
                     queryset = queryset.filter(
@@ -126,8 +300,17 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 else:
                     queryset = queryset.filter(status=status_filter.lower())
             
+            if query:
+                queryset = search.search(queryset, query, user=request.user)
+            
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error in payment search: {e}")
             return Response([])
@@ -136,6 +319,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
         """Override list to handle errors gracefully"""
         try:
             return super().list(request, *args, **kwargs)
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error listing payments: {e}")
             return Response([])
@@ -144,7 +329,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def tenant_units(self, request):
         """Get tenants and their units for payment creation"""
         try:
-            tenants = Tenant.objects.filter(
+            tenants = self.for_request_owner(Tenant.objects.all()).filter(
                 status='Active',
                 current_unit__isnull=False
             ).select_related('current_unit')
@@ -0,0 +1,19 @@
+"""
+ASGI config for rental_backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn rental_backend.asgi:application``)
+to keep the server-sent event streams under ``/api/events/`` open without
+tying up a worker per connection.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'rental_backend.settings')
+
+application = get_asgi_application()
@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'corsheaders',
+    'core',
     'users',
     'units',
     'tenants',
@@ -71,7 +72,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'users.middleware.FirebaseAuthMiddleware',
+    'users.middleware.FirebaseAuthenticationMiddleware',
+    # After authentication so keys are scoped per user
+    'core.middleware.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'rental_backend.urls'
@@ -93,6 +96,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'rental_backend.wsgi.application'
+ASGI_APPLICATION = 'rental_backend.asgi.application'
 
 
 # Database
@@ -173,6 +177,11 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
+    'idempotency-key',
+]
+
+CORS_EXPOSE_HEADERS = [
+    'idempotent-replayed',
 ]
 
 # REST Framework settings
@@ -187,12 +196,65 @@ REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.PageNumberOrKeysetPagination',
     'PAGE_SIZE': 20
 }
 
+# Human-readable ID sequences (see core/sequences.py). Values above 1 reserve
+# numbers in blocks per worker process at the cost of gaps between workers.
+SEQUENCE_BLOCK_SIZE = int(os.environ.get('SEQUENCE_BLOCK_SIZE', '1'))
+
+# Receipt artifacts (see payments/receipts.py). RECEIPT_WORKERS=0 renders
+# synchronously after commit instead of on a background thread pool.
+RECEIPTS_ROOT = Path(os.environ.get('RECEIPTS_ROOT', BASE_DIR / 'receipts'))
+RECEIPT_WORKERS = int(os.environ.get('RECEIPT_WORKERS', '2'))
+
+# Late fees (see payments/late_fees.py): charged as a percentage of the
+# payment amount once a pending payment is more than LATE_FEE_GRACE_DAYS late
+LATE_FEE_GRACE_DAYS = int(os.environ.get('LATE_FEE_GRACE_DAYS', '5'))
+LATE_FEE_PERCENT = os.environ.get('LATE_FEE_PERCENT', '5')
+
+# Idempotency-Key handling (see core/idempotency.py): stored responses are
+# kept for IDEMPOTENCY_TTL seconds; a retry arriving while the first request
+# is still running waits up to IDEMPOTENCY_WAIT_SECONDS for its response
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL', str(24 * 60 * 60)))
+IDEMPOTENCY_WAIT_SECONDS = int(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+
+# Dashboard stats (see core/stats.py) are cached per owner for this many
+# seconds and dropped on writes to the underlying models
+STATS_CACHE_TIMEOUT = int(os.environ.get('STATS_CACHE_TIMEOUT', '60'))
+
+# Delta-sync feed (see core/changes.py): /api/changes/ returns at most
+# CHANGES_PAGE_SIZE log entries per call; entries older than
+# CHANGE_LOG_RETENTION_DAYS are removed by prune_change_log
+CHANGES_PAGE_SIZE = int(os.environ.get('CHANGES_PAGE_SIZE', '500'))
+CHANGE_LOG_RETENTION_DAYS = int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', '30'))
+
+# Live stats over server-sent events (see core/events.py). EVENTS_BROKER is
+# "local" for a single process or "change_log" to pick up changes made by
+# other workers; bursts are coalesced for EVENTS_COALESCE_SECONDS
+EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'local')
+EVENTS_COALESCE_SECONDS = float(os.environ.get('EVENTS_COALESCE_SECONDS', '1.0'))
+EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS', '15'))
+EVENTS_MAX_STREAM_SECONDS = int(os.environ.get('EVENTS_MAX_STREAM_SECONDS', '300'))
+EVENTS_POLL_SECONDS = float(os.environ.get('EVENTS_POLL_SECONDS', '2.0'))
+
+# POST /api/batch/ (see core/batch.py): sub-requests per batch, and threads
+# used for consecutive reads when the batch asks for concurrency
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '20'))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '4'))
+
+# Typeahead (see core/suggest.py): results per suggest call by default, and at most
+SUGGEST_LIMIT = int(os.environ.get('SUGGEST_LIMIT', '10'))
+SUGGEST_MAX_LIMIT = int(os.environ.get('SUGGEST_MAX_LIMIT', '50'))
+
 # Firebase settings
 FIREBASE_CREDENTIALS_PATH = os.environ.get('FIREBASE_CREDENTIALS_PATH')
+# Verified ID tokens are cached in-process (up to FIREBASE_TOKEN_CACHE_SIZE
+# tokens, each until it expires) and resolved users for FIREBASE_USER_CACHE_TTL
+# seconds (see users/token_cache.py)
+FIREBASE_TOKEN_CACHE_SIZE = int(os.environ.get('FIREBASE_TOKEN_CACHE_SIZE', '1024'))
+FIREBASE_USER_CACHE_TTL = int(os.environ.get('FIREBASE_USER_CACHE_TTL', '60'))
 
 # Security settings for production
 if not DEBUG:
@@ -32,7 +32,8 @@ def api_health_check(request):
             '/api/units/',
             '/api/tenants/',
             '/api/payments/',
-            '/api/damage-reports/'
+            '/api/damage-reports/',
+            '/api/changes/'
         ]
     })
 
@@ -45,4 +46,5 @@ urlpatterns = [
     path('api/', include('tenants.urls')),
     path('api/', include('payments.urls')),
     path('api/', include('damage_reports.urls')),
+    path('api/', include('core.urls')),
 ]
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Tenant, TenantHistory
+from .models import LeaseReminder, Tenant, TenantHistory
 
 
 @admin.register(Tenant)
@@ -52,3 +52,17 @@ class TenantHistoryAdmin(admin.ModelAdmin):
         if request.user.is_superuser:
             return qs
         return qs.filter(owner=request.user)
+
+
+@admin.register(LeaseReminder)
+class LeaseReminderAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'lease_end_date', 'window_days', 'owner', 'created_at']
+    list_filter = ['window_days', 'owner']
+    search_fields = ['tenant__first_name', 'tenant__last_name', 'tenant__tenant_id']
+    readonly_fields = ['created_at']
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(owner=request.user)
@@ -0,0 +1,107 @@
+"""
+Keep ``Unit.tenant_name``/``tenant_phone``/``tenant_email`` in step with the
+unit's current tenant.
+
+``sync_unit_contact`` runs after every tenant save that may have touched a
+contact field and copies the values to the tenant's current unit with one
+``UPDATE`` that only matches when they differ. ``repair`` walks all units
+in primary key ranges and, per range, finds every unit whose copy disagrees
+with its occupant (or that still names a tenant after being vacated) and
+rewrites it from correlated subqueries, without loading the units.
+
+Both paths write with queryset updates, so the search index and change log
+entries for the touched units are refreshed explicitly.
+"""
+from django.db.models import CharField, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat
+from django.utils import timezone
+from core import changes, search
+from units.models import Unit
+from .models import Tenant
+
+# Unit column -> tenant attribute it mirrors
+CONTACT_FIELDS = {
+    'tenant_name': 'full_name',
+    'tenant_phone': 'phone',
+    'tenant_email': 'email',
+}
+
+# Tenant columns whose change must reach the unit
+TENANT_SOURCE_FIELDS = {'first_name', 'last_name', 'phone', 'email', 'current_unit'}
+
+BATCH_SIZE = 1000
+
+
+def _refresh_derived(unit_ids):
+    """Re-index and log units rewritten by a queryset update"""
+    units = list(Unit.objects.filter(pk__in=unit_ids))
+    search.index_objects(units)
+    changes.record(units, changes.UPDATED)
+
+
+def sync_unit_contact(tenant):
+    """Copy the tenant's contact details to their current unit; returns rows updated"""
+    if not tenant.current_unit_id:
+        return 0
+    values = {field: getattr(tenant, attribute) for field, attribute in CONTACT_FIELDS.items()}
+    stale = ~Q(**{field: value for field, value in values.items()})
+    updated = Unit.objects.filter(stale, pk=tenant.current_unit_id).update(updated_at=timezone.now(), **values)
+    if updated:
+        _refresh_derived([tenant.current_unit_id])
+    return updated
+
+
+def _expected():
+    """Correlated subqueries giving each unit's expected contact columns"""
+    occupants = Tenant.objects.filter(current_unit=OuterRef('pk')).order_by('-updated_at', '-id')
+    full_name = Concat('first_name', Value(' '), 'last_name', output_field=CharField())
+    return {
+        'tenant_name': Coalesce(Subquery(occupants.annotate(full=full_name).values('full')[:1]), Value('')),
+        'tenant_phone': Coalesce(Subquery(occupants.values('phone')[:1]), Value('')),
+        'tenant_email': Coalesce(Subquery(occupants.values('email')[:1]), Value('')),
+    }
+
+
+def repair(batch_size=BATCH_SIZE, dry_run=False):
+    """Find and fix units whose contact columns disagree with their occupant
+
+    Returns counts: ``checked`` units, ``mismatched`` units, of which
+    ``refreshed`` had a current tenant and ``cleared`` had none, and
+    ``fixed`` (zero for a dry run).
+    """
+    report = {'checked': 0, 'mismatched': 0, 'refreshed': 0, 'cleared': 0, 'fixed': 0, 'dry_run': dry_run}
+    bounds = Unit.objects.order_by('pk').values_list('pk', flat=True)
+    last_pk = 0
+    while True:
+        batch_end = bounds.filter(pk__gt=last_pk)[batch_size - 1:batch_size].first()
+        batch = Unit.objects.filter(pk__gt=last_pk)
+        if batch_end is not None:
+            batch = batch.filter(pk__lte=batch_end)
+        report['checked'] += batch.count()
+
+        expected = {f'expected_{field}': expression for field, expression in _expected().items()}
+        mismatched = list(
+            batch.annotate(
+                has_tenant=Exists(Tenant.objects.filter(current_unit=OuterRef('pk'))),
+                **expected,
+            ).exclude(
+                tenant_name=F('expected_tenant_name'),
+                tenant_phone=F('expected_tenant_phone'),
+                tenant_email=F('expected_tenant_email'),
+            ).values_list('pk', 'has_tenant')
+        )
+        if mismatched:
+            unit_ids = [pk for pk, _ in mismatched]
+            report['mismatched'] += len(unit_ids)
+            report['refreshed'] += sum(1 for _, has_tenant in mismatched if has_tenant)
+            report['cleared'] += sum(1 for _, has_tenant in mismatched if not has_tenant)
+            if not dry_run:
+                report['fixed'] += Unit.objects.filter(pk__in=unit_ids).update(
+                    updated_at=timezone.now(), **_expected()
+                )
+                _refresh_derived(unit_ids)
+
+        if batch_end is None:
+            break
+        last_pk = batch_end
+    return report
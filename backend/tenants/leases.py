@@ -0,0 +1,153 @@
+"""
+Upcoming lease expiries and renewal reminders.
+
+Both read active tenants through the partial index on
+``(owner, lease_end_date) WHERE status = 'Active'``:
+
+* ``expiry_buckets`` counts an owner's expiries per window (already
+  expired, 0-30, 31-60 and 61-90 days out) with one conditional
+  aggregate over a single index range
+* ``create_renewal_reminders`` (``manage.py send_lease_reminders``) walks
+  the index once for every owner in ``(owner, lease_end_date)`` order and
+  bulk-creates one ``LeaseReminder`` per lease and window. The unique
+  constraint on ``(tenant, lease_end_date, window_days)`` makes reruns
+  harmless.
+"""
+from datetime import date, timedelta
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import LeaseReminder, Tenant
+
+# Expiry windows in days; a lease falls in the first window that contains it
+WINDOWS = (30, 60, 90)
+
+BATCH_SIZE = 1000
+
+
+def window_for(days_left):
+    """The smallest window containing ``days_left``, or None beyond the last"""
+    for window in WINDOWS:
+        if 0 <= days_left <= window:
+            return window
+    return None
+
+
+def window_bounds(as_of):
+    """``(window, first_date, last_date)`` for each window as of ``as_of``"""
+    bounds = []
+    start = 0
+    for window in WINDOWS:
+        bounds.append((window, as_of + timedelta(days=start), as_of + timedelta(days=window)))
+        start = window + 1
+    return bounds
+
+
+def upcoming(queryset, as_of=None):
+    """Active tenants of ``queryset`` whose lease ends on or before the last window"""
+    as_of = as_of or date.today()
+    return queryset.filter(
+        status='Active',
+        lease_end_date__isnull=False,
+        lease_end_date__lte=as_of + timedelta(days=WINDOWS[-1]),
+    )
+
+
+def expiry_buckets(queryset, as_of=None):
+    """Count and monthly rent of expiring leases per window, in one query"""
+    as_of = as_of or date.today()
+    zero = Value(0, output_field=DecimalField(max_digits=12, decimal_places=2))
+    buckets = [('expired', Q(lease_end_date__lt=as_of))]
+    buckets += [
+        (f'within_{window}', Q(lease_end_date__gte=first, lease_end_date__lte=last))
+        for window, first, last in window_bounds(as_of)
+    ]
+    aggregates = {}
+    for name, condition in buckets:
+        aggregates[f'{name}_count'] = Count('id', filter=condition)
+        aggregates[f'{name}_rent'] = Coalesce(Sum('monthly_rent', filter=condition), zero)
+    values = upcoming(queryset, as_of).aggregate(**aggregates)
+    return {
+        'as_of': as_of.isoformat(),
+        'buckets': [
+            {
+                'bucket': name,
+                'count': values[f'{name}_count'],
+                'monthly_rent': float(values[f'{name}_rent']),
+            }
+            for name, _ in buckets
+        ],
+    }
+
+
+def bucket_queryset(queryset, bucket, as_of=None):
+    """Tenants in one bucket (``expired`` or a window length), soonest first"""
+    as_of = as_of or date.today()
+    tenants = upcoming(queryset, as_of)
+    if bucket == 'expired':
+        tenants = tenants.filter(lease_end_date__lt=as_of)
+    else:
+        for window, first, last in window_bounds(as_of):
+            if str(window) == str(bucket):
+                tenants = tenants.filter(lease_end_date__gte=first, lease_end_date__lte=last)
+                break
+        else:
+            raise ValueError(f"bucket must be 'expired' or one of: {', '.join(str(w) for w in WINDOWS)}")
+    return tenants.order_by('lease_end_date', 'id')
+
+
+def _message(tenant, unit_id, days_left):
+    unit = f" in unit {unit_id}" if unit_id else ''
+    return (
+        f"Lease for {tenant['first_name']} {tenant['last_name']}{unit} ends on "
+        f"{tenant['lease_end_date'].isoformat()} ({days_left} days). Consider offering a renewal."
+    )
+
+
+def create_renewal_reminders(as_of=None, dry_run=False):
+    """Create reminders for every lease entering a window; returns counts
+
+    ``created`` counts reminders that were new (would be new, for a dry run).
+    """
+    as_of = as_of or date.today()
+    report = {'as_of': as_of.isoformat(), 'leases': 0, 'created': 0, 'dry_run': dry_run}
+    rows = upcoming(Tenant.objects.all(), as_of).filter(
+        lease_end_date__gte=as_of,
+    ).order_by('owner', 'lease_end_date').values(
+        'id', 'owner_id', 'first_name', 'last_name', 'lease_end_date', 'current_unit__unit_id',
+    )
+
+    def flush(batch):
+        """Insert the reminders of ``batch`` not raised yet; returns how many"""
+        if not batch:
+            return 0
+        existing = set(LeaseReminder.objects.filter(
+            tenant_id__in={reminder.tenant_id for reminder in batch},
+        ).values_list('tenant_id', 'lease_end_date', 'window_days'))
+        new = [
+            reminder for reminder in batch
+            if (reminder.tenant_id, reminder.lease_end_date, reminder.window_days) not in existing
+        ]
+        if new and not dry_run:
+            # ignore_conflicts covers a concurrent run inserting the same reminder
+            LeaseReminder.objects.bulk_create(new, ignore_conflicts=True)
+        return len(new)
+
+    batch = []
+    for tenant in rows.iterator(chunk_size=BATCH_SIZE):
+        days_left = (tenant['lease_end_date'] - as_of).days
+        window = window_for(days_left)
+        if window is None:
+            continue
+        report['leases'] += 1
+        batch.append(LeaseReminder(
+            tenant_id=tenant['id'],
+            owner_id=tenant['owner_id'],
+            lease_end_date=tenant['lease_end_date'],
+            window_days=window,
+            message=_message(tenant, tenant['current_unit__unit_id'], days_left),
+        ))
+        if len(batch) >= BATCH_SIZE:
+            report['created'] += flush(batch)
+            batch = []
+    report['created'] += flush(batch)
+    return report
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from tenants import contact_sync
+
+
+class Command(BaseCommand):
+    help = "Find and fix units whose tenant name, phone or email disagree with the unit's current tenant"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=contact_sync.BATCH_SIZE,
+            help='Units checked per set-based batch',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report mismatches without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        report = contact_sync.repair(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        self.stdout.write(
+            f"Checked {report['checked']} unit(s): {report['mismatched']} mismatched "
+            f"({report['refreshed']} to refresh from their tenant, {report['cleared']} to clear)"
+        )
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: no units were changed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {report['fixed']} unit(s)"))
@@ -0,0 +1,33 @@
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from tenants.leases import create_renewal_reminders
+
+
+class Command(BaseCommand):
+    help = 'Create renewal reminders for active leases ending within 30/60/90 days (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help='Run as of this date (YYYY-MM-DD) instead of today',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many reminders would be created without creating them',
+        )
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options.get('date'):
+            try:
+                as_of = datetime.strptime(options['date'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--date must be in YYYY-MM-DD format')
+
+        report = create_renewal_reminders(as_of=as_of, dry_run=options['dry_run'])
+        self.stdout.write(f"{report['leases']} lease(s) expiring within the reminder windows as of {report['as_of']}")
+        if report['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry run: {report['created']} reminder(s) would be created"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Created {report['created']} reminder(s)"))
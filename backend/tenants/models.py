@@ -1,6 +1,10 @@
 from django.db import models
+from django.db.models import F
 from users.models import CustomUser
 from units.models import Unit
+from core.managers import OwnedManager
+from core.sequences import next_identifier
+from core.suggest import PrefixKey
 
 
 class Tenant(models.Model):
@@ -59,9 +63,27 @@ class Tenant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OwnedManager()
+    
     class Meta:
         db_table = 'tenants'
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination over Meta.ordering (see core.pagination)
+            models.Index(fields=['-created_at', '-id'], name='tenants_keyset_idx'),
+            models.Index(fields=['owner', '-created_at', '-id'], name='tenants_owner_keyset_idx'),
+            models.Index(fields=['owner', 'status'], name='tenants_owner_status_idx'),
+            # Case-insensitive prefix lookups (see core.suggest)
+            models.Index(F('owner'), PrefixKey('tenant_id'), name='tenants_owner_tid_upper_idx'),
+            models.Index(F('owner'), PrefixKey('first_name'), name='tenants_owner_first_upper_idx'),
+            models.Index(F('owner'), PrefixKey('last_name'), name='tenants_owner_last_upper_idx'),
+            # Upcoming lease expiries (see tenants.leases)
+            models.Index(
+                fields=['owner', 'lease_end_date'],
+                name='tenants_owner_lease_end_idx',
+                condition=models.Q(status='Active'),
+            ),
+        ]
         
     def __str__(self):
         return f"{self.tenant_id} - {self.first_name} {self.last_name}"
@@ -73,12 +95,7 @@ class Tenant(models.Model):
     def save(self, *args, **kwargs):
         if not self.tenant_id:
             # Generate tenant ID: TNT-YYYY-XXX
-            from datetime import datetime
-            year = datetime.now().year
-            count = Tenant.objects.filter(
-                tenant_id__startswith=f'TNT-{year}-'
-            ).count() + 1
-            self.tenant_id = f'TNT-{year}-{count:03d}'
+            self.tenant_id = next_identifier('TNT', Tenant, 'tenant_id', width=3)
         super().save(*args, **kwargs)
 
 
@@ -99,9 +116,48 @@ class TenantHistory(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = OwnedManager()
+    
     class Meta:
         db_table = 'tenant_history'
         ordering = ['-move_in_date']
+        indexes = [
+            models.Index(fields=['owner', '-move_in_date'], name='tenant_history_owner_idx'),
+            models.Index(fields=['owner', 'unit', 'move_in_date'], name='tenant_history_owner_unit_idx'),
+        ]
         
     def __str__(self):
         return f"{self.tenant.full_name} - {self.unit.unit_id}"
+
+
+class LeaseReminder(models.Model):
+    """Renewal reminder raised when an active tenant's lease enters an expiry window"""
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='lease_reminders')
+    lease_end_date = models.DateField()
+    window_days = models.PositiveSmallIntegerField()
+    message = models.TextField()
+    
+    # Owner/Manager
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='lease_reminders')
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = OwnedManager()
+    
+    class Meta:
+        db_table = 'lease_reminders'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='lease_reminders_owner_idx'),
+        ]
+        constraints = [
+            # One reminder per lease per window, so scheduled runs can repeat safely
+            models.UniqueConstraint(
+                fields=['tenant', 'lease_end_date', 'window_days'],
+                name='unique_lease_reminder_per_window',
+            ),
+        ]
+        
+    def __str__(self):
+        return f"{self.tenant.full_name} - lease ends {self.lease_end_date} ({self.window_days} days)"
@@ -0,0 +1,133 @@
+"""
+Move-in / move-out workflow for tenants and units.
+
+Every move runs in one transaction that first locks the tenant and the units
+involved with ``select_for_update`` (units in primary key order, so two moves
+touching the same pair of units cannot deadlock). Occupancy is checked only
+after the lock is held: of two concurrent move-ins to one unit the second
+waits for the first to commit and then fails with ``MoveError`` instead of
+double-occupying the unit.
+
+Units and tenants are written with ``update_fields`` limited to the columns a
+move changes, and ``TenantHistory`` rows are closed and opened in the same
+transaction.
+"""
+from django.db import transaction
+from django.utils import timezone
+from units.models import Unit
+from .models import Tenant, TenantHistory
+
+UNIT_OCCUPANCY_FIELDS = ['status', 'tenant_name', 'tenant_phone', 'tenant_email', 'updated_at']
+
+
+class MoveError(Exception):
+    """Raised when a move is not possible in the current state"""
+
+
+def lock_units(*unit_ids):
+    """Lock the given units for the rest of the transaction and return them by pk"""
+    unit_ids = sorted({unit_id for unit_id in unit_ids if unit_id is not None})
+    if not unit_ids:
+        return {}
+    return {unit.pk: unit for unit in Unit.objects.select_for_update().filter(pk__in=unit_ids).order_by('pk')}
+
+
+def check_vacant(unit, tenant=None):
+    """Raise ``MoveError`` if ``unit`` (already locked) is occupied by anyone but ``tenant``"""
+    occupants = Tenant.objects.filter(current_unit_id=unit.pk)
+    if tenant is not None and tenant.pk is not None:
+        occupants = occupants.exclude(pk=tenant.pk)
+    if occupants.exists():
+        raise MoveError(f"Unit {unit.unit_id} is already occupied.")
+    if unit.status == 'Under Maintenance':
+        raise MoveError(f"Unit {unit.unit_id} is under maintenance.")
+
+
+def occupy_unit(unit, tenant):
+    unit.status = 'Occupied'
+    unit.tenant_name = tenant.full_name
+    unit.tenant_phone = tenant.phone
+    unit.tenant_email = tenant.email
+    unit.save(update_fields=UNIT_OCCUPANCY_FIELDS)
+
+
+def vacate_unit(unit):
+    unit.status = 'Vacant'
+    unit.tenant_name = ''
+    unit.tenant_phone = ''
+    unit.tenant_email = ''
+    unit.save(update_fields=UNIT_OCCUPANCY_FIELDS)
+
+
+def open_history(tenant, unit, move_in_date, monthly_rent=None, security_deposit=None):
+    return TenantHistory.objects.create(
+        tenant=tenant,
+        unit=unit,
+        move_in_date=move_in_date,
+        monthly_rent=monthly_rent or tenant.monthly_rent or unit.rent,
+        security_deposit=tenant.security_deposit if security_deposit is None else security_deposit,
+        owner_id=tenant.owner_id,
+    )
+
+
+def close_history(tenant, unit_id, move_out_date, reason=''):
+    """Close the tenant's open history rows for ``unit_id``; returns the number closed"""
+    return TenantHistory.objects.filter(
+        tenant=tenant, unit_id=unit_id, move_out_date__isnull=True,
+    ).update(move_out_date=move_out_date, move_out_reason=reason, updated_at=timezone.now())
+
+
+def move_in(tenant, unit, move_date, monthly_rent=None, security_deposit=None,
+            lease_start_date=None, lease_end_date=None):
+    """Move ``tenant`` into ``unit``, moving them out of their current unit first"""
+    with transaction.atomic():
+        tenant = Tenant.objects.select_for_update().get(pk=tenant.pk)
+        units = lock_units(tenant.current_unit_id, unit.pk)
+        unit = units[unit.pk]
+        if tenant.current_unit_id == unit.pk:
+            raise MoveError(f"Tenant already lives in unit {unit.unit_id}.")
+        check_vacant(unit, tenant)
+
+        if tenant.current_unit_id is not None:
+            previous = units[tenant.current_unit_id]
+            close_history(tenant, previous.pk, move_date, f"Moved to unit {unit.unit_id}")
+            vacate_unit(previous)
+
+        tenant.current_unit = unit
+        tenant.status = 'Active'
+        tenant.move_in_date = move_date
+        tenant.move_out_date = None
+        tenant.monthly_rent = monthly_rent or tenant.monthly_rent or unit.rent
+        changed = ['current_unit', 'status', 'move_in_date', 'move_out_date', 'monthly_rent', 'updated_at']
+        if security_deposit is not None:
+            tenant.security_deposit = security_deposit
+            changed.append('security_deposit')
+        if lease_start_date is not None:
+            tenant.lease_start_date = lease_start_date
+            changed.append('lease_start_date')
+        if lease_end_date is not None:
+            tenant.lease_end_date = lease_end_date
+            changed.append('lease_end_date')
+        tenant.save(update_fields=changed)
+
+        occupy_unit(unit, tenant)
+        open_history(tenant, unit, move_date, tenant.monthly_rent, security_deposit)
+    return tenant
+
+
+def move_out(tenant, move_date, reason=''):
+    """Move ``tenant`` out of their current unit"""
+    with transaction.atomic():
+        tenant = Tenant.objects.select_for_update().get(pk=tenant.pk)
+        if tenant.current_unit_id is None:
+            raise MoveError("Tenant is not assigned to a unit.")
+        unit = lock_units(tenant.current_unit_id)[tenant.current_unit_id]
+
+        close_history(tenant, unit.pk, move_date, reason)
+        vacate_unit(unit)
+
+        tenant.current_unit = None
+        tenant.status = 'Moved Out'
+        tenant.move_out_date = move_date
+        tenant.save(update_fields=['current_unit', 'status', 'move_out_date', 'updated_at'])
+    return tenant
@@ -0,0 +1,150 @@
+"""
+Occupancy, vacancy and turnover over a date range, from ``TenantHistory``.
+
+The owner's move-in/move-out intervals that overlap the range are read with
+one query ordered by ``(unit, move_in_date)`` (the
+``tenant_history_owner_unit_idx`` order) and swept as a stream, merged
+against the owner's units read in the same primary key order. Each unit
+keeps only a running "occupied until" date, so memory does not grow with
+the length of the history:
+
+* occupied days are the days of the range covered by at least one interval
+  (overlapping intervals are counted once); a move-out date is the first
+  vacant day and an open interval runs to the end of the range
+* a unit is counted from the start of the range, or from when it was added
+  (or first let, if earlier) when that is later
+* a turnover is a move-out inside the range followed by the next move-in to
+  the same unit, also inside the range; its length is the days in between
+"""
+from datetime import date, timedelta
+from django.utils import timezone
+from units.models import Unit
+from .models import TenantHistory
+
+DEFAULT_DAYS = 365
+
+
+def parse_range(start=None, end=None):
+    """``(start, end)`` dates from ``YYYY-MM-DD`` strings; defaults to the last year"""
+    try:
+        end = date.fromisoformat(end) if end else date.today()
+        start = date.fromisoformat(start) if start else end - timedelta(days=DEFAULT_DAYS - 1)
+    except ValueError:
+        raise ValueError('start and end must be in YYYY-MM-DD format')
+    if start > end:
+        raise ValueError('start must not be after end')
+    return start, end
+
+
+def _local_date(value):
+    return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+
+
+def _rate(occupied_days, days):
+    return round(100 * occupied_days / days, 1) if days else None
+
+
+def _average(total, count):
+    return round(total / count, 1) if count else None
+
+
+class _UnitSweep:
+    """Running totals for one unit while its intervals stream past"""
+
+    def __init__(self, start, end):
+        self.start = start
+        self.stop = end + timedelta(days=1)
+        self.first_move_in = None
+        # End of the merged occupancy so far; None while an open interval runs
+        self.occupied_until = start
+        # Whether occupied_until is a move-out (rather than the range start)
+        self.moved_out = False
+        self.occupied_days = 0
+        self.turnovers = 0
+        self.turnover_days = 0
+
+    def add(self, move_in, move_out):
+        """Account for one interval; intervals arrive in move-in order"""
+        if self.first_move_in is None:
+            self.first_move_in = move_in
+        if self.occupied_until is None:
+            return
+        if self.moved_out and move_in >= self.occupied_until:
+            self.turnovers += 1
+            self.turnover_days += (move_in - self.occupied_until).days
+        move_out = self.stop if move_out is None else min(move_out, self.stop)
+        covered_from = max(move_in, self.occupied_until)
+        if move_out > covered_from:
+            self.occupied_days += (move_out - covered_from).days
+        if move_out >= self.stop:
+            self.occupied_until = None
+        elif move_out > self.occupied_until:
+            self.occupied_until = move_out
+            self.moved_out = True
+
+    def result(self, unit_pk, unit_id, name, created_at):
+        available_from = _local_date(created_at)
+        if self.first_move_in is not None:
+            available_from = min(available_from, self.first_move_in)
+        days = max(0, (self.stop - max(self.start, available_from)).days)
+        return {
+            'unit': unit_pk,
+            'unit_id': unit_id,
+            'name': name,
+            'days': days,
+            'occupied_days': self.occupied_days,
+            'vacancy_days': days - self.occupied_days,
+            'occupancy_rate': _rate(self.occupied_days, days),
+            'turnovers': self.turnovers,
+            'turnover_days': self.turnover_days,
+            'average_turnover_days': _average(self.turnover_days, self.turnovers),
+        }
+
+
+def occupancy_timeline(user, start, end, unit=None):
+    """Per-unit and portfolio occupancy of ``user``'s units from ``start`` to ``end``
+
+    ``unit`` narrows the report to one unit primary key.
+    """
+    units = Unit.objects.for_owner(user)
+    history = TenantHistory.objects.for_owner(user).filter(move_in_date__lte=end).exclude(
+        move_out_date__lte=start,
+    )
+    if unit is not None:
+        units = units.filter(pk=unit)
+        history = history.filter(unit_id=unit)
+    units = units.order_by('pk').values_list('pk', 'unit_id', 'name', 'created_at')
+    intervals = iter(
+        history.order_by('unit_id', 'move_in_date', 'id').values_list(
+            'unit_id', 'move_in_date', 'move_out_date',
+        ).iterator(chunk_size=2000)
+    )
+
+    results = []
+    portfolio = {'days': 0, 'occupied_days': 0, 'turnovers': 0, 'turnover_days': 0}
+    pending = next(intervals, None)
+    for unit_pk, unit_id, name, created_at in units.iterator(chunk_size=2000):
+        sweep = _UnitSweep(start, end)
+        # Skip intervals of units outside the owner's portfolio
+        while pending is not None and pending[0] < unit_pk:
+            pending = next(intervals, None)
+        while pending is not None and pending[0] == unit_pk:
+            sweep.add(pending[1], pending[2])
+            pending = next(intervals, None)
+        row = sweep.result(unit_pk, unit_id, name, created_at)
+        results.append(row)
+        for key in portfolio:
+            portfolio[key] += row[key]
+
+    portfolio.update({
+        'units': len(results),
+        'vacancy_days': portfolio['days'] - portfolio['occupied_days'],
+        'occupancy_rate': _rate(portfolio['occupied_days'], portfolio['days']),
+        'average_turnover_days': _average(portfolio['turnover_days'], portfolio['turnovers']),
+    })
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'portfolio': portfolio,
+        'units': results,
+    }
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Tenant, TenantHistory
+from .models import LeaseReminder, Tenant, TenantHistory
 from units.models import Unit
 
 
@@ -99,9 +99,27 @@ class TenantHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
 
+class LeaseReminderSerializer(serializers.ModelSerializer):
+    tenant_name = serializers.CharField(source='tenant.full_name', read_only=True)
+    
+    class Meta:
+        model = LeaseReminder
+        fields = [
+            'id',
+            'tenant',
+            'tenant_name',
+            'lease_end_date',
+            'window_days',
+            'message',
+            'created_at',
+        ]
+        read_only_fields = fields
+
+
 class MoveInOutSerializer(serializers.Serializer):
     """Serializer for move-in/move-out operations"""
-    unit = serializers.PrimaryKeyRelatedField(queryset=Unit.objects.none())
+    # Required for move-in only
+    unit = serializers.PrimaryKeyRelatedField(queryset=Unit.objects.none(), required=False)
     move_date = serializers.DateField()
     monthly_rent = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
     security_deposit = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
@@ -113,4 +131,4 @@ class MoveInOutSerializer(serializers.Serializer):
         super().__init__(*args, **kwargs)
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            self.fields['unit'].queryset = Unit.objects.filter(owner=request.user)
+            self.fields['unit'].queryset = Unit.objects.for_owner(request.user)
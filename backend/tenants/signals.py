@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import Tenant
+from . import contact_sync
+
+
+@receiver(post_save, sender=Tenant)
+def sync_unit_contact_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Propagate name, phone and email changes to the tenant's current unit"""
+    if raw:
+        return
+    if update_fields is not None and not contact_sync.TENANT_SOURCE_FIELDS.intersection(update_fields):
+        return
+    contact_sync.sync_unit_contact(instance)
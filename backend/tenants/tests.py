@@ -0,0 +1,383 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from urllib.parse import parse_qs, urlparse
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core import search
+from core.testing import api_client, make_owner, make_payment, make_tenant, make_unit
+from payments.models import TenantBalance
+from units.models import Unit
+from . import contact_sync, leases, moves, occupancy
+from .models import LeaseReminder, Tenant, TenantHistory
+
+
+class TenantQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        for owner in [self.owner, make_owner()]:
+            for _ in range(5):
+                unit = make_unit(owner)
+                tenant = make_tenant(owner, current_unit=unit, last_name='Kamau')
+                TenantHistory.objects.create(
+                    tenant=tenant, unit=unit, owner=owner, move_in_date=date(2025, 1, 1), monthly_rent=unit.rent,
+                )
+        # Whether the full-text index exists is looked up once per process
+        search.fulltext_available()
+
+    def test_tenant_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tenants/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_tenant_detail(self):
+        tenant = Tenant.objects.filter(owner=self.owner).first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/tenants/{tenant.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_tenant_search(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/tenants/search/', {'q': 'kamau'})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_history_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tenant-history/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_history_detail(self):
+        entry = TenantHistory.objects.filter(owner=self.owner).first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/tenant-history/{entry.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+
+class TenantLedgerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+
+    def owing(self, amount, owner=None):
+        tenant = make_tenant(owner or self.owner)
+        if amount:
+            make_payment(tenant.owner, tenant=tenant, amount=Decimal(amount))
+        return tenant
+
+    def test_ledger_pages_keep_running_balance(self):
+        tenant = self.owing(None)
+        for day in range(1, 26):
+            make_payment(self.owner, tenant=tenant, amount=Decimal('10.00'), due_date=date(2025, 1, day))
+        first = self.client.get(f'/api/tenants/{tenant.pk}/ledger/')
+        second = self.client.get(f'/api/tenants/{tenant.pk}/ledger/', {'page': 2})
+        balances = [row['running_balance'] for row in first.data['results'] + second.data['results']]
+        self.assertEqual(balances, [f'{10 * day}.00' for day in range(1, 26)])
+
+    def test_balance_for_tenant_without_entries(self):
+        tenant = self.owing(None)
+        response = self.client.get(f'/api/tenants/{tenant.pk}/balance/')
+        self.assertEqual(response.data['balance'], '0.00')
+        other = self.owing('10.00', owner=make_owner())
+        self.assertEqual(self.client.get(f'/api/tenants/{other.pk}/balance/').status_code, 404)
+
+    def test_arrears_keyset_pages(self):
+        expected = [self.owing(amount).pk for amount in ['300.00', '100.00', '100.00', '200.00', '100.00']]
+        self.owing(None)
+        self.owing('5000.00', owner=make_owner())
+        expected = sorted(
+            expected, key=lambda pk: (-TenantBalance.objects.get(tenant=pk).balance, pk),
+        )
+
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/tenants/arrears/', {'cursor': cursor, 'page_size': 2})
+            self.assertNotIn('count', response.data)
+            seen += [row['tenant'] for row in response.data['results']]
+            next_link = response.data['next']
+            cursor = parse_qs(urlparse(next_link).query)['cursor'][0] if next_link else None
+        self.assertEqual(seen, expected)
+
+
+class MoveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.tenant = make_tenant(self.owner)
+        self.first = make_unit(self.owner, status='Vacant')
+        self.second = make_unit(self.owner, status='Vacant')
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_move_in_occupies_unit_and_opens_history(self):
+        moves.move_in(self.tenant, self.first, date(2025, 1, 1))
+        self.refresh(self.tenant, self.first)
+        self.assertEqual((self.tenant.current_unit, self.tenant.status), (self.first, 'Active'))
+        self.assertEqual(self.tenant.monthly_rent, self.first.rent)
+        self.assertEqual((self.first.status, self.first.tenant_name), ('Occupied', self.tenant.full_name))
+        history = TenantHistory.objects.get(tenant=self.tenant)
+        self.assertEqual((history.unit, history.move_in_date, history.move_out_date), (self.first, date(2025, 1, 1), None))
+
+    def test_moving_between_units(self):
+        moves.move_in(self.tenant, self.first, date(2025, 1, 1))
+        moves.move_in(self.tenant, self.second, date(2025, 6, 1))
+        self.refresh(self.first, self.second)
+        self.assertEqual((self.first.status, self.first.tenant_name), ('Vacant', ''))
+        self.assertEqual(self.second.status, 'Occupied')
+        closed, opened = TenantHistory.objects.filter(tenant=self.tenant).order_by('move_in_date')
+        self.assertEqual((closed.move_out_date, closed.move_out_reason),
+                         (date(2025, 6, 1), f'Moved to unit {self.second.unit_id}'))
+        self.assertIsNone(opened.move_out_date)
+
+    def test_refused_moves(self):
+        moves.move_in(make_tenant(self.owner), self.first, date(2025, 1, 1))
+        Unit.objects.filter(pk=self.second.pk).update(status='Under Maintenance')
+        for unit in [self.first, self.second]:
+            with self.assertRaises(moves.MoveError):
+                moves.move_in(self.tenant, unit, date(2025, 2, 1))
+        with self.assertRaises(moves.MoveError):
+            moves.move_out(self.tenant, date(2025, 2, 1))
+        self.assertFalse(TenantHistory.objects.filter(tenant=self.tenant).exists())
+
+    def test_move_out(self):
+        moves.move_in(self.tenant, self.first, date(2025, 1, 1))
+        moves.move_out(self.tenant, date(2025, 3, 1), 'Relocated')
+        self.refresh(self.tenant, self.first)
+        self.assertEqual((self.tenant.current_unit, self.tenant.status), (None, 'Moved Out'))
+        self.assertEqual(self.first.status, 'Vacant')
+        history = TenantHistory.objects.get(tenant=self.tenant)
+        self.assertEqual((history.move_out_date, history.move_out_reason), (date(2025, 3, 1), 'Relocated'))
+
+    def test_units_are_locked_in_primary_key_order(self):
+        with CaptureQueriesContext(connection) as queries:
+            locked = moves.lock_units(self.second.pk, None, self.first.pk, self.second.pk)
+        self.assertEqual(list(locked), [self.first.pk, self.second.pk])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('ORDER BY "units"."id" ASC', queries[0]['sql'])
+
+    def test_endpoints_report_refused_moves(self):
+        client = api_client(self.owner)
+        moves.move_in(make_tenant(self.owner), self.first, date(2025, 1, 1))
+        response = client.post(f'/api/tenants/{self.tenant.pk}/move_in/',
+                               {'unit': self.first.pk, 'move_date': '2025-02-01'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('already occupied', response.data['error'])
+
+        response = client.post(f'/api/tenants/{self.tenant.pk}/move_in/',
+                               {'unit': self.second.pk, 'move_date': '2025-02-01'})
+        self.assertEqual(response.data['current_unit'], self.second.pk)
+        response = client.post(f'/api/tenants/{self.tenant.pk}/move_out/', {'move_date': '2025-03-01'})
+        self.assertEqual(response.data['status'], 'Moved Out')
+
+
+class ContactSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.unit = make_unit(self.owner, status='Vacant')
+        self.tenant = moves.move_in(make_tenant(self.owner), self.unit, date(2025, 1, 1))
+
+    def contact(self, unit):
+        unit.refresh_from_db()
+        return unit.tenant_name, unit.tenant_phone, unit.tenant_email
+
+    def test_tenant_save_updates_unit(self):
+        self.tenant.phone = '0799000000'
+        self.tenant.last_name = 'Renamed'
+        self.tenant.save()
+        self.assertEqual(self.contact(self.unit), (self.tenant.full_name, '0799000000', self.tenant.email))
+
+    def test_sync_only_writes_when_stale(self):
+        self.assertEqual(contact_sync.sync_unit_contact(self.tenant), 0)
+        Unit.objects.filter(pk=self.unit.pk).update(tenant_phone='')
+        self.assertEqual(contact_sync.sync_unit_contact(self.tenant), 1)
+        self.assertEqual(self.contact(self.unit)[1], self.tenant.phone)
+
+    def test_unrelated_update_fields_skip_sync(self):
+        Unit.objects.filter(pk=self.unit.pk).update(tenant_phone='')
+        self.tenant.save(update_fields=['status'])
+        self.assertEqual(self.contact(self.unit)[1], '')
+
+    def test_repair(self):
+        vacated = make_unit(self.owner, status='Vacant', tenant_name='Gone', tenant_phone='1', tenant_email='x@y.z')
+        in_sync = make_unit(self.owner, status='Vacant')
+        Unit.objects.filter(pk=self.unit.pk).update(tenant_name='Stale')
+
+        report = contact_sync.repair(batch_size=1, dry_run=True)
+        self.assertEqual(
+            {key: report[key] for key in ('checked', 'mismatched', 'refreshed', 'cleared', 'fixed')},
+            {'checked': 3, 'mismatched': 2, 'refreshed': 1, 'cleared': 1, 'fixed': 0},
+        )
+        self.assertEqual(self.contact(self.unit)[0], 'Stale')
+
+        self.assertEqual(contact_sync.repair(batch_size=1)['fixed'], 2)
+        self.assertEqual(self.contact(self.unit), (self.tenant.full_name, self.tenant.phone, self.tenant.email))
+        self.assertEqual(self.contact(vacated), ('', '', ''))
+        self.assertEqual(self.contact(in_sync), ('', '', ''))
+        self.assertEqual(contact_sync.repair()['mismatched'], 0)
+
+
+class TenantSuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        self.unit = make_unit(self.owner, status='Vacant')
+        self.ann = moves.move_in(make_tenant(self.owner, first_name='Ann', last_name='Lee'), self.unit, date(2025, 1, 1))
+        make_tenant(self.owner, first_name='annabel', last_name='Kim')
+        make_tenant(self.owner, first_name='Lena', last_name='Annan', status='Moved Out')
+        make_tenant(make_owner(), first_name='Anna', last_name='Other')
+
+    def suggest(self, **params):
+        response = self.client.get('/api/tenants/suggest/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(row['first_name'], row['last_name']) for row in response.data]
+
+    def test_prefix_matches_first_or_last_name(self):
+        self.assertEqual(self.suggest(q='ANN'), [('Ann', 'Lee'), ('annabel', 'Kim'), ('Lena', 'Annan')])
+        self.assertEqual(self.suggest(q='ann', status='Moved Out'), [('Lena', 'Annan')])
+        self.assertEqual(self.suggest(q='ann', limit=1), [('Ann', 'Lee')])
+
+    def test_first_and_last_name_together(self):
+        self.assertEqual(self.suggest(q='ann le'), [('Ann', 'Lee')])
+        self.assertEqual(self.suggest(q='ann k'), [('annabel', 'Kim')])
+
+    def test_accented_names_match_themselves(self):
+        make_tenant(self.owner, first_name='Émile', last_name='Groß')
+        self.assertEqual(self.suggest(q='Émi'), [('Émile', 'Groß')])
+        self.assertEqual(self.suggest(q='groß'), [('Émile', 'Groß')])
+        self.assertEqual(self.suggest(q='gross'), [])
+
+    def test_matches_tenant_id_and_returns_unit(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tenants/suggest/', {'q': self.ann.tenant_id})
+        self.assertEqual(response.data[0]['id'], self.ann.pk)
+        self.assertEqual(response.data[0]['unit_id'], self.unit.unit_id)
+
+
+class LeaseExpiryTests(TestCase):
+    as_of = date(2025, 1, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        self.tenants = {}
+        for name, end, rent in [('expired', date(2024, 12, 31), 100), ('today', date(2025, 1, 1), 50),
+                                ('day30', date(2025, 1, 31), 200), ('day31', date(2025, 2, 1), 300),
+                                ('day90', date(2025, 4, 1), 400), ('day91', date(2025, 4, 2), 800)]:
+            self.tenants[name] = make_tenant(self.owner, first_name=name, lease_end_date=end, monthly_rent=rent)
+        make_tenant(self.owner, status='Moved Out', lease_end_date=date(2025, 1, 10))
+        make_tenant(make_owner(), lease_end_date=date(2025, 1, 10), monthly_rent=900)
+
+    def test_expiry_buckets(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/tenants/lease_expiries/', {'as_of': '2025-01-01'})
+        self.assertEqual(response.data['buckets'], [
+            {'bucket': 'expired', 'count': 1, 'monthly_rent': 100.0},
+            {'bucket': 'within_30', 'count': 2, 'monthly_rent': 250.0},
+            {'bucket': 'within_60', 'count': 1, 'monthly_rent': 300.0},
+            {'bucket': 'within_90', 'count': 1, 'monthly_rent': 400.0},
+        ])
+
+    def test_bucket_listing(self):
+        response = self.client.get('/api/tenants/lease_expiries/', {'as_of': '2025-01-01', 'bucket': '30'})
+        self.assertEqual([row['first_name'] for row in response.data['results']], ['today', 'day30'])
+        for params in [{'bucket': '45'}, {'as_of': '01/01/2025'}]:
+            response = self.client.get('/api/tenants/lease_expiries/', params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_send_lease_reminders(self):
+        out = StringIO()
+        call_command('send_lease_reminders', '--date=2025-01-01', stdout=out)
+        self.assertIn('Created 5 reminder(s)', out.getvalue())
+        self.assertEqual(
+            sorted(LeaseReminder.objects.filter(owner=self.owner).values_list('tenant__first_name', 'window_days')),
+            [('day30', 30), ('day31', 60), ('day90', 90), ('today', 30)],
+        )
+
+        # Reruns on the same day add nothing
+        self.assertEqual(leases.create_renewal_reminders(self.as_of)['created'], 0)
+
+        # A day later day31 enters the 30-day window and day91 the 90-day one
+        report = leases.create_renewal_reminders(date(2025, 1, 2), dry_run=True)
+        self.assertEqual((report['leases'], report['created']), (5, 2))
+        self.assertEqual(LeaseReminder.objects.count(), 5)
+        self.assertEqual(leases.create_renewal_reminders(date(2025, 1, 2))['created'], 2)
+
+        response = self.client.get('/api/tenants/lease_reminders/')
+        self.assertEqual(response.data['count'], 6)
+
+
+class OccupancyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        self.tenant = make_tenant(self.owner)
+        self.busy = self.make_unit(datetime(2024, 1, 1, 12, tzinfo=dt_timezone.utc))
+        self.added = self.make_unit(datetime(2025, 1, 22, 12, tzinfo=dt_timezone.utc))
+        self.let_early = self.make_unit(datetime(2025, 6, 1, 12, tzinfo=dt_timezone.utc))
+        self.make_history(self.busy, date(2024, 12, 20), date(2025, 1, 11))
+        # Overlaps the first stay, so its days are not counted twice
+        self.make_history(self.busy, date(2025, 1, 5), date(2025, 1, 8))
+        self.make_history(self.busy, date(2025, 1, 16))
+        self.make_history(self.busy, date(2024, 6, 1), date(2025, 1, 1))
+        self.make_history(self.let_early, date(2025, 1, 20))
+        other = make_owner()
+        self.make_history(make_unit(other), date(2025, 1, 1), owner=other)
+
+    def make_unit(self, created_at):
+        unit = make_unit(self.owner)
+        Unit.objects.filter(pk=unit.pk).update(created_at=created_at)
+        return unit
+
+    def make_history(self, unit, move_in, move_out=None, owner=None):
+        owner = owner or self.owner
+        return TenantHistory.objects.create(
+            tenant=self.tenant, unit=unit, owner=owner, move_in_date=move_in, move_out_date=move_out,
+            monthly_rent=Decimal('1000.00'),
+        )
+
+    def get(self, **params):
+        params = {'start': '2025-01-01', 'end': '2025-01-31', **params}
+        return self.client.get('/api/tenant-history/occupancy/', params)
+
+    def test_timeline(self):
+        with self.assertNumQueries(2):
+            response = self.get()
+        rows = {row['unit']: row for row in response.data['units']}
+        self.assertEqual(list(rows), [self.busy.pk, self.added.pk, self.let_early.pk])
+        busy = rows[self.busy.pk]
+        self.assertEqual(
+            (busy['days'], busy['occupied_days'], busy['turnovers'], busy['turnover_days']),
+            (31, 26, 1, 5),
+        )
+        added = rows[self.added.pk]
+        self.assertEqual((added['days'], added['occupied_days'], added['occupancy_rate']), (10, 0, 0.0))
+        let_early = rows[self.let_early.pk]
+        self.assertEqual((let_early['days'], let_early['occupied_days']), (12, 12))
+        self.assertEqual(response.data['portfolio'], {
+            'days': 53, 'occupied_days': 38, 'vacancy_days': 15, 'occupancy_rate': 71.7,
+            'turnovers': 1, 'turnover_days': 5, 'average_turnover_days': 5.0, 'units': 3,
+        })
+
+    def test_single_unit(self):
+        response = self.get(unit=self.let_early.pk)
+        self.assertEqual([row['unit'] for row in response.data['units']], [self.let_early.pk])
+        self.assertEqual(response.data['portfolio']['occupied_days'], 12)
+
+    def test_invalid_parameters(self):
+        for params in [{'start': '2025-02-01'}, {'end': '31/01/2025'}, {'unit': 'U-1'}]:
+            response = self.get(**params)
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(occupancy.parse_range(end='2025-12-31'), (date(2025, 1, 1), date(2025, 12, 31)))
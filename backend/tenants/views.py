@@ -1,29 +1,67 @@
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q, Count
-from django.db import transaction, connection
-from .models import Tenant, TenantHistory
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import APIException, ValidationError
+from django.db.models import Q, Count, F
+from django.db import transaction
+from django.http import Http404
+from django.utils import timezone
+from datetime import datetime
+from .models import LeaseReminder, Tenant, TenantHistory
 from .serializers import (
     TenantSerializer, 
     TenantCreateSerializer,
     TenantHistorySerializer,
+    LeaseReminderSerializer,
     MoveInOutSerializer
 )
 from units.models import Unit
+from . import leases, moves, occupancy
+from payments.models import LedgerEntry, TenantBalance
+from payments.serializers import LedgerEntrySerializer, TenantBalanceSerializer
+from payments.ledger import running_balance
+from core import search
+from core.stats import empty_stats, get_stats
+from core.suggest import parse_limit, prefix_q, top_matches
+from core.pagination import KeysetPagination
+from core.mixins import ExportMixin, OwnerScopedMixin, RelatedFieldsMixin
 import logging
 
 logger = logging.getLogger(__name__)
 
-class TenantViewSet(viewsets.ModelViewSet):
+class TenantViewSet(OwnerScopedMixin, RelatedFieldsMixin, ExportMixin, viewsets.ModelViewSet):
     """ViewSet for managing tenants"""
     permission_classes = [permissions.AllowAny]
     serializer_class = TenantSerializer
+    # TenantSerializer reads current_unit.name/unit_id
+    select_related_fields = ['current_unit']
+    export_filename = 'tenants'
+    export_fields = [
+        ('tenant_id', 'tenant_id'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('email', 'email'),
+        ('phone', 'phone'),
+        ('national_id', 'national_id'),
+        ('status', 'status'),
+        ('unit_id', 'current_unit__unit_id'),
+        ('unit_name', 'current_unit__name'),
+        ('move_in_date', 'move_in_date'),
+        ('move_out_date', 'move_out_date'),
+        ('lease_start_date', 'lease_start_date'),
+        ('lease_end_date', 'lease_end_date'),
+        ('monthly_rent', 'monthly_rent'),
+        ('security_deposit', 'security_deposit'),
+        ('emergency_contact_name', 'emergency_contact_name'),
+        ('emergency_contact_phone', 'emergency_contact_phone'),
+        ('created_at', 'created_at'),
+    ]
     
     def get_queryset(self):
         """Return tenants for the current user only"""
         try:
-            return Tenant.objects.all()
+            return self.with_related(self.for_request_owner(Tenant.objects.all()))
         except Exception as e:
             logger.error(f"Error getting tenants queryset: {e}")
             return Tenant.objects.none()
@@ -39,26 +77,19 @@ class TenantViewSet(viewsets.ModelViewSet):
         """Set the owner to the current user and handle unit assignment"""
         try:
             with transaction.atomic():
+                unit = serializer.validated_data.get('current_unit')
+                if unit:
+                    unit = moves.lock_units(unit.pk)[unit.pk]
+                    moves.check_vacant(unit)
                 # For now, don't require user authentication
                 tenant = serializer.save()
                 
                 # If assigned to a unit, update unit status and tenant
-                if tenant.current_unit:
-                    unit = tenant.current_unit
-                    unit.status = 'Occupied'
-                    unit.tenant_name = tenant.full_name
-                    unit.tenant_phone = tenant.phone
-                    unit.tenant_email = tenant.email
-                    unit.save()
-                    
-                    # Create tenant history record
-                    TenantHistory.objects.create(
-                        tenant=tenant,
-                        unit=unit,
-                        move_in_date=tenant.move_in_date or tenant.created_at.date(),
-                        monthly_rent=tenant.monthly_rent or unit.rent,
-                        security_deposit=tenant.security_deposit,
-                    )
+                if unit:
+                    moves.occupy_unit(unit, tenant)
+                    moves.open_history(tenant, unit, tenant.move_in_date or tenant.created_at.date())
+        except moves.MoveError as e:
+            raise ValidationError({'current_unit': [str(e)]})
         except Exception as e:
             logger.error(f"Error in perform_create: {e}")
             raise
@@ -66,30 +97,33 @@ class TenantViewSet(viewsets.ModelViewSet):
     def perform_update(self, serializer):
         """Handle unit changes during updates"""
         try:
-            old_tenant = self.get_object()
-            old_unit = old_tenant.current_unit
+            tenant = serializer.instance
+            old_unit_id = tenant.current_unit_id
+            new_unit = serializer.validated_data.get('current_unit', tenant.current_unit)
+            new_unit_id = new_unit.pk if new_unit else None
             
             with transaction.atomic():
+                if old_unit_id == new_unit_id:
+                    serializer.save()
+                    return
+                
+                units = moves.lock_units(old_unit_id, new_unit_id)
+                if new_unit_id:
+                    moves.check_vacant(units[new_unit_id], tenant)
                 tenant = serializer.save()
-                new_unit = tenant.current_unit
+                today = timezone.localdate()
+                
+                # Clear old unit
+                if old_unit_id:
+                    moves.close_history(tenant, old_unit_id, today)
+                    moves.vacate_unit(units[old_unit_id])
                 
-                # If unit changed
-                if old_unit != new_unit:
-                    # Clear old unit
-                    if old_unit:
-                        old_unit.status = 'Vacant'
-                        old_unit.tenant_name = ''
-                        old_unit.tenant_phone = ''
-                        old_unit.tenant_email = ''
-                        old_unit.save()
-                    
-                    # Set new unit
-                    if new_unit:
-                        new_unit.status = 'Occupied'
-                        new_unit.tenant_name = tenant.full_name
-                        new_unit.tenant_phone = tenant.phone
-                        new_unit.tenant_email = tenant.email
-                        new_unit.save()
+                # Set new unit
+                if new_unit_id:
+                    moves.occupy_unit(units[new_unit_id], tenant)
+                    moves.open_history(tenant, units[new_unit_id], today)
+        except moves.MoveError as e:
+            raise ValidationError({'current_unit': [str(e)]})
         except Exception as e:
             logger.error(f"Error in perform_update: {e}")
             raise
@@ -98,54 +132,64 @@ class TenantViewSet(viewsets.ModelViewSet):
         """Clean up unit when tenant is deleted"""
         try:
             with transaction.atomic():
-                if instance.current_unit:
-                    unit = instance.current_unit
-                    unit.status = 'Vacant'
-                    unit.tenant_name = ''
-                    unit.tenant_phone = ''
-                    unit.tenant_email = ''
-                    unit.save()
+                if instance.current_unit_id:
+                    moves.vacate_unit(moves.lock_units(instance.current_unit_id)[instance.current_unit_id])
                 instance.delete()
         except Exception as e:
             logger.error(f"Error in perform_destroy: {e}")
             raise
+
+    @action(detail=True, methods=['post'])
+    def move_in(self, request, pk=None):
+        """Move the tenant into a unit, out of their current one if any"""
+        try:
+            tenant = self.get_object()
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            data = serializer.validated_data
+            if not data.get('unit'):
+                return Response({'error': 'unit is required'}, status=status.HTTP_400_BAD_REQUEST)
+            tenant = moves.move_in(
+                tenant,
+                data['unit'],
+                data['move_date'],
+                monthly_rent=data.get('monthly_rent'),
+                security_deposit=data.get('security_deposit'),
+                lease_start_date=data.get('lease_start_date'),
+                lease_end_date=data.get('lease_end_date'),
+            )
+            return Response(TenantSerializer(tenant, context=self.get_serializer_context()).data)
+        except (Http404, ValidationError):
+            raise
+        except Exception as e:
+            logger.error(f"Error in move in: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['post'])
+    def move_out(self, request, pk=None):
+        """Move the tenant out of their current unit"""
+        try:
+            tenant = self.get_object()
+            serializer = self.get_serializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            data = serializer.validated_data
+            tenant = moves.move_out(tenant, data['move_date'], data.get('move_out_reason', ''))
+            return Response(TenantSerializer(tenant, context=self.get_serializer_context()).data)
+        except (Http404, ValidationError):
+            raise
+        except Exception as e:
+            logger.error(f"Error in move out: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get tenant statistics"""
         try:
-            # Check if table exists
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='tenants_tenant';
-                """)
-                if not cursor.fetchone():
-                    logger.warning("Tenants table does not exist")
-                    return Response({
-                        'total_tenants': 0,
-                        'active_tenants': 0,
-                        'inactive_tenants': 0,
-                        'moved_out_tenants': 0,
-                    })
-
-            queryset = self.get_queryset()
-            stats = {
-                'total_tenants': queryset.count(),
-                'active_tenants': queryset.filter(status='Active').count(),
-                'inactive_tenants': queryset.filter(status='Inactive').count(),
-                'moved_out_tenants': queryset.filter(status='Moved Out').count(),
-            }
-            return Response(stats)
+            return Response(get_stats('tenants', self.get_queryset(), request.user))
         except Exception as e:
             logger.error(f"Error in tenant stats: {e}")
-            return Response({
-                'total_tenants': 0,
-                'active_tenants': 0,
-                'inactive_tenants': 0,
-                'moved_out_tenants': 0,
-            })
-    
+            return Response(empty_stats('tenants'))
+
     @action(detail=False, methods=['get'])
     def search(self, request):
         """Search tenants by various fields"""
@@ -155,36 +199,171 @@ class TenantViewSet(viewsets.ModelViewSet):
             
             queryset = self.get_queryset()
             
-            if query:
-                queryset = queryset.filter(
-                    Q(tenant_id__icontains=query) |
-                    Q(first_name__icontains=query) |
-                    Q(last_name__icontains=query) |
-                    Q(email__icontains=query)
-                )
-            
             if status_filter:
                 queryset = queryset.filter(status=status_filter)
             
+            if query:
+                queryset = search.search(queryset, query, user=request.user)
+            
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error in tenant search: {e}")
             return Response([])
     
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead: the first few tenants whose name or tenant ID starts with q"""
+        try:
+            query = request.GET.get('q', '').strip()
+            limit = parse_limit(request.GET.get('limit'))
+            if not query:
+                return Response([])
+            
+            queryset = self.for_request_owner(Tenant.objects.all())
+            status_filter = request.GET.get('status', '')
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+            
+            conditions = [
+                prefix_q('tenant_id', query),
+                prefix_q('first_name', query),
+                prefix_q('last_name', query),
+            ]
+            first, _, rest = query.partition(' ')
+            if rest.strip():
+                # "ann le" -> first name "ann*" and last name "le*"
+                conditions.append(prefix_q('first_name', first) & prefix_q('last_name', rest.strip()))
+            
+            return Response(top_matches(
+                queryset,
+                conditions,
+                fields=['tenant_id', 'first_name', 'last_name'],
+                projection=['id', 'tenant_id', 'first_name', 'last_name', 'phone', 'status', 'current_unit'],
+                order_by=['first_name_upper', 'last_name_upper', 'id'],
+                limit=limit,
+                unit_id=F('current_unit__unit_id'),
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error in tenant suggest: {e}")
+            return Response([])
+
     def list(self, request, *args, **kwargs):
         """Override list to handle errors gracefully"""
         try:
             return super().list(request, *args, **kwargs)
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error listing tenants: {e}")
             return Response([])
 
+    def _paginated(self, queryset, serializer_class):
+        # Offset pages: a keyset cursor would filter rows out before the
+        # running-balance window is computed
+        paginator = PageNumberPagination()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def balance(self, request, pk=None):
+        """Current balance for a tenant from the denormalised balance row"""
+        try:
+            balance = self.for_request_owner(TenantBalance.objects.all()).select_related('tenant').filter(tenant_id=pk).first()
+            if balance is None:
+                tenant = self.get_object()
+                balance = TenantBalance(tenant=tenant, owner_id=tenant.owner_id)
+            return Response(TenantBalanceSerializer(balance).data)
+        except Http404:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting tenant balance: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=True, methods=['get'])
+    def ledger(self, request, pk=None):
+        """Ledger entries for a tenant with the running balance after each entry"""
+        try:
+            entries = running_balance(
+                self.for_request_owner(LedgerEntry.objects.all()).filter(tenant_id=pk).select_related('payment')
+            )
+            return self._paginated(entries, LedgerEntrySerializer)
+        except APIException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting tenant ledger: {e}")
+            return Response([])
+
+    @action(detail=False, methods=['get'])
+    def arrears(self, request):
+        """Tenants who owe money, largest balance first
+
+        Keyset pages (``?cursor=``) along the ``(owner, -balance)`` index, so
+        each page is one query with no ``COUNT(*)``.
+        """
+        try:
+            balances = self.for_request_owner(TenantBalance.objects.all()).filter(balance__gt=0).select_related('tenant')
+            paginator = KeysetPagination(ordering=['-balance', 'tenant_id'])
+            page = paginator.paginate_queryset(balances, request, view=self)
+            return paginator.get_paginated_response(TenantBalanceSerializer(page, many=True).data)
+        except APIException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting arrears: {e}")
+            return Response([])
+
+    @action(detail=False, methods=['get'])
+    def lease_expiries(self, request):
+        """Active leases ending soon, counted per 30/60/90-day window
+
+        With ``bucket=expired|30|60|90`` lists the tenants in that window instead.
+        """
+        try:
+            as_of = request.GET.get('as_of')
+            as_of = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+        except ValueError:
+            return Response({'error': 'as_of must be in YYYY-MM-DD format'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            queryset = self.for_request_owner(Tenant.objects.all())
+            bucket = request.GET.get('bucket')
+            if bucket:
+                tenants = self.with_related(leases.bucket_queryset(queryset, bucket, as_of))
+                return self._paginated(tenants, TenantSerializer)
+            return Response(leases.expiry_buckets(queryset, as_of))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except APIException:
+            raise
+        except Exception as e:
+            logger.error(f"Error in lease expiries: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'])
+    def lease_reminders(self, request):
+        """Renewal reminders raised by send_lease_reminders, newest first"""
+        try:
+            reminders = self.for_request_owner(LeaseReminder.objects.all()).select_related('tenant')
+            return self._paginated(reminders.order_by('-created_at', '-id'), LeaseReminderSerializer)
+        except APIException:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting lease reminders: {e}")
+            return Response([])
+
     @action(detail=False, methods=['get'])
     def available_units(self, request):
         """Get available units for tenant assignment"""
         try:
-            units = Unit.objects.filter(status='Vacant')
+            units = self.for_request_owner(Unit.objects.all()).filter(status='Vacant')
             unit_data = [
                 {
                     'id': unit.id,
@@ -200,15 +379,38 @@ class TenantViewSet(viewsets.ModelViewSet):
             return Response([])
 
 
-class TenantHistoryViewSet(viewsets.ReadOnlyModelViewSet):
+class TenantHistoryViewSet(OwnerScopedMixin, RelatedFieldsMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing tenant history"""
     permission_classes = [permissions.AllowAny]
     serializer_class = TenantHistorySerializer
+    select_related_fields = ['tenant', 'unit']
     
     def get_queryset(self):
         """Return tenant history"""
         try:
-            return TenantHistory.objects.all().select_related('tenant', 'unit')
+            return self.with_related(self.for_request_owner(TenantHistory.objects.all()))
         except Exception as e:
             logger.error(f"Error getting tenant history queryset: {e}")
             return TenantHistory.objects.none()
+
+    @action(detail=False, methods=['get'])
+    def occupancy(self, request):
+        """Occupancy rate, vacancy days and turnover per unit and for the portfolio
+
+        ``start`` and ``end`` (YYYY-MM-DD) bound the range, the last year by
+        default; ``unit`` narrows it to one unit.
+        """
+        try:
+            start, end = occupancy.parse_range(request.GET.get('start'), request.GET.get('end'))
+            unit = request.GET.get('unit')
+            if unit:
+                try:
+                    unit = int(unit)
+                except ValueError:
+                    raise ValueError('unit must be an integer')
+            return Response(occupancy.occupancy_timeline(request.user, start, end, unit=unit or None))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error computing occupancy: {e}")
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -3,18 +3,25 @@ from .models import Unit, DamageReport
 
 @admin.register(Unit)
 class UnitAdmin(admin.ModelAdmin):
-    list_display = ['unit_number', 'address', 'rent_amount', 'bedrooms', 'bathrooms', 'is_occupied']
-    list_filter = ['is_occupied', 'bedrooms', 'bathrooms']
-    search_fields = ['unit_number', 'address']
-    ordering = ['unit_number']
+    list_display = ['unit_id', 'name', 'unit_type', 'status', 'rent', 'tenant_name', 'owner']
+    list_filter = ['status', 'unit_type', 'owner']
+    search_fields = ['unit_id', 'name', 'location', 'tenant_name']
+    ordering = ['unit_id']
     readonly_fields = ['created_at', 'updated_at']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('unit_number', 'address', 'rent_amount')
+            'fields': ('unit_id', 'name', 'unit_type', 'status', 'owner')
         }),
-        ('Unit Details', {
-            'fields': ('bedrooms', 'bathrooms', 'square_feet', 'is_occupied')
+        ('Financial Information', {
+            'fields': ('rent', 'deposit')
+        }),
+        ('Additional Information', {
+            'fields': ('location', 'features', 'notes')
+        }),
+        ('Current Tenant', {
+            'fields': ('tenant_name', 'tenant_phone', 'tenant_email'),
+            'classes': ('collapse',)
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -24,18 +31,18 @@ class UnitAdmin(admin.ModelAdmin):
 
 @admin.register(DamageReport)
 class DamageReportAdmin(admin.ModelAdmin):
-    list_display = ['unit', 'damage_type', 'reported_by', 'estimated_cost', 'is_resolved', 'created_at']
-    list_filter = ['damage_type', 'is_resolved', 'created_at']
-    search_fields = ['unit__unit_number', 'description']
-    ordering = ['-created_at']
-    readonly_fields = ['created_at', 'updated_at']
+    list_display = ['damage_id', 'unit', 'damage_type', 'priority', 'status', 'repair_cost', 'report_date']
+    list_filter = ['damage_type', 'priority', 'status', 'report_date']
+    search_fields = ['damage_id', 'unit__unit_id', 'description']
+    ordering = ['-report_date', '-created_at']
+    readonly_fields = ['damage_id', 'created_at', 'updated_at']
     
     fieldsets = (
         ('Report Information', {
-            'fields': ('unit', 'reported_by', 'damage_type', 'description')
+            'fields': ('damage_id', 'unit', 'owner', 'reported_by', 'report_date', 'damage_type', 'priority', 'description')
         }),
-        ('Cost & Status', {
-            'fields': ('estimated_cost', 'is_resolved')
+        ('Repair Information', {
+            'fields': ('status', 'repair_details', 'repair_cost', 'repair_date', 'contractor_name', 'contractor_phone')
         }),
         ('Timestamps', {
             'fields': ('created_at', 'updated_at'),
@@ -1,41 +1,138 @@
 from django.db import models
-from django.contrib.auth.models import User
+from django.db.models import F
+from users.models import CustomUser
+from core.managers import OwnedManager
+from core.sequences import next_identifier
+from core.suggest import PrefixKey
+
 
 class Unit(models.Model):
-    unit_number = models.CharField(max_length=20, unique=True)
-    address = models.TextField()
-    rent_amount = models.DecimalField(max_digits=10, decimal_places=2)
-    bedrooms = models.IntegerField()
-    bathrooms = models.IntegerField()
-    square_feet = models.IntegerField(null=True, blank=True)
-    is_occupied = models.BooleanField(default=False)
+    UNIT_TYPES = [
+        ('studio', 'Studio'),
+        ('1-bedroom', '1 Bedroom'),
+        ('2-bedroom', '2 Bedroom'),
+        ('3-bedroom', '3 Bedroom'),
+        ('4-bedroom', '4 Bedroom'),
+    ]
+
+    STATUS_CHOICES = [
+        ('Vacant', 'Vacant'),
+        ('Occupied', 'Occupied'),
+        ('Under Maintenance', 'Under Maintenance'),
+    ]
+
+    # Basic Information
+    unit_id = models.CharField(max_length=50)
+    name = models.CharField(max_length=200)
+    unit_type = models.CharField(max_length=20, choices=UNIT_TYPES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Vacant')
+
+    # Financial Information
+    rent = models.DecimalField(max_digits=10, decimal_places=2)
+    deposit = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+
+    # Additional Information
+    location = models.CharField(max_length=300, blank=True)
+    features = models.TextField(blank=True)
+    notes = models.TextField(blank=True)
+
+    # Current Tenant (denormalized for quick display)
+    tenant_name = models.CharField(max_length=200, blank=True)
+    tenant_phone = models.CharField(max_length=20, blank=True)
+    tenant_email = models.EmailField(blank=True)
+
+    # Owner/Manager
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='units')
+
+    # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def __str__(self):
-        return f"Unit {self.unit_number}"
+    objects = OwnedManager()
 
     class Meta:
-        ordering = ['unit_number']
+        db_table = 'units'
+        ordering = ['unit_id']
+        indexes = [
+            # Keyset pagination over Meta.ordering (see core.pagination)
+            models.Index(fields=['unit_id', 'id'], name='units_keyset_idx'),
+            models.Index(fields=['owner', 'unit_id', 'id'], name='units_owner_keyset_idx'),
+            models.Index(fields=['owner', 'status'], name='units_owner_status_idx'),
+            # Case-insensitive prefix lookups (see core.suggest)
+            models.Index(F('owner'), PrefixKey('unit_id'), name='units_owner_uid_upper_idx'),
+            models.Index(F('owner'), PrefixKey('name'), name='units_owner_name_upper_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['unit_id', 'owner'], name='unique_unit_per_owner'),
+        ]
+
+    def __str__(self):
+        return f"{self.unit_id} - {self.name}"
+
 
 class DamageReport(models.Model):
     DAMAGE_TYPES = [
-        ('minor', 'Minor'),
-        ('major', 'Major'),
-        ('critical', 'Critical'),
+        ('plumbing', 'Plumbing'),
+        ('electrical', 'Electrical'),
+        ('structural', 'Structural'),
+        ('appliance', 'Appliance'),
+        ('other', 'Other'),
+    ]
+
+    PRIORITY_CHOICES = [
+        ('low', 'Low'),
+        ('medium', 'Medium'),
+        ('high', 'High'),
+        ('urgent', 'Urgent'),
     ]
-    
-    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='unit_damage_reports')
-    reported_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reported_unit_damages')
+
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('In Progress', 'In Progress'),
+        ('Repaired', 'Repaired'),
+    ]
+
+    # Basic Information
+    damage_id = models.CharField(max_length=50, unique=True)
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='damage_reports')
     damage_type = models.CharField(max_length=20, choices=DAMAGE_TYPES)
     description = models.TextField()
-    estimated_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
-    is_resolved = models.BooleanField(default=False)
+    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    reported_by = models.CharField(max_length=200)
+    report_date = models.DateField()
+
+    # Repair Information
+    repair_details = models.TextField(blank=True)
+    repair_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    repair_date = models.DateField(null=True, blank=True)
+    contractor_name = models.CharField(max_length=200, blank=True)
+    contractor_phone = models.CharField(max_length=20, blank=True)
+
+    # Owner/Manager
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='damage_reports')
+
+    # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
-    def __str__(self):
-        return f"Damage Report for {self.unit.unit_number}"
+    objects = OwnedManager()
 
     class Meta:
-        ordering = ['-created_at']
+        db_table = 'damage_reports'
+        ordering = ['-report_date', '-created_at']
+        indexes = [
+            # Keyset pagination over Meta.ordering (see core.pagination)
+            models.Index(fields=['-report_date', '-created_at', '-id'], name='damage_keyset_idx'),
+            models.Index(fields=['owner', '-report_date', '-created_at', '-id'], name='damage_owner_keyset_idx'),
+            models.Index(fields=['owner', 'status'], name='damage_owner_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.damage_id} - {self.unit.unit_id}"
+
+    def save(self, *args, **kwargs):
+        if not self.damage_id:
+            # Generate damage ID: DMG-YYYY-XXXX
+            self.damage_id = next_identifier('DMG', DamageReport, 'damage_id')
+        super().save(*args, **kwargs)
@@ -0,0 +1,104 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import resolve
+from core import search
+from core.testing import api_client, make_damage_report, make_owner, make_unit
+from .models import DamageReport, Unit
+from .views import DamageReportViewSet
+
+
+class UnitQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        for owner in [self.owner, make_owner()]:
+            for _ in range(5):
+                make_damage_report(make_unit(owner, location='Kilimani'))
+        # Whether the full-text index exists is looked up once per process
+        search.fulltext_available()
+
+    def test_unit_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/units/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_unit_detail(self):
+        unit = Unit.objects.filter(owner=self.owner).first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/units/{unit.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_unit_search(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/units/search/', {'q': 'kilimani'})
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_damage_report_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/damage-reports/')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_damage_report_detail(self):
+        report = DamageReport.objects.filter(owner=self.owner).first()
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/damage-reports/{report.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_damage_reports_are_served_by_units(self):
+        # units.urls registers damage-reports ahead of the damage_reports app
+        self.assertIs(resolve('/api/damage-reports/').func.cls, DamageReportViewSet)
+
+    def test_damage_report_filter(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/damage-reports/filter/', {'status': 'Pending'})
+        self.assertEqual(len(response.data), 5)
+
+
+@override_settings(SUGGEST_LIMIT=3, SUGGEST_MAX_LIMIT=4)
+class UnitSuggestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+        self.client = api_client(self.owner)
+        for unit_id, name, status in [('A-101', 'Garden Flat', 'Vacant'), ('A-102', 'Attic', 'Occupied'),
+                                      ('a-103', 'Basement', 'Vacant'), ('A-104', 'Loft', 'Vacant'),
+                                      ('A-105', 'Annex', 'Vacant'), ('B-201', 'Penthouse', 'Vacant')]:
+            make_unit(self.owner, unit_id=unit_id, name=name, status=status)
+        make_unit(make_owner(), unit_id='A-100', name='Elsewhere')
+
+    def suggest(self, **params):
+        response = self.client.get('/api/units/suggest/', params)
+        self.assertEqual(response.status_code, 200)
+        return [row['unit_id'] for row in response.data]
+
+    def test_prefix_matches_unit_id_or_name_ignoring_case(self):
+        self.assertEqual(self.suggest(q='a', limit=10), ['A-101', 'A-102', 'a-103', 'A-104'])
+        self.assertEqual(self.suggest(q='pent'), ['B-201'])
+        self.assertEqual(self.suggest(q='flat'), [])
+
+    def test_limit_and_status(self):
+        self.assertEqual(self.suggest(q='a-1'), ['A-101', 'A-102', 'a-103'])
+        self.assertEqual(self.suggest(q='a-1', status='Vacant', limit=2), ['A-101', 'a-103'])
+        self.assertEqual(self.suggest(q=''), [])
+        response = self.client.get('/api/units/suggest/', {'q': 'a', 'limit': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_prefix_is_compared_code_point_by_code_point(self):
+        make_unit(self.owner, unit_id='C-1', name='A BC')
+        make_unit(self.owner, unit_id='C-2', name='élan')
+        make_unit(self.owner, unit_id='C-3', name='Straße')
+        self.assertEqual(self.suggest(q='ab'), [])
+        self.assertEqual(self.suggest(q='a b'), ['C-1'])
+        self.assertEqual(self.suggest(q='élan'), ['C-2'])
+        self.assertEqual(self.suggest(q='straß'), ['C-3'])
+        self.assertEqual(self.suggest(q='strass'), [])
+
+    def test_returns_projection_in_one_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/units/suggest/', {'q': 'b-2'})
+        self.assertEqual(response.data, [
+            {'id': Unit.objects.get(unit_id='B-201').pk, 'unit_id': 'B-201', 'name': 'Penthouse',
+             'status': 'Vacant', 'rent': Decimal('1000.00')},
+        ])
@@ -1,22 +1,40 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException
 from rest_framework.permissions import AllowAny
 from django.db.models import Q
-from django.db import connection
 from .models import Unit, DamageReport
 from .serializers import UnitSerializer, DamageReportSerializer
+from core import search
+from core.stats import empty_stats, get_stats
+from core.suggest import parse_limit, prefix_q, top_matches
+from core.mixins import ExportMixin, OwnerScopedMixin, RelatedFieldsMixin
 import logging
 
 logger = logging.getLogger(__name__)
 
-class UnitViewSet(viewsets.ModelViewSet):
+class UnitViewSet(OwnerScopedMixin, ExportMixin, viewsets.ModelViewSet):
     serializer_class = UnitSerializer
     permission_classes = [AllowAny]
+    export_filename = 'units'
+    export_fields = [
+        ('unit_id', 'unit_id'),
+        ('name', 'name'),
+        ('unit_type', 'unit_type'),
+        ('status', 'status'),
+        ('rent', 'rent'),
+        ('deposit', 'deposit'),
+        ('location', 'location'),
+        ('tenant_name', 'tenant_name'),
+        ('tenant_phone', 'tenant_phone'),
+        ('tenant_email', 'tenant_email'),
+        ('created_at', 'created_at'),
+    ]
 
     def get_queryset(self):
         try:
-            return Unit.objects.all()
+            return self.for_request_owner(Unit.objects.all())
         except Exception as e:
             logger.error(f"Error getting units queryset: {e}")
             return Unit.objects.none()
@@ -25,38 +43,10 @@ class UnitViewSet(viewsets.ModelViewSet):
     def stats(self, request):
         """Get unit statistics"""
         try:
-            # Check if table exists
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name='units_unit';
-                """)
-                if not cursor.fetchone():
-                    logger.warning("Units table does not exist")
-                    return Response({
-                        'total_units': 0,
-                        'occupied_units': 0,
-                        'vacant_units': 0,
-                        'maintenance_units': 0,
-                    })
-
-            queryset = self.get_queryset()
-            stats = {
-                'total_units': queryset.count(),
-                'occupied_units': queryset.filter(status='Occupied').count(),
-                'vacant_units': queryset.filter(status='Vacant').count(),
-                'maintenance_units': queryset.filter(status='Under Maintenance').count(),
-            }
-            logger.info(f"Unit stats: {stats}")
-            return Response(stats)
+            return Response(get_stats('units', self.get_queryset(), request.user))
         except Exception as e:
             logger.error(f"Error in unit stats: {e}")
-            return Response({
-                'total_units': 0,
-                'occupied_units': 0,
-                'vacant_units': 0,
-                'maintenance_units': 0,
-            })
+            return Response(empty_stats('units'))
 
     @action(detail=False, methods=['get'])
     def search(self, request):
@@ -67,26 +57,58 @@ class UnitViewSet(viewsets.ModelViewSet):
             
             queryset = self.get_queryset()
             
-            if query:
-                queryset = queryset.filter(
-                    Q(unit_id__icontains=query) |
-                    Q(name__icontains=query) |
-                    Q(description__icontains=query)
-                )
-            
             if status_filter:
                 queryset = queryset.filter(status=status_filter)
             
+            if query:
+                queryset = search.search(queryset, query, user=request.user)
+            
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error in unit search: {e}")
             return Response([])
 
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead: the first few units whose unit ID or name starts with q"""
+        try:
+            query = request.GET.get('q', '').strip()
+            limit = parse_limit(request.GET.get('limit'))
+            if not query:
+                return Response([])
+            
+            queryset = self.for_request_owner(Unit.objects.all())
+            status_filter = request.GET.get('status', '')
+            if status_filter:
+                queryset = queryset.filter(status=status_filter)
+            
+            return Response(top_matches(
+                queryset,
+                [prefix_q('unit_id', query), prefix_q('name', query)],
+                fields=['unit_id', 'name'],
+                projection=['id', 'unit_id', 'name', 'status', 'rent'],
+                order_by=['unit_id_upper', 'id'],
+                limit=limit,
+            ))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.error(f"Error in unit suggest: {e}")
+            return Response([])
+
     def list(self, request, *args, **kwargs):
         """Override list to handle errors gracefully"""
         try:
             return super().list(request, *args, **kwargs)
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error listing units: {e}")
             return Response([])
@@ -102,36 +124,23 @@ class UnitViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-class DamageReportViewSet(viewsets.ModelViewSet):
+class DamageReportViewSet(OwnerScopedMixin, RelatedFieldsMixin, viewsets.ModelViewSet):
     serializer_class = DamageReportSerializer
     permission_classes = [AllowAny]
+    # DamageReportSerializer reads unit.name/unit_id
+    select_related_fields = ['unit']
 
     def get_queryset(self):
-        # For now, return all damage reports (no user filtering)
-        return DamageReport.objects.all()
+        return self.with_related(self.for_request_owner(DamageReport.objects.all()))
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Get damage report statistics"""
         try:
-            queryset = self.get_queryset()
-            stats = {
-                'total_reports': queryset.count(),
-                'pending_reports': queryset.filter(status='Pending').count(),
-                'in_progress_reports': queryset.filter(status='In Progress').count(),
-                'repaired_reports': queryset.filter(repair_completed=True).count(),
-                'unrepaired_reports': queryset.filter(repair_completed=False).count(),
-            }
-            return Response(stats)
+            return Response(get_stats('unit_damage_reports', self.get_queryset(), request.user))
         except Exception as e:
             logger.error(f"Error in damage report stats: {e}")
-            return Response({
-                'total_reports': 0,
-                'pending_reports': 0,
-                'in_progress_reports': 0,
-                'repaired_reports': 0,
-                'unrepaired_reports': 0,
-            })
+            return Response(empty_stats('unit_damage_reports'))
 
     @action(detail=False, methods=['get'])
     def filter(self, request):
@@ -153,7 +162,7 @@ class DamageReportViewSet(viewsets.ModelViewSet):
     def user_units(self, request):
         """Get units for damage report dropdown"""
         try:
-            units = Unit.objects.all()
+            units = self.for_request_owner(Unit.objects.all())
             unit_data = [
                 {
                     'id': unit.id,
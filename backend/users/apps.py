@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from django.db.models.signals import post_save, post_delete
+        from .models import CustomUser
+        from .token_cache import forget_user
+        post_save.connect(forget_user, sender=CustomUser, dispatch_uid='users_forget_cached_user_save')
+        post_delete.connect(forget_user, sender=CustomUser, dispatch_uid='users_forget_cached_user_delete')
@@ -2,6 +2,7 @@ import firebase_admin
 from firebase_admin import auth, credentials
 from rest_framework import authentication, exceptions
 from .models import CustomUser
+from . import token_cache
 import os
 import json
 
@@ -33,44 +34,63 @@ if not firebase_admin._apps:
 
 class FirebaseAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
+        # The middleware and DRF both authenticate API requests; whichever runs
+        # first stores its result on the underlying Django request for the other
+        django_request = getattr(request, '_request', request)
+        if hasattr(django_request, '_firebase_auth'):
+            return django_request._firebase_auth
+        result = self._authenticate(request)
+        django_request._firebase_auth = result
+        return result
+
+    def _authenticate(self, request):
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         
         if not auth_header or not auth_header.startswith('Bearer '):
             return None
             
         token = auth_header.split(' ')[1]
-        
+        return self.authenticate_token(token)
+
+    def authenticate_token(self, token):
+        """``(user, token)`` for a Firebase ID token, or None if it does not verify"""
         try:
             # Skip Firebase verification if no proper setup
             if not firebase_admin._apps:
                 print("⚠️ Firebase not properly initialized, skipping auth")
                 return None
                 
-            decoded_token = auth.verify_id_token(token)
-            firebase_uid = decoded_token['uid']
-            
-            # Get or create user
-            user, created = CustomUser.objects.get_or_create(
-                firebase_uid=firebase_uid,
-                defaults={
-                    'email': decoded_token.get('email', ''),
-                    'first_name': decoded_token.get('name', '').split(' ')[0] if decoded_token.get('name') else '',
-                    'last_name': ' '.join(decoded_token.get('name', '').split(' ')[1:]) if decoded_token.get('name') and len(decoded_token.get('name', '').split(' ')) > 1 else '',
-                }
-            )
-            
-            # Update user info if it changed
-            if not created:
-                updated = False
-                if user.email != decoded_token.get('email', ''):
-                    user.email = decoded_token.get('email', '')
-                    updated = True
-                if updated:
-                    user.save()
-            
-            return (user, token)
+            decoded_token = token_cache.verify_token(token, auth.verify_id_token)
+            return (self.get_user(decoded_token), token)
             
         except Exception as e:
             print(f"⚠️ Firebase auth error: {str(e)}")
             # Don't fail completely, just return None for unauthenticated
             return None
+
+    def get_user(self, decoded_token):
+        """The user for a verified token, from the short-lived user cache when possible"""
+        firebase_uid = decoded_token['uid']
+        email = decoded_token.get('email', '')
+
+        user = token_cache.get_user(firebase_uid)
+        if user is not None and user.email == email:
+            return user
+
+        # Get or create user
+        user, created = CustomUser.objects.get_or_create(
+            firebase_uid=firebase_uid,
+            defaults={
+                'email': email,
+                'first_name': decoded_token.get('name', '').split(' ')[0] if decoded_token.get('name') else '',
+                'last_name': ' '.join(decoded_token.get('name', '').split(' ')[1:]) if decoded_token.get('name') and len(decoded_token.get('name', '').split(' ')) > 1 else '',
+            }
+        )
+        
+        # Update user info if it changed
+        if not created and user.email != email:
+            user.email = email
+            user.save()
+
+        token_cache.set_user(user)
+        return user
@@ -25,6 +25,8 @@ class FirebaseAuthenticationMiddleware(MiddlewareMixin):
             return None
             
         try:
+            # The result is kept on the request and reused by DRF's
+            # FirebaseAuthentication, so the token is verified once
             firebase_auth = FirebaseAuthentication()
             result = firebase_auth.authenticate(request)
             
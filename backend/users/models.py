@@ -1,22 +1,33 @@
 from django.db import models
 
-# Simple user profile model that doesn't interfere with Django's auth
-class UserProfile(models.Model):
+# Simple user model keyed by Firebase uid that doesn't interfere with Django's auth
+class CustomUser(models.Model):
     firebase_uid = models.CharField(max_length=128, unique=True, primary_key=True)
     email = models.EmailField(unique=True)
     first_name = models.CharField(max_length=100, blank=True)
     last_name = models.CharField(max_length=100, blank=True)
     phone_number = models.CharField(max_length=20, blank=True)
+    company_name = models.CharField(max_length=200, blank=True)
+    profile_picture_url = models.URLField(blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
     class Meta:
-        db_table = 'user_profiles'
-        
+        db_table = 'users'
+
     def __str__(self):
         return f"{self.email} ({self.firebase_uid})"
-    
+
+    @property
+    def is_authenticated(self):
+        # Set as request.user by FirebaseAuthentication, like Django's User
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}".strip()
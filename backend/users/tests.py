@@ -0,0 +1,76 @@
+import time
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from core.testing import firebase_login, make_owner
+from . import token_cache
+from .models import CustomUser
+
+
+class TokenCacheTests(TestCase):
+    def claims(self, uid='uid', ttl=60):
+        return {'uid': uid, 'exp': time.time() + ttl}
+
+    def test_entries_expire_with_the_token(self):
+        tokens = token_cache.TokenCache(10)
+        tokens.set('fresh', self.claims())
+        tokens.set('stale', self.claims(ttl=-1))
+        tokens.set('no-exp', {'uid': 'uid'})
+        self.assertEqual(tokens.get('fresh')['uid'], 'uid')
+        self.assertIsNone(tokens.get('stale'))
+        self.assertIsNone(tokens.get('no-exp'))
+
+    def test_least_recently_used_is_evicted(self):
+        tokens = token_cache.TokenCache(2)
+        tokens.set('a', self.claims('a'))
+        tokens.set('b', self.claims('b'))
+        tokens.get('a')
+        tokens.set('c', self.claims('c'))
+        self.assertIsNone(tokens.get('b'))
+        self.assertIsNotNone(tokens.get('a'))
+        self.assertIsNotNone(tokens.get('c'))
+
+    def test_verify_only_on_miss(self):
+        token_cache.tokens.clear()
+        calls = []
+
+        def verify(token):
+            calls.append(token)
+            return self.claims()
+
+        token_cache.verify_token('token', verify)
+        token_cache.verify_token('token', verify)
+        self.assertEqual(calls, ['token'])
+        token_cache.tokens.clear()
+
+
+class AuthenticationCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = make_owner()
+
+    def user_queries(self, headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/units/', **headers)
+        self.assertEqual(response.status_code, 200)
+        return [query for query in queries if CustomUser._meta.db_table in query['sql']]
+
+    def test_user_is_cached_between_requests(self):
+        with firebase_login(self.owner) as headers:
+            self.assertTrue(self.user_queries(headers(self.owner)))
+            self.assertEqual(self.user_queries(headers(self.owner)), [])
+
+    def test_cache_is_keyed_by_firebase_uid(self):
+        token_cache.set_user(self.owner)
+        self.assertEqual(token_cache.get_user(self.owner.firebase_uid), self.owner)
+        token_cache.forget_user(CustomUser, self.owner)
+        self.assertIsNone(token_cache.get_user(self.owner.firebase_uid))
+
+    def test_saving_the_user_drops_the_cached_copy(self):
+        with firebase_login(self.owner) as headers:
+            self.user_queries(headers(self.owner))
+            self.owner.first_name = 'Amina'
+            self.owner.save()
+            self.assertIsNone(token_cache.get_user(self.owner.firebase_uid))
+            self.assertTrue(self.user_queries(headers(self.owner)))
@@ -0,0 +1,92 @@
+"""
+Caches for Firebase authentication.
+
+Verified ID tokens are kept in a bounded in-process LRU keyed by the SHA-256
+of the token and held until the token's own ``exp``, so a client reusing its
+token skips signature verification. The ``CustomUser`` each Firebase uid
+resolves to is kept in the Django cache for ``FIREBASE_USER_CACHE_TTL``
+seconds and dropped whenever the user row is saved or deleted.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _token_cache_size():
+    return getattr(settings, 'FIREBASE_TOKEN_CACHE_SIZE', 1024)
+
+
+def user_cache_ttl():
+    return getattr(settings, 'FIREBASE_USER_CACHE_TTL', 60)
+
+
+class TokenCache:
+    """Thread-safe LRU of decoded token claims, each valid until its ``exp``"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def set(self, token, claims):
+        expires_at = claims.get('exp')
+        if not expires_at or self.max_size <= 0:
+            return
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (claims, float(expires_at))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+tokens = TokenCache(_token_cache_size())
+
+
+def verify_token(token, verify):
+    """Decoded claims for ``token``, calling ``verify(token)`` only on a cache miss"""
+    claims = tokens.get(token)
+    if claims is None:
+        claims = verify(token)
+        tokens.set(token, claims)
+    return claims
+
+
+def _user_key(firebase_uid):
+    return f'auth:user:{firebase_uid}'
+
+
+def get_user(firebase_uid):
+    return cache.get(_user_key(firebase_uid))
+
+
+def set_user(user):
+    cache.set(_user_key(user.firebase_uid), user, user_cache_ttl())
+
+
+def forget_user(sender, instance, **kwargs):
+    cache.delete(_user_key(instance.firebase_uid))